@@ -5,8 +5,10 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.session import SessionLocal
-from app.models.user import User
+from app.core.principal_cache import Principal, principal_cache
+from app.core.rate_limit import RateLimit, check_rate_limit
+from app.services.llm_budget import check_llm_budget
+from app.db.session import SessionLocal, get_async_db  # noqa: F401  get_async_db para endpoints async
 from app.crud import crud_user
 
 # Esta es la URL donde el cliente puede obtener un token
@@ -21,9 +23,11 @@ def get_db() -> Generator:
 
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+) -> Principal:
     """
     Dependencia para obtener el usuario actual a partir de un token JWT.
+    Confía en los claims firmados (sub, role, uid, ver) y resuelve el usuario
+    desde la caché de principals; solo consulta la DB si no está en caché.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -42,24 +46,41 @@ def get_current_user(
         if email is None or role is None:
         # --- Fin del cambio ---
             raise credentials_exception
+        user_id = payload.get("uid")
+        token_version = payload.get("ver")
     except JWTError:
         raise credentials_exception
+
+    if user_id is None or token_version is None:
+        # Token emitido antes de incluir uid/ver: se resuelve por email
+        user = crud_user.get_user_by_email(db, email=email)
+        if user is None or user.role != role:
+            raise credentials_exception
+        return Principal.from_user(user)
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = crud_user.get_user_by_id(db, user_id=user_id)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(principal)
     
-    user = crud_user.get_user_by_email(db, email=email)
-    if user is None:
-        raise credentials_exception
-    
-    # Nos aseguramos de que el rol en la DB coincida con el del token
-    # (por si el rol del usuario cambió pero el token sigue siendo antiguo)
-    if user.role != role:
+    # Nos aseguramos de que el usuario coincida con el del token
+    # (por si el rol cambió o se hizo logout-all y el token sigue siendo antiguo)
+    if (
+        principal.email != email
+        or principal.role != role
+        or principal.token_version != token_version
+    ):
         raise credentials_exception
 
-    return user
+    return principal
 
 # --- CAMBIO: Nueva dependencia para proteger rutas de psicólogos ---
 def get_current_psychologist_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """
     Dependencia que obtiene el usuario actual y verifica si es un psicólogo.
     Si no lo es, lanza un error 403 Forbidden.
@@ -71,3 +92,26 @@ def get_current_psychologist_user(
         )
     return current_user
 # --- Fin del cambio ---
+
+
+def rate_limit(limit: str, scope: str):
+    """
+    Dependencia que limita `scope` por usuario autenticado (token bucket compartido,
+    ver app/core/rate_limit.py). Uso:
+
+        @router.post("/send", dependencies=[Depends(rate_limit("50/minute", "chat_send"))])
+    """
+    parsed = RateLimit.parse(limit)
+
+    async def dependency(current_user: Principal = Depends(get_current_user)) -> None:
+        await check_rate_limit(f"{scope}:user:{current_user.id}", parsed)
+
+    return dependency
+
+
+async def llm_budget(current_user: Principal = Depends(get_current_user)) -> None:
+    """
+    Revisa el presupuesto de tokens del LLM (usuario y global) antes del endpoint.
+    No rechaza el request: si está agotado, el endpoint responde sin LLM (ver app/services/llm_budget.py).
+    """
+    await check_llm_budget(current_user.id)
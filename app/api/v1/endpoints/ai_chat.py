@@ -1,16 +1,18 @@
 # app/api/v1/endpoints/ai_chat.py
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from typing import List, Optional
 import logging
-import json
 
-from app.api.deps import get_current_user, get_db
-from app.models.user import User
+import orjson
+
+from app.api.deps import get_current_user, get_db, get_async_db, llm_budget, rate_limit
+from app.core.config import settings
+from app.core.sse import encode_event
+from app.core.principal_cache import Principal
 from app.schemas.chat import (
     ChatRequest, ChatResponse, ChatHistoryResponse, 
     ProfileSummaryRequest, ProfileSummaryResponse, ChatMessage as ChatMessageSchema
@@ -18,19 +20,16 @@ from app.schemas.chat import (
 from app.crud import crud_chat
 from app.crud import crud_session
 from app.services.ai_service import handle_user_turn, handle_user_turn_streaming, generate_profile_summary
-from app.crud.crud_user_profile import get_profile
-from app.crud.crud_daily_check_in import get_latest_checkin
-from app.crud.crud_dashboard import get_questionnaire_summary
+from app.crud.crud_user_profile import get_profile_async
+from app.crud.crud_daily_check_in import get_latest_checkin_async
+from app.crud.crud_dashboard import get_questionnaire_summary_async
 
 logger = logging.getLogger(__name__)
 
-# Configurar limiter (se obtiene del app.state en main.py)
-limiter = Limiter(key_func=get_remote_address)
-
 router = APIRouter()
 
 
-def build_user_context(db: Session, user: User) -> str:
+async def build_user_context(db: AsyncSession, user: Principal) -> str:
     """
     Construye el contexto del usuario para personalizar las respuestas de la IA.
     """
@@ -38,19 +37,19 @@ def build_user_context(db: Session, user: User) -> str:
         context_string = "Contexto del usuario (no lo menciones directamente, úsalo para personalizar): "
         
         # Obtener último check-in
-        last_checkin = get_latest_checkin(db, user.id)
+        last_checkin = await get_latest_checkin_async(db, user.id)
         if last_checkin:
             context_string += f"Último check-in de motivación: {last_checkin.motivation_level}/6. "
         
         # Obtener resumen del cuestionario
-        summary = get_questionnaire_summary(db, user_id=user.id)
+        summary = await get_questionnaire_summary_async(db, user_id=user.id)
         if summary:
             context_string += "Resumen cuestionario meta-motivación: "
             summary_parts = [f"{s['section_name']} promedio {s['average_score']:.1f}/7" for s in summary]
             context_string += ", ".join(summary_parts) + ". "
         
         # Obtener perfil
-        profile = get_profile(db, user.id)
+        profile = await get_profile_async(db, user.id)
         if profile:
             context_string += "Perfil: "
             profile_parts = []
@@ -88,13 +87,18 @@ def build_user_context(db: Session, user: User) -> str:
         return ""
 
 
-@router.post("/send", response_model=ChatResponse)
-@limiter.limit("50/minute")  # Máximo 50 mensajes por minuto por usuario
+@router.post(
+    "/send",
+    response_model=ChatResponse,
+    dependencies=[
+        Depends(rate_limit(settings.RATE_LIMIT_CHAT_SEND, "chat_send")),  # Por usuario
+        Depends(llm_budget),
+    ],
+)
 async def send_message(
     chat_request: ChatRequest,
-    request: Request,  # Necesario para slowapi y debe llamarse 'request'
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Envía un mensaje al chatbot y obtiene una respuesta.
@@ -105,7 +109,7 @@ async def send_message(
     """
     try:
         # Crear el mensaje del usuario
-        user_message = crud_chat.create_message(
+        user_message = await crud_chat.create_message_async(
             db=db,
             user_id=current_user.id,
             role='user',
@@ -113,18 +117,22 @@ async def send_message(
         )
         
         # Obtener o crear sesión metamotivacional
-        session_db = crud_session.get_or_create_session(db, current_user.id)
+        session_db = await crud_session.get_or_create_session_async(db, current_user.id)
         session_schema = crud_session.session_to_schema(session_db)
         
         # Obtener historial reciente de mensajes (últimos 10)
-        chat_history_db = crud_chat.get_user_messages(db, current_user.id, limit=10)
+        chat_history_db = await crud_chat.get_user_messages_async(db, current_user.id, limit=10)
         chat_history = [
             {"role": msg.role, "text": msg.text} 
             for msg in chat_history_db
         ]
         
         # Construir contexto del usuario
-        context = build_user_context(db, current_user)
+        context = await build_user_context(db, current_user)
+
+        # Cerrar la transacción de lectura para devolver la conexión al pool durante la
+        # llamada al LLM; las escrituras finales toman una nueva
+        await db.commit()
         
         # Procesar con el orquestador metamotivacional
         ai_response_text, updated_session, quick_replies = await handle_user_turn(
@@ -135,10 +143,10 @@ async def send_message(
         )
         
         # Guardar sesión actualizada
-        crud_session.update_session(db, current_user.id, updated_session)
+        await crud_session.update_session_async(db, current_user.id, updated_session)
         
         # Crear el mensaje de la IA
-        ai_message = crud_chat.create_message(
+        ai_message = await crud_chat.create_message_async(
             db=db,
             user_id=current_user.id,
             role='model',
@@ -156,19 +164,24 @@ async def send_message(
         logger.error(f"Error procesando mensaje de chat: {e}", exc_info=True)
         # Rollback any pending transactions
         try:
-            db.rollback()
+            await db.rollback()
         except:
             pass
         raise HTTPException(status_code=500, detail="Error al procesar el mensaje")
 
 
-@router.post("/send-stream")
-@limiter.limit("30/minute")  # Más restrictivo para streaming (consume más recursos)
+@router.post(
+    "/send-stream",
+    # Más restrictivo para streaming (consume más recursos)
+    dependencies=[
+        Depends(rate_limit(settings.RATE_LIMIT_CHAT_STREAM, "chat_stream")),
+        Depends(llm_budget),
+    ],
+)
 async def send_message_stream(
     chat_request: ChatRequest,
-    request: Request,  # Necesario para slowapi y debe llamarse 'request'
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Envía un mensaje al chatbot y obtiene una respuesta EN STREAMING.
@@ -184,7 +197,7 @@ async def send_message_stream(
     """
     try:
         # Crear el mensaje del usuario
-        user_message = crud_chat.create_message(
+        user_message = await crud_chat.create_message_async(
             db=db,
             user_id=current_user.id,
             role='user',
@@ -192,18 +205,22 @@ async def send_message_stream(
         )
         
         # Obtener o crear sesión metamotivacional
-        session_db = crud_session.get_or_create_session(db, current_user.id)
+        session_db = await crud_session.get_or_create_session_async(db, current_user.id)
         session_schema = crud_session.session_to_schema(session_db)
         
         # Obtener historial reciente de mensajes (últimos 10)
-        chat_history_db = crud_chat.get_user_messages(db, current_user.id, limit=10)
+        chat_history_db = await crud_chat.get_user_messages_async(db, current_user.id, limit=10)
         chat_history = [
             {"role": msg.role, "text": msg.text} 
             for msg in chat_history_db
         ]
         
         # Construir contexto del usuario
-        context = build_user_context(db, current_user)
+        context = await build_user_context(db, current_user)
+
+        # Cerrar la transacción de lectura para devolver la conexión al pool durante la
+        # llamada al LLM; las escrituras finales toman una nueva
+        await db.commit()
         
         # Variable para acumular el texto completo
         full_response_text = ""
@@ -227,8 +244,7 @@ async def send_message_stream(
                             event["data"]["session"] = session_obj.__dict__
                     
                     # Enviar evento SSE
-                    event_data = json.dumps(event, ensure_ascii=False)
-                    yield f"data: {event_data}\n\n"
+                    yield encode_event(event)
                     
                     # Acumular texto de chunks
                     if event["type"] == "chunk":
@@ -243,15 +259,15 @@ async def send_message_stream(
                             if isinstance(session_dict, dict):
                                 from app.schemas.chat import SessionStateSchema
                                 updated_session = SessionStateSchema(**session_dict)
-                                crud_session.update_session(db, current_user.id, updated_session)
+                                await crud_session.update_session_async(db, current_user.id, updated_session)
                             else:
                                 # Si ya es un schema, guardarlo directamente
-                                crud_session.update_session(db, current_user.id, session_dict)
+                                await crud_session.update_session_async(db, current_user.id, session_dict)
                         
                         # Guardar mensaje de la IA si tenemos texto
                         text_to_save = event["data"].get("full_text") or event["data"].get("text") or full_response_text
                         if text_to_save:
-                            crud_chat.create_message(
+                            await crud_chat.create_message_async(
                                 db=db,
                                 user_id=current_user.id,
                                 role='model',
@@ -262,14 +278,18 @@ async def send_message_stream(
                 logger.error(f"Error en streaming: {e}", exc_info=True)
                 # Rollback the database transaction
                 try:
-                    db.rollback()
+                    await db.rollback()
                 except:
                     pass
                 error_event = {
                     "type": "error",
                     "data": {"message": "Error generando respuesta"}
                 }
-                yield f"data: {json.dumps(error_event)}\n\n"
+                yield encode_event(error_event)
+            finally:
+                # get_async_db ya cerró la sesión al enviar la respuesta; las escrituras de arriba
+                # la reabren, así que hay que devolver la conexión al pool aquí
+                await db.close()
         
         return StreamingResponse(
             event_generator(),
@@ -285,28 +305,107 @@ async def send_message_stream(
         logger.error(f"Error iniciando streaming: {e}", exc_info=True)
         # Rollback any pending transactions
         try:
-            db.rollback()
+            await db.rollback()
         except:
             pass
         raise HTTPException(status_code=500, detail="Error al iniciar streaming")
 
 
+def _history_quick_replies(session_schema, last_message_text: str) -> Optional[List[dict]]:
+    """Quick replies del último mensaje del modelo según el estado de la sesión"""
+    quick_replies = None
+
+    # Detectar mensaje de saludo inicial (iteration = 0 o texto contiene "cómo está tu motivación")
+    if session_schema.iteration == 0 or "cómo está tu motivación" in last_message_text:
+        # Es el saludo inicial
+        quick_replies = [
+            {"label": "😑 Aburrido/a", "value": "Estoy aburrido"},
+            {"label": "😤 Frustrado/a", "value": "Estoy frustrado"},
+            {"label": "😰 Ansioso/a", "value": "Estoy ansioso"},
+            {"label": "🌀 Distraído/a", "value": "Estoy distraído"},
+            {"label": "😔 Desmotivado/a", "value": "Estoy desmotivado"},
+            {"label": "😕 Inseguro/a", "value": "Me siento inseguro"},
+            {"label": "😩 Abrumado/a", "value": "Me siento abrumado"},
+        ]
+    # Si ya hubo interacción (iteration >= 1), mostrar opciones según contexto
+    elif session_schema.iteration >= 1:
+        # Verificar si no estamos en un flujo especial (derivación a bienestar)
+        if "bienestar" in last_message_text and "ejercicio" in last_message_text:
+            if "quieres probar" in last_message_text or "¿quieres" in last_message_text:
+                quick_replies = [
+                    {"label": "🌿 Ir a Bienestar", "value": "NAVIGATE_WELLNESS"},
+                    {"label": "🔄 Seguir con estrategias", "value": "No gracias, sigamos intentando con otras estrategias"}
+                ]
+            elif "ir a bienestar" in last_message_text or "sección de bienestar" in last_message_text:
+                quick_replies = [
+                    {"label": "🌿 Ir a Bienestar", "value": "NAVIGATE_WELLNESS"}
+                ]
+        else:
+            # Es una estrategia normal, mostrar opciones de evaluación
+            quick_replies = [
+                {"label": "✅ Me ayudó, me siento mejor", "value": "me ayudó"},
+                {"label": "❌ No funcionó", "value": "no funcionó"}
+            ]
+
+    return quick_replies
+
+
+async def _stream_history(db: AsyncSession, user_id: int, last_message_id: int, quick_replies: Optional[List[dict]]):
+    """
+    Cuerpo de ChatHistoryResponse codificado mientras se lee el historial, en lotes de
+    HISTORY_BATCH_SIZE mensajes (paginación keyset). La sesión se cierra después de cada
+    lote, así un cliente lento no retiene una conexión del pool durante la descarga.
+    """
+    try:
+        yield b'{"messages":['
+        separator = b""
+        last_row = None
+        while True:
+            rows = await crud_chat.get_user_messages_page_async(db, user_id, after=last_row)
+            await db.close()
+            if not rows:
+                break
+            yield separator + b",".join(
+                orjson.dumps({
+                    "role": row.role,
+                    "text": row.text,
+                    "id": row.id,
+                    "user_id": row.user_id,
+                    "created_at": row.created_at,
+                    "quick_replies": quick_replies if row.id == last_message_id else None,
+                })
+                for row in rows
+            )
+            separator = b","
+            if len(rows) < crud_chat.HISTORY_BATCH_SIZE:
+                break
+            last_row = rows[-1]
+        yield b"]}"
+    except Exception as e:
+        # Los headers ya se enviaron: cortar la respuesta para que el cliente no reciba JSON truncado como válido
+        logger.error(f"Error transmitiendo historial de chat: {e}")
+        raise
+    finally:
+        await db.close()
+
+
 @router.get("/history", response_model=ChatHistoryResponse)
 async def get_chat_history(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Obtiene el historial de chat del usuario actual.
     Incluye quick_replies en el último mensaje si corresponde.
     Si no hay historial, inicia la conversación con el saludo de Flou.
+    El historial se transmite como arreglo JSON a medida que se lee de la DB.
     """
     try:
-        messages = crud_chat.get_user_messages(db, current_user.id)
+        last_message = await crud_chat.get_last_message_async(db, current_user.id)
         
         # Si no hay mensajes, iniciar conversación con el saludo
-        if not messages:
-            session_db = crud_session.get_or_create_session(db, current_user.id)
+        if last_message is None:
+            session_db = await crud_session.get_or_create_session_async(db, current_user.id)
             session_schema = crud_session.session_to_schema(session_db)
             
             if not session_schema.greeted:
@@ -315,7 +414,10 @@ async def get_chat_history(
                 # con un texto de usuario vacío
                 
                 # Construir contexto (necesario para el primer turno)
-                context = build_user_context(db, current_user)
+                context = await build_user_context(db, current_user)
+
+                # Devolver la conexión al pool mientras se genera el saludo
+                await db.commit()
                 
                 welcome_text, updated_session, quick_replies = await handle_user_turn(
                     session=session_schema,
@@ -325,10 +427,10 @@ async def get_chat_history(
                 )
                 
                 # Guardar la sesión actualizada (greeted=True)
-                crud_session.update_session(db, current_user.id, updated_session)
+                await crud_session.update_session_async(db, current_user.id, updated_session)
                 
                 # Guardar el mensaje de bienvenida de la IA en el historial
-                ai_message = crud_chat.create_message(
+                ai_message = await crud_chat.create_message_async(
                     db=db,
                     user_id=current_user.id,
                     role='model',
@@ -348,74 +450,32 @@ async def get_chat_history(
                 # El usuario ya fue saludado pero borró su historial
                 return ChatHistoryResponse(messages=[])
         
-        # Convertir mensajes a schema
-        message_list = [ChatMessageSchema.from_orm(msg) for msg in messages]
-        
-        # Si el último mensaje es del modelo y no es un saludo inicial,
-        # regenerar quick_replies basándose en el estado de la sesión
-        if message_list and message_list[-1].role == 'model':
-            session_db = crud_session.get_or_create_session(db, current_user.id)
+        # Si el último mensaje es del modelo, regenerar quick_replies basándose en el estado de la sesión
+        quick_replies = None
+        if last_message.role == 'model':
+            session_db = await crud_session.get_or_create_session_async(db, current_user.id)
             session_schema = crud_session.session_to_schema(session_db)
-            
-            # Regenerar quick replies basándose en el estado
-            quick_replies = None
-            last_message_text = message_list[-1].text.lower()
-            
-            # Detectar mensaje de saludo inicial (iteration = 0 o texto contiene "cómo está tu motivación")
-            if session_schema.iteration == 0 or "cómo está tu motivación" in last_message_text:
-                # Es el saludo inicial
-                quick_replies = [
-                    {"label": "😑 Aburrido/a", "value": "Estoy aburrido"},
-                    {"label": "😤 Frustrado/a", "value": "Estoy frustrado"},
-                    {"label": "😰 Ansioso/a", "value": "Estoy ansioso"},
-                    {"label": "🌀 Distraído/a", "value": "Estoy distraído"},
-                    {"label": "😔 Desmotivado/a", "value": "Estoy desmotivado"},
-                    {"label": "😕 Inseguro/a", "value": "Me siento inseguro"},
-                    {"label": "😩 Abrumado/a", "value": "Me siento abrumado"},
-                ]
-            # Si ya hubo interacción (iteration >= 1), mostrar opciones según contexto
-            elif session_schema.iteration >= 1:
-                # Verificar si no estamos en un flujo especial (derivación a bienestar)
-                if "bienestar" in last_message_text and "ejercicio" in last_message_text:
-                    if "quieres probar" in last_message_text or "¿quieres" in last_message_text:
-                        quick_replies = [
-                            {"label": "🌿 Ir a Bienestar", "value": "NAVIGATE_WELLNESS"},
-                            {"label": "🔄 Seguir con estrategias", "value": "No gracias, sigamos intentando con otras estrategias"}
-                        ]
-                    elif "ir a bienestar" in last_message_text or "sección de bienestar" in last_message_text:
-                        quick_replies = [
-                            {"label": "🌿 Ir a Bienestar", "value": "NAVIGATE_WELLNESS"}
-                        ]
-                else:
-                    # Es una estrategia normal, mostrar opciones de evaluación
-                    quick_replies = [
-                        {"label": "✅ Me ayudó, me siento mejor", "value": "me ayudó"},
-                        {"label": "❌ No funcionó", "value": "no funcionó"}
-                    ]
-            
-            # Agregar quick_replies al último mensaje si existen
-            if quick_replies:
-                # Crear una versión modificada del último mensaje con quick_replies
-                # Nota: Pydantic no permite modificar directamente, así que creamos uno nuevo
-                last_msg_dict = message_list[-1].dict()
-                last_msg_dict['quick_replies'] = quick_replies
-                message_list[-1] = ChatMessageSchema(**last_msg_dict)
-        
-        return ChatHistoryResponse(messages=message_list)
+            quick_replies = _history_quick_replies(session_schema, last_message.text.lower())
+        last_message_id = last_message.id
     except Exception as e:
         logger.error(f"Error obteniendo historial de chat: {e}")
         # Rollback any pending transactions to prevent cascading errors
         try:
-            db.rollback()
+            await db.rollback()
         except:
             pass
         raise HTTPException(status_code=500, detail="Error al obtener el historial")
+    
+    return StreamingResponse(
+        _stream_history(db, current_user.id, last_message_id, quick_replies),
+        media_type="application/json"
+    )
 
 
 @router.delete("/history")
 def clear_chat_history(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Elimina todo el historial de chat del usuario actual.
@@ -437,17 +497,17 @@ def clear_chat_history(
         raise HTTPException(status_code=500, detail="Error al eliminar el historial")
 
 
-@router.post("/profile-summary", response_model=ProfileSummaryResponse)
+@router.post("/profile-summary", response_model=ProfileSummaryResponse, dependencies=[Depends(llm_budget)])
 async def get_profile_summary(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Genera un resumen personalizado del perfil del usuario usando IA.
     """
     try:
         # Obtener el perfil del usuario
-        profile = get_profile(db, current_user.id)
+        profile = await get_profile_async(db, current_user.id)
         
         if not profile:
             raise HTTPException(status_code=404, detail="Perfil no encontrado")
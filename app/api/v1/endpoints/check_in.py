@@ -1,40 +1,41 @@
-from datetime import date
 from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.models.user import User
-from app.models.daily_check_in import DailyCheckIn
+from app.core.principal_cache import Principal
 from app.crud import crud_daily_check_in
 from app.schemas.daily_check_in import DailyCheckInCreate, DailyCheckInRead
 from app.services import ai_service
 
 router = APIRouter()
 
-@router.post("/", response_model=DailyCheckInRead, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/",
+    response_model=DailyCheckInRead,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(deps.llm_budget)],
+)
 async def submit_daily_check_in(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: Principal = Depends(deps.get_current_user),
     check_in_in: DailyCheckInCreate
 ):
     """
     Guarda o actualiza el check-in de motivación diario para el usuario autenticado.
     """
     # 1. Obtener el check-in anterior (antes de hoy) para comparar
-    previous_check_in = db.query(DailyCheckIn).filter(
-        DailyCheckIn.user_id == current_user.id,
-        DailyCheckIn.date < date.today()
-    ).order_by(DailyCheckIn.date.desc()).first()
+    previous_check_in = await crud_daily_check_in.get_previous_check_in_async(db, current_user.id)
     
     previous_level = previous_check_in.motivation_level if previous_check_in else None
 
     # 2. Guardar el nuevo check-in
-    check_in = crud_daily_check_in.save_check_in(
+    check_in = await crud_daily_check_in.save_check_in_async(
         db=db, user_id=current_user.id, check_in_in=check_in_in
     )
     
-    # 3. Generar feedback con IA
+    # 3. Generar feedback con IA (save_check_in_async ya hizo commit: no se retiene
+    #    ninguna conexión mientras se espera al LLM)
     feedback = await ai_service.generate_checkin_feedback(
         current_level=check_in.motivation_level,
         previous_level=previous_level
@@ -1,15 +1,13 @@
 from typing import List
-from datetime import date, timedelta
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.models.user import User
-from app.models.daily_check_in import DailyCheckIn
+from app.core.principal_cache import Principal
 from app.schemas.daily_check_in import DailyCheckInRead
 from app.crud import crud_dashboard
-from app.schemas.dashboard import SectionAverage
-from app.crud import crud_daily_check_in, crud_answer
+from app.schemas.dashboard import SectionAverage, DashboardBundle
+from app.crud import crud_daily_check_in, crud_answer, crud_completion
 from app.schemas.answer import AnswerRead
 
 router = APIRouter()
@@ -18,21 +16,14 @@ router = APIRouter()
 def get_motivation_history(
     # ... (código del endpoint existente)
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
-    start_date = date.today() - timedelta(days=6)
-    results = (
-        db.query(DailyCheckIn)
-        .filter(DailyCheckIn.user_id == current_user.id, DailyCheckIn.date >= start_date)
-        .order_by(DailyCheckIn.date.asc())
-        .all()
-    )
-    return results
+    return crud_daily_check_in.get_recent_check_ins(db=db, user_id=current_user.id, days=7)
 
 @router.get("/questionnaire-summary", response_model=List[SectionAverage])
 def get_questionnaire_summary_data(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Obtiene el puntaje promedio por sección para el usuario autenticado.
@@ -46,7 +37,7 @@ def get_questionnaire_summary_data(
 @router.get("/streak", response_model=dict)
 def get_user_streak_endpoint(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Obtiene la racha de check-ins consecutivos del usuario actual.
@@ -58,7 +49,7 @@ def get_user_streak_endpoint(
 @router.get("/path-streak", response_model=dict)
 def get_path_streak_endpoint(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Obtiene la racha de días consecutivos usando el path (contenidos o lecciones).
@@ -67,12 +58,31 @@ def get_path_streak_endpoint(
     return {"streak": streak}
 
 
+@router.get("/bundle", response_model=DashboardBundle)
+def get_dashboard_bundle(
+    db: Session = Depends(deps.get_db),
+    current_user: Principal = Depends(deps.get_current_user)
+):
+    """
+    Obtiene todos los datos de la pantalla de dashboard en una sola llamada:
+    historial de motivación, resumen del cuestionario, rachas y estadísticas de bienestar.
+    Comparte una sola autenticación y una sola sesión de base de datos.
+    """
+    return {
+        "motivation_history": crud_daily_check_in.get_recent_check_ins(db=db, user_id=current_user.id, days=7),
+        "questionnaire_summary": crud_dashboard.get_questionnaire_summary(db=db, user_id=current_user.id),
+        "streak": crud_dashboard.get_user_streak(db=db, user_id=current_user.id),
+        "path_streak": crud_dashboard.get_path_streak(db=db, user_id=current_user.id),
+        "wellness_stats": crud_completion.get_wellness_stats(db, current_user.id),
+    }
+
+
 @router.get("/admin/user/{user_id}/motivation-history", response_model=List[DailyCheckInRead])
 def get_user_motivation_history(
     *,
     db: Session = Depends(deps.get_db),
     # Protección: Solo psicólogos pueden acceder
-    current_psychologist: User = Depends(deps.get_current_psychologist_user),
+    current_psychologist: Principal = Depends(deps.get_current_psychologist_user),
     user_id: int  # El ID del estudiante que se está consultando
 ):
     """
@@ -88,7 +98,7 @@ def get_user_questionnaire_summary(
     *,
     db: Session = Depends(deps.get_db),
     # Protección: Solo psicólogos pueden acceder
-    current_psychologist: User = Depends(deps.get_current_psychologist_user),
+    current_psychologist: Principal = Depends(deps.get_current_psychologist_user),
     user_id: int
 ):
     """
@@ -103,7 +113,7 @@ def get_user_answers(
     *,
     db: Session = Depends(deps.get_db),
     # Protección: Solo psicólogos pueden acceder
-    current_psychologist: User = Depends(deps.get_current_psychologist_user),
+    current_psychologist: Principal = Depends(deps.get_current_psychologist_user),
     user_id: int
 ):
     """
@@ -4,7 +4,7 @@ from app.db.session import get_db
 from app.schemas.feedback import FeedbackCreate, FeedbackResponse
 from app.crud import crud_feedback
 from app.api.deps import get_current_user
-from app.models.user import User
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
@@ -12,7 +12,7 @@ router = APIRouter()
 def submit_feedback(
     feedback: FeedbackCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Enviar feedback, reporte de error o sugerencia.
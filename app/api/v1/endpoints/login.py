@@ -1,3 +1,4 @@
+import asyncio
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordRequestForm
@@ -9,21 +10,27 @@ from app.core import security
 from app.core.config import settings
 from app.crud import crud_user
 from app.crud import crud_refresh_token
-from app.schemas.token import Token, TokenWithRefresh, RefreshTokenRequest
-from app.models.user import User
+from app.schemas.token import TokenWithRefresh, RefreshTokenRequest
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
 @router.post("/login/access-token", response_model=TokenWithRefresh)
-def login_for_access_token(
+async def login_for_access_token(
     db: Session = Depends(deps.get_db),
     form_data: OAuth2PasswordRequestForm = Depends(),
-    user_agent: Optional[str] = Header(None)
+    user_agent: Optional[str] = Header(None),
+    x_device_id: Optional[str] = Header(None, max_length=64)
 ):
     """
     OAuth2 compatible token login, get an access token and refresh token for future requests.
+    Clients should send a stable X-Device-Id (generated once and stored on the device):
+    they get one refresh-token family per device and logging in again replaces it.
+    Without it every login gets its own family, and only the newest
+    REFRESH_TOKEN_MAX_ANONYMOUS_FAMILIES of those are kept per user, so an older
+    session on another device may be signed out.
     """
-    user = crud_user.authenticate_user(
+    user = await crud_user.authenticate_user(
         db, email=form_data.username, password=form_data.password
     )
     if not user:
@@ -35,28 +42,31 @@ def login_for_access_token(
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    # Crear access token con rol
+    # Crear access token con rol, id y versión de token
     access_token = security.create_access_token(
-        data={"sub": user.email, "role": user.role},
+        data=security.access_token_claims(user),
         expires_delta=access_token_expires
     )
     
-    # Crear refresh token (válido por 30 días)
-    refresh_token_obj = crud_refresh_token.create_user_refresh_token(
+    # Crear refresh token (válido por 30 días); reemplaza el anterior de este dispositivo
+    _, refresh_token = await asyncio.to_thread(
+        crud_refresh_token.create_user_refresh_token,
         db=db,
         user_id=user.id,
-        device_info=user_agent or "unknown",
-        expires_days=30
+        device_id=x_device_id,
+        user_agent=user_agent,
+        expires_days=30,
+        max_anonymous_families=settings.REFRESH_TOKEN_MAX_ANONYMOUS_FAMILIES
     )
     
     return {
         "access_token": access_token,
-        "refresh_token": refresh_token_obj.token,
+        "refresh_token": refresh_token,
         "token_type": "bearer"
     }
 
 
-@router.post("/login/refresh-token", response_model=Token)
+@router.post("/login/refresh-token", response_model=TokenWithRefresh)
 def refresh_access_token(
     *,
     db: Session = Depends(deps.get_db),
@@ -64,19 +74,23 @@ def refresh_access_token(
 ):
     """
     Usa un refresh token válido para obtener un nuevo access token.
+    El refresh token rota: la respuesta trae uno nuevo que reemplaza al enviado.
     """
-    # Verificar que el refresh token existe y es válido
-    refresh_token = crud_refresh_token.get_refresh_token(
+    # Verificar que el refresh token es válido y rotarlo dentro de su familia
+    rotated = crud_refresh_token.rotate_refresh_token(
         db=db,
-        token=refresh_request.refresh_token
+        token=refresh_request.refresh_token,
+        expires_days=30,
+        reuse_grace_seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS
     )
     
-    if not refresh_token:
+    if not rotated:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Refresh token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    refresh_token, new_refresh_token = rotated
     
     # Obtener el usuario asociado
     user = crud_user.get_user_by_id(db=db, user_id=refresh_token.user_id)
@@ -90,11 +104,15 @@ def refresh_access_token(
     # Crear nuevo access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        data={"sub": user.email, "role": user.role},
+        data=security.access_token_claims(user),
         expires_delta=access_token_expires
     )
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "refresh_token": new_refresh_token,
+        "token_type": "bearer"
+    }
 
 
 @router.post("/login/logout")
@@ -124,14 +142,16 @@ def logout(
 def logout_all_devices(
     *,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
     """
     Revoca todos los refresh tokens del usuario (cierra sesión en todos los dispositivos).
+    También invalida los access tokens ya emitidos, incluido el de esta petición.
     """
     count = crud_refresh_token.revoke_all_user_tokens(
         db=db,
         user_id=current_user.id
     )
+    crud_user.revoke_access_tokens(db=db, user_id=current_user.id)
     
     return {"message": f"Sesión cerrada en {count} dispositivo(s)"}
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.models.user import User
+from app.core.principal_cache import Principal
 from app.crud import crud_user_profile
 from app.schemas.user_profile import UserProfileRead, UserProfileUpdate, UserProfileCreate
 
@@ -13,7 +13,7 @@ router = APIRouter()
 @router.get("/profile/me", response_model=UserProfileRead)
 def read_user_profile_me(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
 ):
     """
     Obtener el perfil del usuario actual.
@@ -30,7 +30,7 @@ def read_user_profile_me(
 def create_or_update_user_profile_me(
     *,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
+    current_user: Principal = Depends(deps.get_current_user),
     profile_in: UserProfileUpdate,
 ):
     """
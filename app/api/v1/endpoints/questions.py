@@ -1,37 +1,33 @@
 from typing import List
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy.orm import Session
 
 from app.api import deps
-from app.crud import crud_question, crud_answer
-from app.models.user import User
+from app.crud import crud_answer
+from app.core.principal_cache import Principal
 from app.schemas.question import QuestionRead
 from app.schemas.answer import AnswersRequest # Importar el nuevo schema
+from app.services.catalog_cache import catalog_cache
 
 router = APIRouter()
 
 @router.get("/", response_model=List[QuestionRead])
 def read_questions(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: Principal = Depends(deps.get_current_user)
 ):
-    # ... (código existente del GET) ...
-    questions = crud_question.get_all_questions_randomized(db)
-    response_data = []
-    for q in questions:
-        response_data.append({
-            "id": q.id,
-            "text": q.text,
-            "section_name": q.section.name
-        })
-    return response_data
+    """
+    Todas las preguntas en orden aleatorio.
+    Se barajan las preguntas ya serializadas del catálogo en memoria (sin consultar la DB).
+    """
+    return Response(content=catalog_cache.questions_payload(db), media_type="application/json")
 
 # --- NUEVO ENDPOINT ---
 @router.post("/answers", status_code=status.HTTP_201_CREATED)
 def submit_answers(
     *,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user), # Seguridad
+    current_user: Principal = Depends(deps.get_current_user), # Seguridad
     answers_in: AnswersRequest
 ):
     """
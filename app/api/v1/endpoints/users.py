@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -8,33 +9,33 @@ from app.schemas.user import UserCreate, PsychologistCreate, UserRead
 from app.schemas.token import Token
 from app.core import security
 from app.core.config import settings
-from app.models.user import User
+from app.core.principal_cache import Principal
 
 router = APIRouter()
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register_new_user(
+async def register_new_user(
     *,
     db: Session = Depends(deps.get_db),
     user_in: UserCreate
 ):
     """
     Crea un nuevo usuario ALUMNO (student) y devuelve un token.
-    (Esta función no tiene cambios de seguridad)
+    bcrypt corre en el pool de procesos sin ocupar hilo ni conexión mientras tanto.
     """
-    user = crud_user.get_user_by_email(db, email=user_in.email)
-    if user:
+    if await asyncio.to_thread(crud_user.is_email_registered, db, user_in.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado.",
         )
     
-    user = crud_user.create_user(db, user=user_in) # Esto crea un 'student'
+    hashed_password = await security.aget_password_hash(user_in.password)
+    user = await asyncio.to_thread(crud_user.create_user, db, user_in, hashed_password) # Esto crea un 'student'
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     access_token = security.create_access_token(
-        data={"sub": user.email, "role": user.role},
+        data=security.access_token_claims(user),
         expires_delta=access_token_expires
     )
     
@@ -42,7 +43,7 @@ def register_new_user(
 
 
 @router.post("/register-psychologist", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register_new_psychologist(
+async def register_new_psychologist(
     *,
     db: Session = Depends(deps.get_db),
     user_in: PsychologistCreate # <-- El schema ahora contiene 'invite_key'
@@ -59,23 +60,24 @@ def register_new_psychologist(
         )
 
     # Si la llave es correcta, procedemos a crear el usuario
-    user = crud_user.get_user_by_email(db, email=user_in.email)
-    if user:
+    if await asyncio.to_thread(crud_user.is_email_registered, db, user_in.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado.",
         )
     
-    user = crud_user.create_psychologist_user(
+    hashed_password = await security.aget_password_hash(user_in.password)
+    user = await asyncio.to_thread(
+        crud_user.create_psychologist_user,
         db, 
         email=user_in.email, 
-        password=user_in.password
+        hashed_password=hashed_password
     )
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     access_token = security.create_access_token(
-        data={"sub": user.email, "role": user.role}, # <-- "role" será "psychologist"
+        data=security.access_token_claims(user), # <-- "role" será "psychologist"
         expires_delta=access_token_expires
     )
     
@@ -86,7 +88,7 @@ def get_all_students(
     *,
     db: Session = Depends(deps.get_db),
     # Esta es la protección: solo un psicólogo puede llamar a este endpoint
-    current_psychologist: User = Depends(deps.get_current_psychologist_user)
+    current_psychologist: Principal = Depends(deps.get_current_psychologist_user)
 ):
     """
     Obtiene una lista de todos los usuarios "student".
@@ -1,10 +1,11 @@
+import json
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.api.deps import get_db, get_current_user
-from app.models.user import User
+from app.core.principal_cache import Principal
 from app.schemas.wellness import (
     WellnessExercise,
     MetamotivationEnergy,
@@ -16,9 +17,9 @@ from app.schemas.wellness import (
     ExerciseRecommendationRequest,
     ExerciseRecommendationResponse
 )
-from app.crud import crud_wellness, crud_energy, crud_completion
-from app.services.ai_service import model
-import json
+from app.crud import crud_wellness, crud_energy, crud_completion, crud_wellness_summary
+from app.services import wellness_summaries
+from app.services.exercise_catalog import exercise_catalog
 
 router = APIRouter()
 
@@ -27,7 +28,7 @@ router = APIRouter()
 def save_energy_state(
     energy_data: MetamotivationEnergyCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Guardar el estado de energía metamotivacional del usuario
@@ -49,7 +50,7 @@ def get_energy_history(
     skip: int = 0,
     limit: int = 30,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener el historial de estados de energía del usuario"""
     return crud_energy.get_energy_records(db, current_user.id, skip, limit)
@@ -58,7 +59,7 @@ def get_energy_history(
 @router.get("/energy/today", response_model=List[MetamotivationEnergy])
 def get_todays_energy(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener los registros de energía de hoy"""
     return crud_energy.get_todays_energy_records(db, current_user.id)
@@ -66,23 +67,28 @@ def get_todays_energy(
 
 @router.get("/energy/stats")
 def get_energy_statistics(
-    days: int = 30,
+    days: int = Query(30, ge=1, le=3650),
+    daily: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Obtener estadísticas de energía de los últimos N días"""
-    return crud_energy.get_energy_stats(db, current_user.id, days)
+    """
+    Obtener estadísticas de energía de los últimos N días.
+    Con daily=true se incluye el conteo por día y estado.
+    """
+    return crud_energy.get_energy_stats(db, current_user.id, days, daily)
 
 
 @router.post("/exercises/recommend", response_model=ExerciseRecommendationResponse)
 def get_exercise_recommendation(
     request: ExerciseRecommendationRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Obtener una recomendación de ejercicio basada en el estado del semáforo.
-    La IA genera un resumen personalizado del ejercicio.
+    El resumen personalizado del ejercicio viene de los pre-generados por IA.
+    El ejercicio sale del catálogo ya serializado, sin pasar por response_model.
     """
     energy_state = request.energy_state.lower()
     
@@ -95,54 +101,21 @@ def get_exercise_recommendation(
         )
     
     # Obtener un ejercicio aleatorio que no se haya hecho hoy
-    exercise = crud_wellness.get_random_exercise_for_user(db, current_user.id, energy_state)
+    entry = crud_wellness.get_random_exercise_for_user(db, current_user.id, energy_state)
     
-    if not exercise:
+    if not entry:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No se encontraron ejercicios disponibles para este estado"
         )
     
-    # Parsear los pasos y scripts de voz
-    try:
-        steps_list = json.loads(exercise.steps)
-        voice_scripts = json.loads(exercise.voice_scripts)
-    except json.JSONDecodeError:
-        steps_list = [exercise.steps]
-        voice_scripts = [exercise.voice_scripts]
-    
-    # Generar resumen con IA
-    prompt = f"""
-Como Newra, el asistente de bienestar de MetaMind, genera un resumen breve y motivador para el siguiente ejercicio de mindfulness.
-
-El usuario ha indicado que su estado de metamotivación actual es: **{energy_state}**
-
-**Ejercicio seleccionado:**
-- Nombre: {exercise.name}
-- Objetivo: {exercise.objective}
-- Duración: {exercise.duration_seconds} segundos
-- Contexto: {exercise.context}
-
-**Lo que trabaja:**
-{exercise.taxonomy}
+    # Resumen pre-generado por IA: se sirve desde la tabla, el LLM queda fuera del request
+    # (los faltantes u obsoletos se regeneran en segundo plano)
+    summaries = crud_wellness_summary.get_summaries(db, entry.id, energy_state)
+    ai_summary = wellness_summaries.choose_summary(summaries, entry, energy_state, current_user.id)
 
-**Pasos básicos:**
-{chr(10).join(f"{i+1}. {step}" for i, step in enumerate(steps_list[:3]))}
-
-Genera un resumen de 2-3 oraciones que:
-1. Valide cómo se siente el usuario según su estado del semáforo
-2. Explique brevemente cómo este ejercicio le ayudará
-3. Sea motivador y empático
-
-Responde SOLO con el resumen, sin saludos ni despedidas.
-"""
-    
-    try:
-        response = model.generate_content(prompt)
-        ai_summary = response.text.strip()
-    except Exception as e:
-        # Fallback si falla la IA
-        ai_summary = f"Este ejercicio de {exercise.duration_seconds} segundos te ayudará a trabajar en {exercise.taxonomy.split(';')[0]}. Es perfecto para tu estado actual."
+    # Confirma el puntero de rotación si se creó en este request
+    db.commit()
     
     # Determinar la razón de la recomendación
     estado_map = {
@@ -153,11 +126,14 @@ Responde SOLO con el resumen, sin saludos ni despedidas.
     
     reason = f"Este ejercicio es ideal para tu estado actual de {estado_map[energy_state]}"
     
-    return ExerciseRecommendationResponse(
-        exercise=exercise,
-        ai_summary=ai_summary,
-        reason=reason
-    )
+    # Mismo JSON que ExerciseRecommendationResponse, con el ejercicio pre-serializado
+    content = b"".join((
+        b'{"exercise":', entry.payload,
+        b',"ai_summary":', json.dumps(ai_summary, ensure_ascii=False).encode("utf-8"),
+        b',"reason":', json.dumps(reason, ensure_ascii=False).encode("utf-8"),
+        b"}"
+    ))
+    return Response(content=content, media_type="application/json")
 
 
 @router.get("/exercises", response_model=List[WellnessExercise])
@@ -165,17 +141,17 @@ def get_all_exercises(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Obtener todos los ejercicios disponibles"""
-    return crud_wellness.get_exercises(db, skip, limit)
+    """Obtener todos los ejercicios disponibles (pre-serializados en el catálogo en memoria)"""
+    return Response(content=exercise_catalog.exercises_payload(db, skip, limit), media_type="application/json")
 
 
 @router.get("/exercises/{exercise_id}", response_model=WellnessExercise)
 def get_exercise(
     exercise_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener un ejercicio específico por ID"""
     exercise = crud_wellness.get_exercise(db, exercise_id)
@@ -191,7 +167,7 @@ def get_exercise(
 def delete_exercise(
     exercise_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Eliminar un ejercicio específico por ID.
@@ -210,7 +186,7 @@ def delete_exercise(
 def complete_exercise_direct(
     completion_data: ExerciseCompletionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Completar un ejercicio directamente (sin dos pasos).
@@ -246,7 +222,7 @@ def complete_exercise_direct(
 def start_exercise(
     completion_data: ExerciseCompletionCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Iniciar un ejercicio (crear registro de completación).
@@ -268,7 +244,7 @@ def complete_exercise(
     completion_id: int,
     completion_update: ExerciseCompletionUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Actualizar una completación de ejercicio (marcar como completado, agregar mediciones post)
@@ -296,7 +272,7 @@ def get_my_completions(
     skip: int = 0,
     limit: int = 50,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener el historial de completaciones del usuario"""
     return crud_completion.get_user_completions(db, current_user.id, skip, limit)
@@ -305,7 +281,7 @@ def get_my_completions(
 @router.get("/completions/today", response_model=List[ExerciseCompletion])
 def get_todays_completions(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener las completaciones de hoy"""
     return crud_completion.get_todays_completions(db, current_user.id)
@@ -314,34 +290,30 @@ def get_todays_completions(
 @router.get("/stats")
 def get_wellness_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener estadísticas de bienestar: racha y total de ejercicios completados"""
-    streak = crud_completion.get_completion_streak(db, current_user.id)
-    total_completions = crud_completion.get_total_completions(db, current_user.id)
-    last_completion = crud_completion.get_last_completion_date(db, current_user.id)
-    
-    return {
-        "streak": streak,
-        "total_completions": total_completions,
-        "last_completion": last_completion
-    }
+    return crud_completion.get_wellness_stats(db, current_user.id)
 
 
 @router.get("/stats/exercises")
 def get_exercise_stats(
-    days: int = 30,
+    days: int = Query(30, ge=1, le=3650),
+    daily: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    """Obtener estadísticas de ejercicios completados"""
-    return crud_wellness.get_user_exercise_stats(db, current_user.id, days)
+    """
+    Obtener estadísticas de ejercicios completados.
+    Con daily=true se incluye el total por día.
+    """
+    return crud_wellness.get_user_exercise_stats(db, current_user.id, days, daily)
 
 
 @router.get("/stats/streak")
 def get_completion_streak(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """Obtener la racha de días consecutivos con ejercicios completados"""
     streak = crud_completion.get_completion_streak(db, current_user.id)
@@ -10,17 +10,110 @@ class Settings(BaseSettings):
     DB_USER: Optional[str] = None
     DB_PASS: Optional[str] = None
     DATABASE_URL: Optional[str] = None
+    # "require" en Azure; "disable"/"prefer" para un PostgreSQL local
+    DB_SSLMODE: str = "require"
+    # Si el esquema no está al día, el worker corre el bootstrap en vez de fallar (desarrollo local)
+    DB_AUTO_BOOTSTRAP: bool = False
+
+    # Pool de conexiones. DB_MAX_CONNECTIONS es el total de la app (todos los workers y ambos
+    # motores); debe quedar bajo max_connections del servidor menos las reservadas.
+    # DB_POOL_SIZE / DB_MAX_OVERFLOW fuerzan valores por motor en vez de calcularlos.
+    # DB_POOL_MODE: "queue" (pool propio) o "transaction" (PgBouncer / pooler de Azure, NullPool)
+    DB_MAX_CONNECTIONS: int = 40
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT_SECONDS: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 300
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_MODE: str = "queue"
+    # Workers de gunicorn (la misma variable que gunicorn usa por defecto para --workers)
+    WEB_CONCURRENCY: int = 2
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
+
+    # Métricas de SQL por request (Server-Timing + log). Con STRICT el exceso es un error
+    QUERY_BUDGET_PER_REQUEST: int = 30
+    QUERY_N_PLUS_ONE_THRESHOLD: int = 5
+    QUERY_BUDGET_STRICT: bool = False
+
+    # Rate limiting por usuario (token bucket). "postgres" comparte el cupo entre workers;
+    # "local" cuenta en memoria de cada proceso (desarrollo / SQLite)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "postgres"
+    RATE_LIMIT_CHAT_SEND: str = "50/minute"
+    RATE_LIMIT_CHAT_STREAM: str = "30/minute"
+
+    # Presupuesto de tokens del LLM (mismo backend que el rate limiting). Agotado, las
+    # respuestas salen de heurísticas/plantillas en vez de fallar
+    LLM_BUDGET_ENABLED: bool = True
+    LLM_USER_TOKEN_BUDGET: str = "100000/hour"
+    LLM_GLOBAL_TOKEN_BUDGET: str = "5000000/hour"
+
+    # Endpoint /metrics (Prometheus). Si METRICS_TOKEN está definido se exige "Bearer <token>".
+    # Con varios workers, PROMETHEUS_MULTIPROC_DIR (variable de entorno, ver startup.sh) agrega sus valores
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None
+
+    # Caché de principals en get_current_user (por proceso); 0 la desactiva
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Hashing de contraseñas (bcrypt). Cambiar BCRYPT_ROUNDS rehashea en el siguiente login.
+    # PASSWORD_HASH_WORKERS=0 hashea en el mismo proceso (sin pool).
+    # PASSWORD_HASH_MAX_QUEUE se limita a la mitad del threadpool (ver app/core/security.py)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 16
+
+    # Limpieza periódica de refresh tokens expirados/revocados
+    REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS: int = 3600
+    REFRESH_TOKEN_SWEEP_BATCH_SIZE: int = 1000
+    # Margen para reintentos con el refresh token recién rotado antes de tratarlo como robo
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: int = 30
+    # Familias por login (clientes que no envían X-Device-Id) que se conservan por usuario;
+    # un login nuevo descarta las más antiguas
+    REFRESH_TOKEN_MAX_ANONYMOUS_FAMILIES: int = 5
+
     # Psychologist Invite
     PSYCHOLOGIST_INVITE_KEY: str
     
     # Google Gemini API
     GEMINI_API_KEY: str
+
+    # Proveedor LLM: "gemini" o "stub" (local, determinístico y sin red; para carga y benchmarks)
+    LLM_PROVIDER: str = "gemini"
+    LLM_STUB_LATENCY_MS: int = 300
+    LLM_STUB_CHUNK_INTERVAL_MS: int = 40
+    LLM_STUB_CHUNK_WORDS: int = 8
+    LLM_STUB_FAILURE_RATE: float = 0.0
+    LLM_STUB_SEED: int = 0
+
+    # Control de admisión de llamadas al LLM. LLM_MAX_CONCURRENCY es el total de la app
+    # (se reparte entre los WEB_CONCURRENCY workers); el resto espera en cola por prioridad
+    # (guardrail > chat > check-in/resúmenes) y, si la espera se alarga, recibe el fallback
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_MAX_QUEUE: int = 64
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    LLM_GUARDRAIL_QUEUE_TIMEOUT_SECONDS: float = 15.0
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+
+    # Resiliencia de las llamadas al LLM (ver app/services/llm_resilience.py): reintentos con
+    # jitter, hedging de llamadas cortas y circuit breaker (modo solo heurísticas)
+    LLM_RETRY_ATTEMPTS: int = 2
+    LLM_RETRY_BASE_DELAY_MS: int = 200
+    LLM_RETRY_MAX_DELAY_MS: int = 2000
+    LLM_HEDGE_AFTER_MS: int = 1500
+    LLM_HEDGE_PURPOSES: str = "guardrail,slots"
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_OPEN_SECONDS: float = 30.0
+
+    # Resúmenes de ejercicios de bienestar pre-generados (scripts/generate_wellness_summaries.py).
+    # El endpoint sirve desde la tabla y regenera en segundo plano los que superan la edad máxima
+    WELLNESS_SUMMARY_VARIANTS: int = 3
+    WELLNESS_SUMMARY_MAX_AGE_HOURS: int = 168
     
     # Azure específico
     SCM_DO_BUILD_DURING_DEPLOYMENT: Optional[str] = None
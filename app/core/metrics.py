@@ -0,0 +1,259 @@
+# app/core/metrics.py
+
+"""
+Métricas Prometheus de la API (expuestas en GET /metrics).
+
+- HTTP: latencia por método, ruta (plantilla, no la URL concreta) y estado.
+- LLM: latencia por propósito (guardrail, slots, chat, checkin, summary, wellness),
+  tokens de entrada/salida y tiempo hasta el primer fragmento en streaming;
+  cola de admisión (espera, llamadas en curso/en cola, descartes por sobrecarga);
+  reintentos, hedging y estado del circuit breaker.
+- Pool de SQLAlchemy: conexiones en uso y overflow.
+- Rate limiting: rechazos por ruta; presupuesto de tokens del LLM agotado (usuario/global).
+- Hashing de contraseñas: profundidad de la cola del pool de bcrypt y rechazos.
+
+Con gunicorn cada worker es un proceso distinto. Si PROMETHEUS_MULTIPROC_DIR está
+definida (ver startup.sh y gunicorn.conf.py), cada proceso escribe sus valores en ese
+directorio y /metrics los agrega con MultiProcessCollector; sin ella se exponen los
+valores del proceso actual (desarrollo local).
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Buckets pensados para los tiempos de esta API: endpoints de DB en ms, LLM en segundos
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latencia de requests HTTP por ruta",
+    ("method", "route", "status"),
+    buckets=HTTP_BUCKETS,
+)
+
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Latencia de llamadas al LLM por propósito (en streaming, hasta el último fragmento)",
+    ("provider", "purpose", "outcome"),
+    buckets=LLM_BUCKETS,
+)
+
+LLM_STREAM_FIRST_CHUNK = Histogram(
+    "llm_stream_first_chunk_seconds",
+    "Tiempo hasta el primer fragmento en respuestas en streaming",
+    ("provider", "purpose"),
+    buckets=LLM_BUCKETS,
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens enviados (input) y recibidos (output) del LLM",
+    ("provider", "purpose", "direction"),
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Conexiones del pool de SQLAlchemy en uso",
+    ("pool",),
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Conexiones abiertas por encima de pool_size",
+    ("pool",),
+    multiprocess_mode="livesum",
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rechazados por rate limiting",
+    ("route",),
+)
+
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Espera en la cola de admisión antes de llamar al LLM",
+    ("purpose", "outcome"),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 15),
+)
+
+LLM_SHED = Counter(
+    "llm_shed_total",
+    "Llamadas al LLM descartadas por sobrecarga (se respondió con fallback)",
+    ("purpose", "reason"),
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight_calls",
+    "Llamadas al LLM en curso",
+    multiprocess_mode="livesum",
+)
+
+LLM_QUEUED = Gauge(
+    "llm_queued_calls",
+    "Llamadas al LLM esperando en la cola de admisión",
+    multiprocess_mode="livesum",
+)
+
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Reintentos de llamadas al LLM tras errores transitorios",
+    ("purpose",),
+)
+
+LLM_HEDGED = Counter(
+    "llm_hedged_requests_total",
+    "Llamadas de respaldo (hedging) lanzadas, por cuál respondió primero",
+    ("purpose", "winner"),
+)
+
+LLM_CIRCUIT_STATE = Gauge(
+    "llm_circuit_state",
+    "Circuit breaker del LLM: 0 cerrado, 1 semiabierto, 2 abierto (solo heurísticas)",
+    multiprocess_mode="livemax",
+)
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Hashes de bcrypt en curso o esperando en el pool de procesos",
+    multiprocess_mode="livesum",
+)
+
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Logins/registros rechazados con 503 por cola de hashing llena",
+)
+
+LLM_BUDGET_EXHAUSTED = Counter(
+    "llm_budget_exhausted_total",
+    "Requests atendidos sin LLM por presupuesto de tokens agotado",
+    ("budget",),
+)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get(MULTIPROCESS_DIR_ENV))
+
+
+def render_metrics() -> tuple:
+    """Devuelve (payload, content_type) para /metrics, agregando todos los workers si corresponde."""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Hook de gunicorn (child_exit): descarta los gauges `live*` del worker que terminó."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+def route_label(scope) -> str:
+    """Plantilla de la ruta (/api/v1/path/sections/{id}) para no crear una serie por URL."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+def install_pool_metrics(engine: Engine, name: str = "sync") -> None:
+    """
+    Mantiene los gauges del pool con cada checkout/checkin. `name` distingue el motor sync
+    del async.
+
+    El evento checkin se emite antes de que la conexión vuelva al pool (pool.checkedout()
+    todavía la cuenta), así que el gauge se lleva con inc/dec en vez de leer el pool.
+    Las conexiones separadas del pool (detach) nunca hacen checkin y se descuentan ahí.
+    """
+    pool = engine.pool
+    pool_size = pool.size() if hasattr(pool, "size") else None
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    overflow = DB_POOL_OVERFLOW.labels(name)
+    lock = threading.Lock()
+    in_use = 0
+
+    def _track(delta: int) -> None:
+        nonlocal in_use
+        with lock:
+            in_use += delta
+            checked_out.inc(delta)
+            if pool_size is not None:
+                overflow.set(max(0, in_use - pool_size))
+
+    def _on_checkout(*_):
+        _track(1)
+
+    def _on_return(*_):
+        _track(-1)
+
+    event.listen(pool, "checkout", _on_checkout)
+    event.listen(pool, "checkin", _on_return)
+    event.listen(pool, "detach", _on_return)
+
+
+def observe_llm_call(
+    provider: str,
+    purpose: str,
+    duration: float,
+    outcome: str,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    first_chunk: Optional[float] = None,
+) -> None:
+    LLM_REQUEST_DURATION.labels(provider, purpose, outcome).observe(duration)
+    if first_chunk is not None:
+        LLM_STREAM_FIRST_CHUNK.labels(provider, purpose).observe(first_chunk)
+    if input_tokens:
+        LLM_TOKENS.labels(provider, purpose, "input").inc(input_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(provider, purpose, "output").inc(output_tokens)
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI: latencia por ruta, medida hasta el último byte (incluye streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_label(scope)
+            if route != "/metrics":
+                HTTP_REQUEST_DURATION.labels(
+                    scope.get("method", ""), route, str(status["code"])
+                ).observe(time.perf_counter() - started)
@@ -0,0 +1,178 @@
+# app/core/password_hasher.py
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """La cola de hashing está llena: el llamador debe responder 503 y reintentar."""
+
+
+def build_context(rounds: int) -> CryptContext:
+    """
+    Contexto bcrypt con el costo fijado: min = max = default, así cualquier hash
+    con otro costo queda marcado por needs_update y se rehashea en el login.
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# --- Funciones que corren dentro de los procesos del pool ---
+# Solo dependen de passlib para que los procesos hijos arranquen rápido.
+
+_worker_context: Optional[CryptContext] = None
+
+
+def _init_worker(rounds: int) -> None:
+    global _worker_context
+    _worker_context = build_context(rounds)
+
+
+def _hash(password: str) -> str:
+    return _worker_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return _worker_context.verify(password, hashed_password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return _worker_context.verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Ejecuta bcrypt en un pool de procesos dedicado y acotado, para que el costo
+    de CPU del login/registro no compita con el resto de la API.
+    Con workers=0 hashea en el mismo proceso (scripts, seeds).
+    """
+
+    def __init__(self, rounds: int, workers: int, max_queue: int):
+        self.rounds = rounds
+        self._workers = workers
+        self._max_queue = max_queue
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._peak_pending = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Se crea perezosamente, después del fork de gunicorn, con "spawn"
+        # para no clonar los hilos del worker
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.rounds,),
+            )
+        return self._executor
+
+    def _reserve(self) -> ProcessPoolExecutor:
+        """Ocupa un lugar en la cola o lanza PasswordHasherBusy si está llena."""
+        # Import diferido: los procesos hijos importan este módulo y no necesitan prometheus
+        from app.core.metrics import PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_REJECTED
+
+        with self._lock:
+            if self._pending >= self._max_queue:
+                self._rejected += 1
+                PASSWORD_HASH_REJECTED.inc()
+                raise PasswordHasherBusy()
+            self._pending += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+            PASSWORD_HASH_QUEUE_DEPTH.inc()
+            return self._get_executor()
+
+    def _release(self) -> None:
+        from app.core.metrics import PASSWORD_HASH_QUEUE_DEPTH
+
+        with self._lock:
+            self._pending -= 1
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        # Un proceso hijo murió: se descarta el pool y el siguiente intento crea otro
+        logger.error("Password hashing pool is broken, recreating it on next use")
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def _run(self, fn, *args):
+        """Versión bloqueante (scripts, seeds)."""
+        if self._workers <= 0:
+            if _worker_context is None:
+                _init_worker(self.rounds)
+            return fn(*args)
+
+        executor = self._reserve()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        finally:
+            self._release()
+
+    async def _arun(self, fn, *args):
+        """
+        Versión para endpoints `async def`: espera el resultado sin ocupar un hilo
+        del threadpool mientras bcrypt corre en el pool de procesos.
+        """
+        if self._workers <= 0:
+            return await asyncio.to_thread(self._run, fn, *args)
+
+        executor = self._reserve()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+        finally:
+            self._release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._run(_verify, password, hashed_password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return self._run(_verify_and_update, password, hashed_password)
+
+    async def ahash(self, password: str) -> str:
+        return await self._arun(_hash, password)
+
+    async def averify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._arun(_verify_and_update, password, hashed_password)
+
+    def stats(self) -> dict:
+        """Métricas de la cola: en curso + en espera, pico histórico y rechazos."""
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "peak_queue_depth": self._peak_pending,
+                "rejected": self._rejected,
+                "workers": self._workers,
+                "max_queue": self._max_queue,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
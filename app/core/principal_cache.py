@@ -0,0 +1,83 @@
+# app/core/principal_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Snapshot inmutable del usuario autenticado.
+    Solo contiene columnas simples: las rutas usan id, email, role e is_active,
+    nunca relaciones, así que no necesita estar ligado a una sesión de SQLAlchemy.
+    """
+    id: int
+    email: str
+    role: str
+    is_active: bool
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            is_active=bool(user.is_active),
+            token_version=user.token_version or 0,
+        )
+
+
+class PrincipalCache:
+    """
+    Caché en memoria (por proceso) de principals indexados por user id, con TTL corto.
+    Cada worker tiene la suya: una invalidación en otro worker se ve aquí
+    como mucho PRINCIPAL_CACHE_TTL_SECONDS después.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, tuple[float, Principal]]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: Principal) -> None:
+        if self._ttl <= 0:
+            return
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self._ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,147 @@
+# app/core/query_metrics.py
+
+"""
+Métricas de SQL por request.
+
+Un listener de SQLAlchemy (before/after_cursor_execute) cuenta las consultas y su
+duración en el request actual (ContextVar). El middleware:
+  - agrega `Server-Timing` con el tiempo en DB, número de consultas y tiempo total,
+  - registra una línea de log con esos campos,
+  - avisa cuando una misma sentencia se repite demasiado (patrón N+1)
+    o se supera el presupuesto de consultas.
+
+Con QUERY_BUDGET_STRICT=true el exceso se convierte en error (desarrollo/benchmarks).
+"""
+
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Modo estricto: el request superó el presupuesto de consultas o repitió una sentencia (N+1)."""
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Sentencias idénticas ejecutadas `threshold` veces o más (candidatas a N+1)."""
+        return sorted(
+            ((statement, n) for statement, n in self.statements.items() if n >= threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def get_request_query_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def install_query_listeners(engine: Engine) -> None:
+    """Registra los listeners en el engine. Las consultas fuera de un request se ignoran."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        if settings.QUERY_BUDGET_STRICT:
+            if stats.count >= settings.QUERY_BUDGET_PER_REQUEST:
+                raise QueryBudgetExceeded(
+                    f"Request exceeded the query budget ({settings.QUERY_BUDGET_PER_REQUEST})"
+                )
+            if stats.statements.get(statement, 0) + 1 >= settings.QUERY_N_PLUS_ONE_THRESHOLD:
+                raise QueryBudgetExceeded(f"Possible N+1, statement repeated: {statement[:200]}")
+        conn.info["query_metrics_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        started = conn.info.pop("query_metrics_start", None)
+        if stats is None or started is None:
+            return
+        stats.record(statement, time.perf_counter() - started)
+
+
+class QueryMetricsMiddleware:
+    """Middleware ASGI: abre las métricas del request, agrega Server-Timing y registra el resumen."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status = {"code": None}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                # En streaming el encabezado refleja lo ejecutado hasta el primer byte;
+                # la línea de log final incluye todo el request
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                    f"app;dur={(time.perf_counter() - started) * 1000:.1f}"
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception:
+            # La respuesta de error la arma ServerErrorMiddleware, fuera de este middleware
+            status["code"] = status["code"] or 500
+            raise
+        finally:
+            _current_stats.reset(token)
+            self._log(scope, status["code"], stats, time.perf_counter() - started)
+
+    def _log(self, scope, status_code, stats: RequestQueryStats, duration: float) -> None:
+        repeated = stats.repeated(settings.QUERY_N_PLUS_ONE_THRESHOLD)
+        over_budget = stats.count > settings.QUERY_BUDGET_PER_REQUEST
+        fields = {
+            "event": "request_db_stats",
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "status": status_code,
+            "db_queries": stats.count,
+            "db_time_ms": round(stats.duration * 1000, 2),
+            "duration_ms": round(duration * 1000, 2),
+        }
+        if repeated:
+            fields["n_plus_one"] = [{"statement": statement[:200], "count": n} for statement, n in repeated[:3]]
+        if over_budget:
+            fields["query_budget"] = settings.QUERY_BUDGET_PER_REQUEST
+
+        level = logging.WARNING if repeated or over_budget else logging.INFO
+        logger.log(level, json.dumps(fields, ensure_ascii=False))
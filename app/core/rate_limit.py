@@ -0,0 +1,256 @@
+# app/core/rate_limit.py
+
+"""
+Rate limiting por usuario autenticado con token bucket.
+
+Cada límite ("50/minute") es un bucket de capacidad 50 que se rellena a 50/60 tokens
+por segundo; cada request consume uno. La clave es `<scope>:user:<id>`, no la IP:
+los estudiantes detrás del NAT de una universidad no comparten cupo.
+
+Backends (RATE_LIMIT_BACKEND):
+  - "postgres": una fila por bucket en `rate_limit_buckets`, actualizada con un solo
+    upsert atómico. El cupo es el mismo para todos los workers e instancias.
+  - "local": en memoria del proceso (desarrollo, SQLite). Cada worker cuenta por separado.
+
+Si el backend compartido falla, el request pasa (fail-open) y se registra el error:
+un problema de la DB no debe bloquear la API por el rate limiter.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Protocol
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimitExceeded(Exception):
+    """Se agotó el bucket. main.py lo convierte en 429 con Retry-After."""
+
+    def __init__(self, limit: "RateLimit", retry_after: float):
+        self.limit = limit
+        self.retry_after = retry_after
+        super().__init__(f"Rate limit exceeded: {limit}")
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    amount: int
+    period_seconds: int
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """'50/minute' -> RateLimit(50, 60)."""
+        amount, _, period = value.partition("/")
+        period = period.strip().rstrip("s")
+        if period not in _PERIODS:
+            raise ValueError(f"Límite inválido: {value!r} (usa p. ej. '50/minute')")
+        return cls(int(amount), _PERIODS[period])
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.amount / self.period_seconds
+
+    def __str__(self) -> str:
+        period = next(name for name, seconds in _PERIODS.items() if seconds == self.period_seconds)
+        return f"{self.amount} per 1 {period}"
+
+
+class RateLimitBackend(Protocol):
+    name: str
+
+    async def consume(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        """Consume `cost` tokens. Devuelve 0 si se permitió, o los segundos a esperar si no."""
+        ...
+
+    async def peek(self, key: str, limit: RateLimit) -> float:
+        """Tokens disponibles ahora, sin consumir."""
+        ...
+
+    async def charge(self, key: str, limit: RateLimit, amount: float) -> float:
+        """
+        Descuenta `amount` aunque no alcance (el saldo puede quedar negativo).
+        Para costos que solo se conocen después, como los tokens de una respuesta del LLM.
+        Devuelve el saldo resultante.
+        """
+        ...
+
+
+class LocalTokenBucketBackend:
+    """Buckets en memoria del proceso, con LRU acotado."""
+    name = "local"
+
+    def __init__(self, max_entries: int = 100_000):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    async def consume(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refilled(key, limit, now)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return (cost - tokens) / limit.refill_per_second
+            self._store(key, tokens - cost, now)
+        return 0.0
+
+    async def peek(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        with self._lock:
+            return self._refilled(key, limit, now)
+
+    async def charge(self, key: str, limit: RateLimit, amount: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refilled(key, limit, now) - amount
+            self._store(key, tokens, now)
+        return tokens
+
+    def _refilled(self, key: str, limit: RateLimit, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (float(limit.amount), now))
+        return min(float(limit.amount), tokens + (now - updated) * limit.refill_per_second)
+
+    def _store(self, key: str, tokens: float, now: float) -> None:
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self._max_entries:
+            self._buckets.popitem(last=False)
+
+
+# Rellena según el tiempo transcurrido y consume solo si alcanza. Si no alcanza,
+# el WHERE deja la fila intacta y no hay RETURNING. now() es el reloj del servidor,
+# igual para todos los workers
+_CONSUME_SQL = text("""
+    INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+    VALUES (:key, CAST(:capacity AS double precision) - CAST(:cost AS double precision), now())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(
+            CAST(:capacity AS double precision),
+            rate_limit_buckets.tokens
+                + EXTRACT(EPOCH FROM (now() - rate_limit_buckets.updated_at)) * CAST(:rate AS double precision)
+        ) - CAST(:cost AS double precision),
+        updated_at = now()
+    WHERE LEAST(
+        CAST(:capacity AS double precision),
+        rate_limit_buckets.tokens
+            + EXTRACT(EPOCH FROM (now() - rate_limit_buckets.updated_at)) * CAST(:rate AS double precision)
+    ) >= CAST(:cost AS double precision)
+    RETURNING tokens
+""")
+
+_AVAILABLE_SQL = text("""
+    SELECT LEAST(
+        CAST(:capacity AS double precision),
+        tokens + EXTRACT(EPOCH FROM (now() - updated_at)) * CAST(:rate AS double precision)
+    )
+    FROM rate_limit_buckets WHERE key = :key
+""")
+
+_CHARGE_SQL = text("""
+    INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+    VALUES (:key, CAST(:capacity AS double precision) - CAST(:cost AS double precision), now())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(
+            CAST(:capacity AS double precision),
+            rate_limit_buckets.tokens
+                + EXTRACT(EPOCH FROM (now() - rate_limit_buckets.updated_at)) * CAST(:rate AS double precision)
+        ) - CAST(:cost AS double precision),
+        updated_at = now()
+    RETURNING tokens
+""")
+
+# Un bucket sin uso por más de su período está lleno: borrarlo no cambia nada
+_CLEANUP_SQL = text("DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :age)")
+
+
+class PostgresTokenBucketBackend:
+    """Buckets en PostgreSQL: una consulta por request (dos solo cuando se rechaza)."""
+    name = "postgres"
+
+    def __init__(self, engine, cleanup_interval_seconds: int = 600, stale_after_seconds: int = 86400):
+        self._engine = engine
+        self._cleanup_interval = cleanup_interval_seconds
+        self._stale_after = stale_after_seconds
+        self._next_cleanup = time.monotonic() + cleanup_interval_seconds
+
+    async def consume(self, key: str, limit: RateLimit, cost: int = 1) -> float:
+        params = {"key": key, "capacity": float(limit.amount), "rate": limit.refill_per_second, "cost": float(cost)}
+        async with self._engine.begin() as conn:
+            if (await conn.execute(_CONSUME_SQL, params)).first() is not None:
+                retry_after = 0.0
+            else:
+                available = (await conn.execute(_AVAILABLE_SQL, params)).scalar() or 0.0
+                retry_after = max(0.0, (cost - available) / limit.refill_per_second)
+            if time.monotonic() >= self._next_cleanup:
+                self._next_cleanup = time.monotonic() + self._cleanup_interval
+                await conn.execute(_CLEANUP_SQL, {"age": float(self._stale_after)})
+        return retry_after
+
+    async def peek(self, key: str, limit: RateLimit) -> float:
+        params = {"key": key, "capacity": float(limit.amount), "rate": limit.refill_per_second}
+        async with self._engine.connect() as conn:
+            available = (await conn.execute(_AVAILABLE_SQL, params)).scalar()
+        return float(limit.amount) if available is None else available
+
+    async def charge(self, key: str, limit: RateLimit, amount: float) -> float:
+        params = {"key": key, "capacity": float(limit.amount), "rate": limit.refill_per_second, "cost": float(amount)}
+        async with self._engine.begin() as conn:
+            return (await conn.execute(_CHARGE_SQL, params)).scalar()
+
+
+def build_rate_limit_backend(name: str) -> RateLimitBackend:
+    if name == "local":
+        return LocalTokenBucketBackend()
+    if name == "postgres":
+        from app.db.session import async_engine
+        if async_engine.dialect.name != "postgresql":
+            logger.warning(
+                f"RATE_LIMIT_BACKEND=postgres con {async_engine.dialect.name}: se usa el backend local"
+            )
+            return LocalTokenBucketBackend()
+        return PostgresTokenBucketBackend(async_engine)
+    raise ValueError(f"RATE_LIMIT_BACKEND desconocido: {name!r} (usa 'postgres' o 'local')")
+
+
+_backend: Optional[RateLimitBackend] = None
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    global _backend
+    if _backend is None:
+        _backend = build_rate_limit_backend(settings.RATE_LIMIT_BACKEND)
+        logger.info(f"Rate limit backend: {_backend.name}")
+    return _backend
+
+
+def set_rate_limit_backend(backend: Optional[RateLimitBackend]) -> None:
+    """Reemplaza el backend (scripts). None vuelve a leer RATE_LIMIT_BACKEND."""
+    global _backend
+    _backend = backend
+
+
+async def check_rate_limit(key: str, limit: RateLimit, cost: int = 1) -> None:
+    """Lanza RateLimitExceeded si la clave agotó su cupo."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    try:
+        retry_after = await get_rate_limit_backend().consume(key, limit, cost)
+    except Exception as e:
+        logger.error(f"Rate limit backend error, request allowed: {e}")
+        return
+    if retry_after > 0:
+        raise RateLimitExceeded(limit, retry_after)
+
+
+def retry_after_header(exc: RateLimitExceeded) -> str:
+    return str(max(1, math.ceil(exc.retry_after)))
@@ -1,20 +1,35 @@
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import Optional, Tuple
+import hashlib
 import secrets
 
 from app.core.config import settings
+from app.core.password_hasher import PasswordHasher
 
-# Reutilizamos el contexto de Passlib que ya teníamos
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hilos del threadpool de anyio (default) donde corren los endpoints `def`
+THREADPOOL_SIZE = 40
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica una contraseña en texto plano contra su versión hasheada."""
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt corre en un pool de procesos acotado (ver app/core/password_hasher.py).
+# La cola queda por debajo del threadpool: los requests de más reciben 503 antes de agotarlo
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=min(settings.PASSWORD_HASH_MAX_QUEUE, THREADPOOL_SIZE // 2),
+)
 
-def get_password_hash(password: str) -> str:
-    """Hashea una contraseña en texto plano."""
-    return pwd_context.hash(password)
+# Solo variantes async: el hash nunca corre en el event loop. Los scripts que necesitan
+# hashear de forma bloqueante usan password_hasher.hash directamente.
+async def aget_password_hash(password: str) -> str:
+    """Hashea una contraseña en texto plano fuera del event loop."""
+    return await password_hasher.ahash(password)
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash fue generado con otro costo,
+    devuelve también el hash nuevo para guardarlo.
+    """
+    return await password_hasher.averify_and_update(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """Crea un nuevo token de acceso JWT."""
@@ -29,10 +44,26 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def access_token_claims(user) -> dict:
+    """Claims del access token: email, rol, id y versión de token del usuario."""
+    return {
+        "sub": user.email,
+        "role": user.role,
+        "uid": user.id,
+        "ver": user.token_version or 0,
+    }
+
 def create_refresh_token() -> str:
     """Crea un refresh token aleatorio y seguro."""
     return secrets.token_urlsafe(32)
 
+def hash_refresh_token(token: str) -> str:
+    """
+    Digest con el que se guarda y busca un refresh token.
+    El token ya tiene 256 bits aleatorios, así que basta un SHA-256 sin sal.
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def decode_token(token: str) -> dict:
     """Decodifica y valida un JWT token."""
     try:
@@ -0,0 +1,35 @@
+# app/core/sse.py
+
+"""
+Codificación de eventos Server-Sent Events para el chat en streaming.
+
+Los fragmentos de texto son la gran mayoría de los eventos, así que su envoltorio
+`data: {"type":"chunk","data":{"text":...}}` se arma una sola vez y por fragmento solo
+se codifica el texto. El resto de los eventos se codifica completo con orjson.
+"""
+
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+_CHUNK_PREFIX = b'data: {"type":"chunk","data":{"text":'
+_CHUNK_SUFFIX = b"}}\n\n"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_chunk(text: str) -> bytes:
+    return _CHUNK_PREFIX + orjson.dumps(text) + _CHUNK_SUFFIX
+
+
+def encode_event(event: dict) -> bytes:
+    """Un evento `{"type": ..., "data": ...}` como mensaje SSE"""
+    data = event.get("data")
+    if event.get("type") == "chunk" and len(event) == 2 and isinstance(data, dict) and data.keys() == {"text"}:
+        return encode_chunk(data["text"])
+    return b"data: " + orjson.dumps(event, default=_default, option=orjson.OPT_NON_STR_KEYS) + b"\n\n"
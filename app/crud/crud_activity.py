@@ -0,0 +1,142 @@
+# app/crud/crud_activity.py
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, Tuple
+from datetime import date, timedelta
+
+from app.models.user_daily_activity import UserDailyActivity, UserActivityStreak, ActivityKind
+
+
+def record_activity(
+    db: Session,
+    user_id: int,
+    kind: ActivityKind,
+    activity_date: Optional[date] = None
+) -> None:
+    """
+    Registra que el usuario tuvo actividad de un tipo en un día y actualiza su racha.
+    No hace commit: el llamador confirma la transacción junto con su propia escritura.
+    """
+    activity_date = activity_date or date.today()
+    kind = ActivityKind(kind).value
+
+    if db.get(UserDailyActivity, (user_id, kind, activity_date)) is not None:
+        return
+
+    try:
+        with db.begin_nested():
+            db.add(UserDailyActivity(user_id=user_id, kind=kind, activity_date=activity_date))
+    except IntegrityError:
+        # Otro request registró este mismo día en paralelo
+        return
+
+    # Updates condicionales y atómicos (sin leer current_streak en Python): dos requests
+    # concurrentes del mismo usuario no pisan el incremento del otro
+    previous_day = activity_date - timedelta(days=1)
+    if _update_streak(
+        db, user_id, kind,
+        UserActivityStreak.last_activity_date == previous_day,
+        {UserActivityStreak.current_streak: UserActivityStreak.current_streak + 1,
+         UserActivityStreak.last_activity_date: activity_date}
+    ):
+        return
+    if _update_streak(
+        db, user_id, kind,
+        or_(UserActivityStreak.last_activity_date.is_(None), UserActivityStreak.last_activity_date < previous_day),
+        {UserActivityStreak.current_streak: 1, UserActivityStreak.last_activity_date: activity_date}
+    ):
+        return
+
+    streak = db.query(UserActivityStreak).filter(
+        UserActivityStreak.user_id == user_id,
+        UserActivityStreak.kind == kind
+    ).with_for_update().populate_existing().one_or_none()
+    if streak is None:
+        _create_streak(db, user_id, kind)
+    else:
+        # Actividad con fecha anterior a la última registrada: recalcular (con la fila bloqueada)
+        _rebuild_streak(db, streak)
+
+
+def _update_streak(db: Session, user_id: int, kind: str, condition, values: dict) -> bool:
+    """UPDATE del contador solo si cumple `condition`. True si actualizó la fila."""
+    return db.query(UserActivityStreak).filter(
+        UserActivityStreak.user_id == user_id,
+        UserActivityStreak.kind == kind,
+        condition
+    ).update(values) > 0
+
+
+def _create_streak(db: Session, user_id: int, kind: str) -> UserActivityStreak:
+    """
+    Crea el contador desde el historial. Si otro request lo creó en paralelo,
+    devuelve el existente (y lo recalcula, ya que puede no incluir la actividad de este request).
+    """
+    streak = UserActivityStreak(user_id=user_id, kind=kind)
+    _rebuild_streak(db, streak)
+    try:
+        with db.begin_nested():
+            db.add(streak)
+    except IntegrityError:
+        streak = db.get(UserActivityStreak, (user_id, kind))
+        _rebuild_streak(db, streak)
+    return streak
+
+
+def _rebuild_streak(db: Session, streak: UserActivityStreak) -> None:
+    """
+    Recalcula el contador desde el historial materializado.
+    Solo se usa la primera vez o con actividad retroactiva.
+    """
+    streak.current_streak, streak.last_activity_date = _streak_from_history(db, streak.user_id, streak.kind)
+
+
+def _streak_from_history(db: Session, user_id: int, kind: str) -> Tuple[int, Optional[date]]:
+    """(días consecutivos hasta la última actividad, fecha de la última actividad)"""
+    dates = [
+        row[0] for row in db.query(UserDailyActivity.activity_date).filter(
+            UserDailyActivity.user_id == user_id,
+            UserDailyActivity.kind == kind
+        ).order_by(UserDailyActivity.activity_date.desc()).all()
+    ]
+
+    if not dates:
+        return 0, None
+
+    count = 1
+    for newer, older in zip(dates, dates[1:]):
+        if newer - older != timedelta(days=1):
+            break
+        count += 1
+
+    return count, dates[0]
+
+
+def get_streak(
+    db: Session,
+    user_id: int,
+    kind: ActivityKind,
+    today: Optional[date] = None
+) -> int:
+    """
+    Obtiene la racha actual de días consecutivos para un tipo de actividad.
+    La racha sigue viva si la última actividad fue hoy o ayer.
+    Solo lectura: no escribe ni hace commit.
+    """
+    today = today or date.today()
+    kind = ActivityKind(kind).value
+
+    streak = db.get(UserActivityStreak, (user_id, kind))
+    if streak is None:
+        # Usuario sin contador todavía (historial previo a la tabla): se calcula desde el
+        # historial; la fila se crea con su próxima actividad (record_activity)
+        current_streak, last_activity_date = _streak_from_history(db, user_id, kind)
+    else:
+        current_streak, last_activity_date = streak.current_streak, streak.last_activity_date
+
+    if last_activity_date is None or last_activity_date < today - timedelta(days=1):
+        return 0
+
+    return current_streak
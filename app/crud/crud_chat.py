@@ -1,5 +1,7 @@
 # app/crud/crud_chat.py
 
+from sqlalchemy import Row, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -7,21 +9,28 @@ from datetime import datetime
 from app.models.chat_message import ChatMessage
 from app.schemas.chat import ChatMessageCreate
 
+# Filas por lote al transmitir el historial completo
+HISTORY_BATCH_SIZE = 200
+
 
 def create_message(db: Session, user_id: int, role: str, text: str) -> ChatMessage:
     """
     Crea un nuevo mensaje de chat para un usuario.
     """
-    db_message = ChatMessage(
+    db_message = _new_message(user_id, role, text)
+    db.add(db_message)
+    db.commit()
+    db.refresh(db_message)
+    return db_message
+
+
+def _new_message(user_id: int, role: str, text: str) -> ChatMessage:
+    return ChatMessage(
         user_id=user_id,
         role=role,
         text=text,
         created_at=datetime.utcnow()
     )
-    db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-    return db_message
 
 
 def get_user_messages(db: Session, user_id: int, limit: Optional[int] = None) -> List[ChatMessage]:
@@ -36,6 +45,54 @@ def get_user_messages(db: Session, user_id: int, limit: Optional[int] = None) ->
     return query.all()
 
 
+# --- Variantes async (AsyncSession) para los endpoints `async def` ---
+
+async def create_message_async(db: AsyncSession, user_id: int, role: str, text: str) -> ChatMessage:
+    db_message = _new_message(user_id, role, text)
+    db.add(db_message)
+    # Sin refresh: id y created_at ya quedan cargados (expire_on_commit=False) y así el
+    # commit devuelve la conexión al pool en vez de abrir otra transacción
+    await db.commit()
+    return db_message
+
+
+async def get_user_messages_async(db: AsyncSession, user_id: int, limit: Optional[int] = None) -> List[ChatMessage]:
+    query = select(ChatMessage).where(ChatMessage.user_id == user_id).order_by(ChatMessage.created_at.asc())
+    if limit:
+        query = query.limit(limit)
+    return list((await db.scalars(query)).all())
+
+
+async def get_last_message_async(db: AsyncSession, user_id: int) -> Optional[ChatMessage]:
+    query = select(ChatMessage).where(ChatMessage.user_id == user_id).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(1)
+    return (await db.scalars(query)).first()
+
+
+async def get_user_messages_page_async(
+    db: AsyncSession,
+    user_id: int,
+    after: Optional[Row] = None,
+    limit: int = HISTORY_BATCH_SIZE
+) -> List[Row]:
+    """
+    Un lote del historial en orden (created_at, id), a partir de la fila `after` (keyset).
+    Entrega filas (id, user_id, role, text, created_at), no objetos ORM, para que el
+    llamador pueda soltar la conexión entre lotes sin mantener un cursor abierto.
+    """
+    query = (
+        select(ChatMessage.id, ChatMessage.user_id, ChatMessage.role, ChatMessage.text, ChatMessage.created_at)
+        .where(ChatMessage.user_id == user_id)
+        .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(or_(
+            ChatMessage.created_at > after.created_at,
+            and_(ChatMessage.created_at == after.created_at, ChatMessage.id > after.id),
+        ))
+    return list((await db.execute(query)).all())
+
+
 def delete_user_messages(db: Session, user_id: int) -> int:
     """
     Elimina todos los mensajes de chat de un usuario.
@@ -1,10 +1,12 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from app.models.exercise_completion import ExerciseCompletion
+from app.models.user_daily_activity import ActivityKind
 from app.schemas.wellness import ExerciseCompletionCreate, ExerciseCompletionUpdate
+from app.crud import crud_activity, crud_wellness
 
 
 def create_completion(
@@ -18,6 +20,9 @@ def create_completion(
         **completion_data.model_dump()
     )
     db.add(db_completion)
+    crud_wellness.advance_rotation(db, user_id, completion_data.exercise_id)
+    if completion_data.completed:
+        crud_activity.record_activity(db, user_id, ActivityKind.WELLNESS, datetime.utcnow().date())
     db.commit()
     db.refresh(db_completion)
     return db_completion
@@ -82,6 +87,10 @@ def update_completion(
     if completion_update.completed and db_completion.completed_at is None:
         db_completion.completed_at = datetime.utcnow()
     
+    if db_completion.completed:
+        crud_activity.record_activity(
+            db, db_completion.user_id, ActivityKind.WELLNESS, db_completion.started_at.date()
+        )
     db.commit()
     db.refresh(db_completion)
     return db_completion
@@ -112,51 +121,12 @@ def get_completion_streak(
     user_id: int
 ) -> int:
     """
-    Calcular racha de días consecutivos con al menos un ejercicio completado
+    Calcular racha de días consecutivos con al menos un ejercicio completado.
+    Se lee del contador materializado en user_activity_streaks.
     """
-    completions = db.query(ExerciseCompletion).filter(
-        and_(
-            ExerciseCompletion.user_id == user_id,
-            ExerciseCompletion.completed == True
-        )
-    ).order_by(ExerciseCompletion.started_at.desc()).all()
-    
-    if not completions:
-        return 0
-    
-    # Obtener fechas únicas (solo día, sin hora)
-    completion_dates = set()
-    for c in completions:
-        date_only = c.started_at.date()
-        completion_dates.add(date_only)
-    
-    # Ordenar fechas de más reciente a más antigua
-    sorted_dates = sorted(completion_dates, reverse=True)
-    
-    # Calcular racha
-    # Calcular racha
-    streak = 0
-    today = datetime.utcnow().date()
-    yesterday = today - timedelta(days=1)
-    
-    # Si el último ejercicio no fue hoy ni ayer, la racha es 0
-    if today not in sorted_dates and yesterday not in sorted_dates:
-        return 0
-
-    # Determinar fecha de inicio para contar hacia atrás
-    if today in sorted_dates:
-        streak = 1
-        current_date = yesterday
-    else: # Si el último fue ayer
-        streak = 1
-        current_date = yesterday - timedelta(days=1)
-
-    # Contamos hacia atrás
-    while current_date in sorted_dates:
-        streak += 1
-        current_date -= timedelta(days=1)
-    
-    return streak
+    return crud_activity.get_streak(
+        db, user_id, ActivityKind.WELLNESS, today=datetime.utcnow().date()
+    )
 
 
 def get_exercise_completion_history(
@@ -202,3 +172,14 @@ def get_last_completion_date(
         return completion.completed_at.isoformat()
     return None
 
+
+def get_wellness_stats(
+    db: Session,
+    user_id: int
+) -> dict:
+    """Obtener racha, total de ejercicios completados y fecha de la última completación"""
+    return {
+        "streak": get_completion_streak(db, user_id),
+        "total_completions": get_total_completions(db, user_id),
+        "last_completion": get_last_completion_date(db, user_id)
+    }
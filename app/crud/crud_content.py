@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.content import Content
 from app.schemas.content import ContentCreate, ContentUpdate
+from app.services.catalog_cache import catalog_cache
 
 
 def get_content(db: Session, content_id: int) -> Optional[Content]:
@@ -21,6 +22,7 @@ def create_content(db: Session, content: ContentCreate) -> Content:
     db_content = Content(**content.dict())
     db.add(db_content)
     db.commit()
+    catalog_cache.invalidate()
     db.refresh(db_content)
     return db_content
 
@@ -33,6 +35,7 @@ def update_content(db: Session, content_id: int, content: ContentUpdate) -> Opti
         for field, value in update_data.items():
             setattr(db_content, field, value)
         db.commit()
+        catalog_cache.invalidate()
         db.refresh(db_content)
     return db_content
 
@@ -43,5 +46,6 @@ def delete_content(db: Session, content_id: int) -> bool:
     if db_content:
         db.delete(db_content)
         db.commit()
+        catalog_cache.invalidate()
         return True
     return False
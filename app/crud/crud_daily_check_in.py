@@ -1,8 +1,12 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import date, timedelta
-from typing import List
+from typing import List, Optional
 from app.models.daily_check_in import DailyCheckIn
 from app.schemas.daily_check_in import DailyCheckInCreate
+from app.models.user_daily_activity import ActivityKind
+from app.crud import crud_activity
 
 def save_check_in(db: Session, *, user_id: int, check_in_in: DailyCheckInCreate) -> DailyCheckIn:
     # Busca si ya existe un check-in para este usuario en este día
@@ -23,6 +27,7 @@ def save_check_in(db: Session, *, user_id: int, check_in_in: DailyCheckInCreate)
         )
         db.add(db_check_in)
     
+    crud_activity.record_activity(db, user_id, ActivityKind.CHECK_IN, date.today())
     db.commit()
     db.refresh(db_check_in)
     return db_check_in
@@ -41,6 +46,19 @@ def get_check_ins_by_user_id(db: Session, *, user_id: int) -> List[DailyCheckIn]
     )
 
 
+def get_recent_check_ins(db: Session, *, user_id: int, days: int = 7) -> List[DailyCheckIn]:
+    """
+    Obtiene los check-ins de los últimos N días (incluyendo hoy), en orden cronológico.
+    """
+    start_date = date.today() - timedelta(days=days - 1)
+    return (
+        db.query(DailyCheckIn)
+        .filter(DailyCheckIn.user_id == user_id, DailyCheckIn.date >= start_date)
+        .order_by(DailyCheckIn.date.asc())
+        .all()
+    )
+
+
 def get_latest_checkin(db: Session, user_id: int) -> DailyCheckIn:
     """
     Obtiene el último check-in de motivación de un usuario.
@@ -50,4 +68,59 @@ def get_latest_checkin(db: Session, user_id: int) -> DailyCheckIn:
         .filter(DailyCheckIn.user_id == user_id)
         .order_by(DailyCheckIn.date.desc())
         .first()
-    )
\ No newline at end of file
+    )
+
+
+# --- Variantes async (AsyncSession) para los endpoints `async def` ---
+
+async def save_check_in_async(db: AsyncSession, *, user_id: int, check_in_in: DailyCheckInCreate) -> DailyCheckIn:
+    """
+    Variante async de save_check_in. La racha reutiliza crud_activity tal cual
+    (run_sync corre la lógica síncrona sobre la misma conexión y transacción).
+    """
+    today = date.today()
+    db_check_in = await db.scalar(
+        select(DailyCheckIn).where(DailyCheckIn.user_id == user_id, DailyCheckIn.date == today).limit(1)
+    )
+
+    if db_check_in:
+        db_check_in.motivation_level = check_in_in.motivation_level
+    else:
+        db_check_in = DailyCheckIn(
+            user_id=user_id,
+            date=today,
+            motivation_level=check_in_in.motivation_level
+        )
+        db.add(db_check_in)
+
+    await db.run_sync(
+        lambda session: crud_activity.record_activity(session, user_id, ActivityKind.CHECK_IN, today)
+    )
+    # Sin refresh (expire_on_commit=False): el endpoint llama al LLM a continuación y
+    # no debe quedar una transacción abierta reteniendo la conexión
+    await db.commit()
+    return db_check_in
+
+
+async def get_previous_check_in_async(db: AsyncSession, user_id: int, before: Optional[date] = None) -> Optional[DailyCheckIn]:
+    """
+    Último check-in anterior a `before` (por defecto, hoy).
+    """
+    return await db.scalar(
+        select(DailyCheckIn)
+        .where(DailyCheckIn.user_id == user_id, DailyCheckIn.date < (before or date.today()))
+        .order_by(DailyCheckIn.date.desc())
+        .limit(1)
+    )
+
+
+async def get_latest_checkin_async(db: AsyncSession, user_id: int) -> Optional[DailyCheckIn]:
+    """
+    Variante async de get_latest_checkin.
+    """
+    return await db.scalar(
+        select(DailyCheckIn)
+        .where(DailyCheckIn.user_id == user_id)
+        .order_by(DailyCheckIn.date.desc())
+        .limit(1)
+    )
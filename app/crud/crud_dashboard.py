@@ -1,15 +1,15 @@
 # mot_back/app/crud/crud_dashboard.py
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from typing import List, Dict
-from datetime import date, timedelta
 
 from app.models.answer import Answer
 from app.models.question import Question
 from app.models.section import Section
-from app.models.daily_check_in import DailyCheckIn
-from app.models.user_progress import UserContentProgress, UserLessonProgress
+from app.models.user_daily_activity import ActivityKind
+from app.crud import crud_activity
 
 def get_questionnaire_summary(db: Session, *, user_id: int) -> List[Dict[str, any]]:
     # ... (esta función se mantiene igual)
@@ -29,46 +29,30 @@ def get_questionnaire_summary(db: Session, *, user_id: int) -> List[Dict[str, an
         for name, score in summary_data
     ]
 
+
+async def get_questionnaire_summary_async(db: AsyncSession, *, user_id: int) -> List[Dict[str, any]]:
+    """
+    Variante async de get_questionnaire_summary.
+    """
+    summary_data = await db.execute(
+        select(Section.name, func.avg(Answer.value).label("average_score"))
+        .join(Question, Section.id == Question.section_id)
+        .join(Answer, Question.id == Answer.question_id)
+        .where(Answer.user_id == user_id)
+        .group_by(Section.name)
+    )
+    return [
+        {"section_name": name, "average_score": score}
+        for name, score in summary_data.all()
+    ]
+
 # --- NUEVA FUNCIÓN AÑADIDA ---
 def get_user_streak(db: Session, *, user_id: int) -> int:
     """
     Calcula la racha de check-ins consecutivos para un usuario.
+    Se lee del contador materializado que actualiza cada check-in.
     """
-    check_ins = (
-        db.query(DailyCheckIn.date)
-        .filter(DailyCheckIn.user_id == user_id)
-        .order_by(DailyCheckIn.date.desc())
-        .all()
-    )
-
-    if not check_ins:
-        return 0
-
-    streak = 0
-    today = date.today()
-    yesterday = today - timedelta(days=1)
-    
-    # Extraemos solo las fechas de la tupla
-    check_in_dates = {c[0] for c in check_ins}
-
-    # Si el último check-in no fue hoy ni ayer, la racha es 0
-    if today not in check_in_dates and yesterday not in check_in_dates:
-        return 0
-
-    # Si el último check-in fue hoy, la racha es al menos 1
-    if today in check_in_dates:
-        streak = 1
-        current_date = yesterday
-    else: # Si el último fue ayer
-        streak = 1
-        current_date = yesterday - timedelta(days=1)
-
-    # Contamos hacia atrás
-    while current_date in check_in_dates:
-        streak += 1
-        current_date -= timedelta(days=1)
-
-    return streak
+    return crud_activity.get_streak(db, user_id, ActivityKind.CHECK_IN)
 
 
 def get_path_streak(db: Session, *, user_id: int) -> int:
@@ -76,53 +60,4 @@ def get_path_streak(db: Session, *, user_id: int) -> int:
     Calcula la racha de días consecutivos usando el path (contenidos o lecciones).
     Se considera que el usuario usó el path si accedió a algún contenido o lección ese día.
     """
-    # Obtener todas las fechas de acceso a contenidos
-    content_dates = (
-        db.query(func.date(UserContentProgress.last_accessed))
-        .filter(UserContentProgress.user_id == user_id)
-        .filter(UserContentProgress.last_accessed.isnot(None))
-        .all()
-    )
-    
-    # Obtener todas las fechas de acceso a lecciones
-    lesson_dates = (
-        db.query(func.date(UserLessonProgress.last_accessed))
-        .filter(UserLessonProgress.user_id == user_id)
-        .filter(UserLessonProgress.last_accessed.isnot(None))
-        .all()
-    )
-    
-    # Combinar todas las fechas únicas
-    all_dates = set()
-    for d in content_dates:
-        if d[0]:
-            all_dates.add(d[0])
-    for d in lesson_dates:
-        if d[0]:
-            all_dates.add(d[0])
-    
-    if not all_dates:
-        return 0
-    
-    today = date.today()
-    yesterday = today - timedelta(days=1)
-    
-    # Si el último acceso no fue hoy ni ayer, la racha es 0
-    if today not in all_dates and yesterday not in all_dates:
-        return 0
-    
-    # Calcular racha consecutiva
-    streak = 0
-    if today in all_dates:
-        streak = 1
-        current_date = yesterday
-    else:  # Si el último fue ayer
-        streak = 1
-        current_date = yesterday - timedelta(days=1)
-    
-    # Contamos hacia atrás
-    while current_date in all_dates:
-        streak += 1
-        current_date -= timedelta(days=1)
-    
-    return streak
\ No newline at end of file
+    return crud_activity.get_streak(db, user_id, ActivityKind.PATH)
@@ -1,6 +1,6 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from datetime import datetime, timedelta
 
 from app.models.metamotivation_energy import MetamotivationEnergy
@@ -65,26 +65,28 @@ def get_todays_energy_records(
 def get_energy_stats(
     db: Session,
     user_id: int,
-    days: int = 30
+    days: int = 30,
+    daily: bool = False
 ) -> dict:
     """
-    Obtener estadísticas de energía del usuario en los últimos N días
+    Obtener estadísticas de energía del usuario en los últimos N días.
+    El conteo se agrega en SQL (GROUP BY energy_state), así el costo no crece con el historial.
+    Si daily=True, incluye además el conteo por día y estado.
     """
     since = datetime.utcnow() - timedelta(days=days)
-    
-    records = db.query(MetamotivationEnergy).filter(
-        and_(
-            MetamotivationEnergy.user_id == user_id,
-            MetamotivationEnergy.created_at >= since
-        )
-    ).all()
-    
-    total_records = len(records)
+    window = and_(
+        MetamotivationEnergy.user_id == user_id,
+        MetamotivationEnergy.created_at >= since
+    )
     
     # Contar por estado
-    by_state = {}
-    for r in records:
-        by_state[r.energy_state] = by_state.get(r.energy_state, 0) + 1
+    by_state = dict(
+        db.query(MetamotivationEnergy.energy_state, func.count(MetamotivationEnergy.id))
+        .filter(window)
+        .group_by(MetamotivationEnergy.energy_state)
+        .all()
+    )
+    total_records = sum(by_state.values())
     
     # Calcular porcentajes
     percentages = {
@@ -95,13 +97,32 @@ def get_energy_stats(
     # Estado más frecuente
     most_frequent = max(by_state, key=by_state.get) if by_state else None
     
-    return {
+    stats = {
         "total_records": total_records,
         "by_state": by_state,
         "percentages": percentages,
         "most_frequent_state": most_frequent,
         "days_analyzed": days
     }
+    
+    if daily:
+        day = func.date(MetamotivationEnergy.created_at)
+        rows = (
+            db.query(day, MetamotivationEnergy.energy_state, func.count(MetamotivationEnergy.id))
+            .filter(window)
+            .group_by(day, MetamotivationEnergy.energy_state)
+            .order_by(day)
+            .all()
+        )
+        buckets = {}
+        for bucket_date, state, count in rows:
+            buckets.setdefault(str(bucket_date), {})[state] = count
+        stats["daily"] = [
+            {"date": bucket_date, "by_state": counts}
+            for bucket_date, counts in buckets.items()
+        ]
+    
+    return stats
 
 
 def get_latest_energy_record(
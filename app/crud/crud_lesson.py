@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.lesson import Lesson
 from app.schemas.lesson import LessonCreate, LessonUpdate
+from app.services.catalog_cache import catalog_cache
 
 
 def get_lesson(db: Session, lesson_id: int) -> Optional[Lesson]:
@@ -21,6 +22,7 @@ def create_lesson(db: Session, lesson: LessonCreate) -> Lesson:
     db_lesson = Lesson(**lesson.dict())
     db.add(db_lesson)
     db.commit()
+    catalog_cache.invalidate()
     db.refresh(db_lesson)
     return db_lesson
 
@@ -33,6 +35,7 @@ def update_lesson(db: Session, lesson_id: int, lesson: LessonUpdate) -> Optional
         for field, value in update_data.items():
             setattr(db_lesson, field, value)
         db.commit()
+        catalog_cache.invalidate()
         db.refresh(db_lesson)
     return db_lesson
 
@@ -43,5 +46,6 @@ def delete_lesson(db: Session, lesson_id: int) -> bool:
     if db_lesson:
         db.delete(db_lesson)
         db.commit()
+        catalog_cache.invalidate()
         return True
     return False
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import exists, select, literal, union_all
+from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
 from app.models.user_progress import (
     UserContentProgress, 
@@ -9,11 +10,15 @@ from app.models.user_progress import (
 from app.models.section import Section
 from app.models.content import Content
 from app.models.lesson import Lesson
+from app.models.user_daily_activity import ActivityKind
+from app.crud import crud_activity
 from app.schemas.user_progress import (
     UserContentProgressCreate,
     UserLessonProgressCreate,
     UserSectionProgressCreate,
-    PathOverview
+    PathOverview,
+    PathProgressBatch,
+    PathProgressBatchResult
 )
 
 
@@ -56,6 +61,7 @@ def create_or_update_content_progress(
         )
         db.add(db_progress)
     
+    crud_activity.record_activity(db, user_id, ActivityKind.PATH, datetime.utcnow().date())
     db.commit()
     db.refresh(db_progress)
     return db_progress
@@ -100,6 +106,7 @@ def create_or_update_lesson_progress(
         )
         db.add(db_progress)
     
+    crud_activity.record_activity(db, user_id, ActivityKind.PATH, datetime.utcnow().date())
     db.commit()
     db.refresh(db_progress)
     return db_progress
@@ -185,18 +192,179 @@ def get_path_overview(db: Session, user_id: int) -> PathOverview:
 
 def initialize_user_section_progress(db: Session, user_id: int) -> None:
     """Initialize section progress for a new user (create entries for all sections)"""
-    sections = db.query(Section).all()
+    # Single query: sections without a progress row for this user
+    missing = db.query(Section.id).filter(
+        ~exists().where(
+            UserSectionProgress.user_id == user_id,
+            UserSectionProgress.section_id == Section.id
+        )
+    ).all()
+    if not missing:
+        return
+    
+    for (section_id,) in missing:
+        db.add(UserSectionProgress(
+            user_id=user_id,
+            section_id=section_id,
+            current_content_order=1,
+            current_lesson_order=1,
+            completed=False
+        ))
     
-    for section in sections:
-        existing = get_user_section_progress(db, user_id, section.id)
-        if not existing:
+    db.commit()
+
+
+def get_user_progress_maps(
+    db: Session, user_id: int
+) -> Tuple[Dict[int, UserContentProgress], Dict[int, UserLessonProgress], Dict[int, UserSectionProgress]]:
+    """All progress rows of a user indexed by content, lesson and section ID (three queries)"""
+    return (
+        {p.content_id: p for p in get_all_user_content_progress(db, user_id)},
+        {p.lesson_id: p for p in get_all_user_lesson_progress(db, user_id)},
+        {p.section_id: p for p in get_all_user_section_progress(db, user_id)},
+    )
+
+
+# Batch Progress
+def get_missing_catalog_ids(
+    db: Session,
+    content_ids: Set[int],
+    lesson_ids: Set[int],
+    section_ids: Set[int]
+) -> Dict[str, List[int]]:
+    """
+    Validate content/lesson/section IDs against the catalog in a single query.
+    Returns the IDs that do not exist, grouped by kind.
+    """
+    selects = []
+    if content_ids:
+        selects.append(select(literal("content").label("kind"), Content.id).where(Content.id.in_(content_ids)))
+    if lesson_ids:
+        selects.append(select(literal("lesson").label("kind"), Lesson.id).where(Lesson.id.in_(lesson_ids)))
+    if section_ids:
+        selects.append(select(literal("section").label("kind"), Section.id).where(Section.id.in_(section_ids)))
+
+    if not selects:
+        return {}
+
+    query = selects[0] if len(selects) == 1 else union_all(*selects)
+    found: Dict[str, Set[int]] = {"content": set(), "lesson": set(), "section": set()}
+    for kind, item_id in db.execute(query).all():
+        found[kind].add(item_id)
+
+    missing = {
+        "content": sorted(content_ids - found["content"]),
+        "lesson": sorted(lesson_ids - found["lesson"]),
+        "section": sorted(section_ids - found["section"]),
+    }
+    return {kind: ids for kind, ids in missing.items() if ids}
+
+
+def apply_progress_batch(
+    db: Session, user_id: int, batch: PathProgressBatch
+) -> PathProgressBatchResult:
+    """
+    Upsert a batch of content, lesson and section progress events in one transaction.
+    Events are applied in order, so the last event for an item wins (completed_at is kept).
+    IDs must have been validated with get_missing_catalog_ids beforehand.
+    """
+    now = datetime.utcnow()
+
+    # Content progress
+    content_ids = {p.content_id for p in batch.contents}
+    content_rows = {}
+    if content_ids:
+        content_rows = {
+            row.content_id: row
+            for row in db.query(UserContentProgress).filter(
+                UserContentProgress.user_id == user_id,
+                UserContentProgress.content_id.in_(content_ids)
+            ).all()
+        }
+    for progress in batch.contents:
+        db_progress = content_rows.get(progress.content_id)
+        if db_progress:
+            db_progress.completed = progress.completed
+            db_progress.last_accessed = now
+            if progress.completed and not db_progress.completed_at:
+                db_progress.completed_at = now
+        else:
+            db_progress = UserContentProgress(
+                user_id=user_id,
+                content_id=progress.content_id,
+                completed=progress.completed,
+                completed_at=now if progress.completed else None,
+                last_accessed=now
+            )
+            db.add(db_progress)
+            content_rows[progress.content_id] = db_progress
+
+    # Lesson progress
+    lesson_ids = {p.lesson_id for p in batch.lessons}
+    lesson_rows = {}
+    if lesson_ids:
+        lesson_rows = {
+            row.lesson_id: row
+            for row in db.query(UserLessonProgress).filter(
+                UserLessonProgress.user_id == user_id,
+                UserLessonProgress.lesson_id.in_(lesson_ids)
+            ).all()
+        }
+    for progress in batch.lessons:
+        db_progress = lesson_rows.get(progress.lesson_id)
+        if db_progress:
+            db_progress.completed = progress.completed
+            db_progress.last_accessed = now
+            if progress.completed and not db_progress.completed_at:
+                db_progress.completed_at = now
+        else:
+            db_progress = UserLessonProgress(
+                user_id=user_id,
+                lesson_id=progress.lesson_id,
+                completed=progress.completed,
+                completed_at=now if progress.completed else None,
+                last_accessed=now
+            )
+            db.add(db_progress)
+            lesson_rows[progress.lesson_id] = db_progress
+
+    # Section progress
+    section_ids = {p.section_id for p in batch.sections}
+    section_rows = {}
+    if section_ids:
+        section_rows = {
+            row.section_id: row
+            for row in db.query(UserSectionProgress).filter(
+                UserSectionProgress.user_id == user_id,
+                UserSectionProgress.section_id.in_(section_ids)
+            ).all()
+        }
+    for progress in batch.sections:
+        db_progress = section_rows.get(progress.section_id)
+        if db_progress:
+            db_progress.current_content_order = progress.current_content_order
+            db_progress.current_lesson_order = progress.current_lesson_order
+            db_progress.completed = progress.completed
+            if progress.completed and not db_progress.completed_at:
+                db_progress.completed_at = now
+        else:
             db_progress = UserSectionProgress(
                 user_id=user_id,
-                section_id=section.id,
-                current_content_order=1,
-                current_lesson_order=1,
-                completed=False
+                section_id=progress.section_id,
+                current_content_order=progress.current_content_order,
+                current_lesson_order=progress.current_lesson_order,
+                completed=progress.completed,
+                completed_at=now if progress.completed else None
             )
             db.add(db_progress)
-    
+            section_rows[progress.section_id] = db_progress
+
+    if content_ids or lesson_ids:
+        crud_activity.record_activity(db, user_id, ActivityKind.PATH, now.date())
     db.commit()
+
+    return PathProgressBatchResult(
+        contents_updated=len(content_ids),
+        lessons_updated=len(lesson_ids),
+        sections_updated=len(section_ids)
+    )
@@ -1,36 +1,145 @@
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Optional
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from typing import Optional, Tuple
 
 from app.models.refresh_token import RefreshToken
-from app.core.security import create_refresh_token
+from app.core.security import create_refresh_token, hash_refresh_token
 
 
 def create_user_refresh_token(
     db: Session,
     *,
     user_id: int,
-    device_info: str = None,
-    expires_days: int = 30
-) -> RefreshToken:
+    device_id: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    expires_days: int = 30,
+    max_anonymous_families: int = 5
+) -> Tuple[RefreshToken, str]:
     """
-    Crea un nuevo refresh token para un usuario.
+    Emite un refresh token.
+    Con `device_id` (identificador que genera y guarda el cliente) la familia es la de ese
+    dispositivo: si ya existía, se reemplaza su token en la misma fila. Sin él, cada login
+    abre una familia propia; el User-Agent no sirve de clave porque lo comparten todos los
+    dispositivos con la misma app y versión. Para que esas filas no crezcan sin límite,
+    se conservan solo las `max_anonymous_families` familias sin dispositivo más recientes.
+    Devuelve la fila y el token en claro, que solo se entrega al cliente.
     """
     token_string = create_refresh_token()
-    expires_at = datetime.utcnow() + timedelta(days=expires_days)
-    
-    refresh_token = RefreshToken(
-        user_id=user_id,
-        token=token_string,
-        expires_at=expires_at,
-        device_info=device_info
-    )
+    values = {
+        "token_hash": hash_refresh_token(token_string),
+        "previous_token_hash": None,
+        "rotated_at": None,
+        "expires_at": datetime.utcnow() + timedelta(days=expires_days),
+        "created_at": datetime.utcnow(),
+        "is_revoked": False,
+        "user_agent": user_agent,
+    }
+
+    refresh_token = _get_device_family(db, user_id, device_id) if device_id else None
+    if refresh_token is None:
+        try:
+            with db.begin_nested():
+                refresh_token = RefreshToken(user_id=user_id, device_info=device_id, **values)
+                db.add(refresh_token)
+        except IntegrityError:
+            # Login simultáneo desde el mismo dispositivo: se reemplaza la fila que ganó
+            refresh_token = _get_device_family(db, user_id, device_id)
+
+    for key, value in values.items():
+        setattr(refresh_token, key, value)
+
+    if device_id is None:
+        db.flush()
+        _trim_anonymous_families(db, user_id, max_anonymous_families)
+
+    # Sin refresh: con una ráfaga de logins sin dispositivo, otro request puede haber
+    # descartado ya esta familia por el límite, y el login no usa la fila
+    db.commit()
     
-    db.add(refresh_token)
+    return refresh_token, token_string
+
+
+def _get_device_family(db: Session, user_id: int, device_id: str) -> Optional[RefreshToken]:
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.device_info == device_id
+    ).first()
+
+
+def _trim_anonymous_families(db: Session, user_id: int, keep: int) -> int:
+    """Borra las familias sin dispositivo del usuario salvo las `keep` más recientes."""
+    newest_ids = db.query(RefreshToken.id).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.device_info.is_(None)
+    ).order_by(RefreshToken.id.desc()).limit(max(1, keep)).scalar_subquery()
+
+    return db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.device_info.is_(None),
+        RefreshToken.id.notin_(newest_ids)
+    ).delete(synchronize_session=False)
+
+
+def rotate_refresh_token(
+    db: Session,
+    token: str,
+    *,
+    expires_days: int = 30,
+    reuse_grace_seconds: int = 30
+) -> Optional[Tuple[RefreshToken, str]]:
+    """
+    Canjea un refresh token válido por uno nuevo de la misma familia.
+
+    - Token actual: se rota (el actual pasa a ser el anterior).
+    - Token anterior dentro del margen de gracia: se rota de nuevo
+      (el cliente reintentó porque no recibió la respuesta).
+    - Token anterior fuera del margen: reutilización, se revoca la familia.
+    Devuelve None si el token no es válido.
+    """
+    presented_hash = hash_refresh_token(token)
+    now = datetime.utcnow()
+
+    refresh_token = db.query(RefreshToken).filter(
+        or_(
+            RefreshToken.token_hash == presented_hash,
+            RefreshToken.previous_token_hash == presented_hash
+        )
+    ).first()
+
+    if refresh_token is None or refresh_token.is_revoked or refresh_token.expires_at <= now:
+        return None
+
+    if refresh_token.token_hash != presented_hash:
+        in_grace = (
+            refresh_token.rotated_at is not None
+            and now - refresh_token.rotated_at <= timedelta(seconds=reuse_grace_seconds)
+        )
+        if not in_grace:
+            refresh_token.is_revoked = True
+            db.commit()
+            return None
+
+    token_string = create_refresh_token()
+    # Update condicional: si otro request rotó la familia entre la lectura y este punto,
+    # no se pisa su token
+    rotated = db.query(RefreshToken).filter(
+        RefreshToken.id == refresh_token.id,
+        RefreshToken.token_hash == refresh_token.token_hash
+    ).update({
+        "previous_token_hash": presented_hash,
+        "token_hash": hash_refresh_token(token_string),
+        "rotated_at": now,
+        "expires_at": now + timedelta(days=expires_days),
+    }, synchronize_session=False)
     db.commit()
+
+    if not rotated:
+        return None
+
     db.refresh(refresh_token)
-    
-    return refresh_token
+    return refresh_token, token_string
 
 
 def get_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
@@ -38,7 +147,7 @@ def get_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
     Obtiene un refresh token por su valor.
     """
     return db.query(RefreshToken).filter(
-        RefreshToken.token == token,
+        RefreshToken.token_hash == hash_refresh_token(token),
         RefreshToken.is_revoked == False,
         RefreshToken.expires_at > datetime.utcnow()
     ).first()
@@ -46,10 +155,14 @@ def get_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
 
 def revoke_refresh_token(db: Session, token: str) -> bool:
     """
-    Revoca un refresh token (lo marca como inválido).
+    Revoca la familia del refresh token (cierra sesión en ese dispositivo).
     """
+    token_hash = hash_refresh_token(token)
     refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == token
+        or_(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.previous_token_hash == token_hash
+        )
     ).first()
     
     if refresh_token:
@@ -62,7 +175,7 @@ def revoke_refresh_token(db: Session, token: str) -> bool:
 
 def revoke_all_user_tokens(db: Session, user_id: int) -> int:
     """
-    Revoca todos los refresh tokens de un usuario.
+    Revoca todas las familias (dispositivos y logins) de un usuario.
     Útil para "cerrar sesión en todos los dispositivos".
     """
     count = db.query(RefreshToken).filter(
@@ -74,14 +187,21 @@ def revoke_all_user_tokens(db: Session, user_id: int) -> int:
     return count
 
 
-def cleanup_expired_tokens(db: Session) -> int:
+def cleanup_expired_tokens(db: Session, batch_size: int = 1000) -> int:
     """
-    Elimina tokens expirados de la base de datos.
-    Se puede ejecutar periódicamente para mantener la BD limpia.
+    Elimina un lote de tokens expirados o revocados.
+    Devuelve cuántos borró; el sweeper repite mientras el lote venga lleno.
     """
+    batch_ids = db.query(RefreshToken.id).filter(
+        or_(
+            RefreshToken.expires_at < datetime.utcnow(),
+            RefreshToken.is_revoked == True
+        )
+    ).limit(batch_size).scalar_subquery()
+
     count = db.query(RefreshToken).filter(
-        RefreshToken.expires_at < datetime.utcnow()
-    ).delete()
+        RefreshToken.id.in_(batch_ids)
+    ).delete(synchronize_session=False)
     
     db.commit()
     return count
@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.section import Section
 from app.schemas.section import SectionCreate, SectionUpdate
+from app.services.catalog_cache import catalog_cache
 
 
 def get_section(db: Session, section_id: int) -> Optional[Section]:
@@ -19,6 +20,7 @@ def create_section(db: Session, section: SectionCreate) -> Section:
     db_section = Section(**section.dict())
     db.add(db_section)
     db.commit()
+    catalog_cache.invalidate()
     db.refresh(db_section)
     return db_section
 
@@ -31,6 +33,7 @@ def update_section(db: Session, section_id: int, section: SectionUpdate) -> Opti
         for field, value in update_data.items():
             setattr(db_section, field, value)
         db.commit()
+        catalog_cache.invalidate()
         db.refresh(db_section)
     return db_section
 
@@ -41,5 +44,6 @@ def delete_section(db: Session, section_id: int) -> bool:
     if db_section:
         db.delete(db_section)
         db.commit()
+        catalog_cache.invalidate()
         return True
     return False
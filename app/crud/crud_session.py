@@ -1,7 +1,9 @@
 # app/crud/crud_session.py
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import OperationalError, ProgrammingError, DBAPIError
+from sqlalchemy.exc import OperationalError, ProgrammingError, DBAPIError, IntegrityError
 from typing import Optional
 from datetime import datetime
 import json
@@ -22,17 +24,14 @@ def get_or_create_session(db: Session, user_id: int) -> SessionState:
         session = db.query(SessionState).filter(SessionState.user_id == user_id).first()
         
         if not session:
-            session = SessionState(
-                user_id=user_id,
-                greeted=False,
-                onboarding_complete=False,
-                strategy_given=False,
-                iteration=0,
-                slots={},
-                failed_attempts=0
-            )
+            session = _new_session(user_id)
             db.add(session)
-            db.commit()
+            try:
+                db.commit()
+            except IntegrityError:
+                # Otro request creó la sesión en paralelo (p. ej. historial y primer mensaje)
+                db.rollback()
+                return db.query(SessionState).filter(SessionState.user_id == user_id).one()
             db.refresh(session)
         
         return session
@@ -40,19 +39,40 @@ def get_or_create_session(db: Session, user_id: int) -> SessionState:
         logger.warning(f"Error de base de datos al obtener sesión. Usando sesión temporal en memoria: {e}")
         db.rollback()  # Rollback the failed transaction
         # Retornar sesión temporal sin persistencia
-        session = SessionState(
-            user_id=user_id,
-            greeted=False,
-            onboarding_complete=False,
-            strategy_given=False,
-            iteration=0,
-            slots={},
-            failed_attempts=0
-        )
+        session = _new_session(user_id)
         session.id = 0  # ID temporal
         return session
 
 
+def _new_session(user_id: int) -> SessionState:
+    return SessionState(
+        user_id=user_id,
+        greeted=False,
+        onboarding_complete=False,
+        strategy_given=False,
+        iteration=0,
+        slots={},
+        failed_attempts=0
+    )
+
+
+def _apply_session_data(session: SessionState, session_data: SessionStateSchema) -> None:
+    session.greeted = session_data.greeted
+    session.onboarding_complete = session_data.onboarding_complete
+    session.strategy_given = session_data.strategy_given
+    session.iteration = session_data.iteration
+    session.sentimiento_inicial = session_data.sentimiento_inicial
+    session.sentimiento_actual = session_data.sentimiento_actual
+    session.slots = session_data.slots.model_dump()
+    session.Q2 = session_data.Q2
+    session.Q3 = session_data.Q3
+    session.enfoque = session_data.enfoque
+    session.tiempo_bloque = session_data.tiempo_bloque
+    session.last_strategy = session_data.last_strategy
+    session.failed_attempts = session_data.failed_attempts
+    session.updated_at = datetime.utcnow()
+
+
 def update_session(db: Session, user_id: int, session_data: SessionStateSchema) -> SessionState:
     """
     Actualiza el estado de la sesión del usuario.
@@ -62,20 +82,7 @@ def update_session(db: Session, user_id: int, session_data: SessionStateSchema)
         session = get_or_create_session(db, user_id)
         
         # Actualizar campos
-        session.greeted = session_data.greeted
-        session.onboarding_complete = session_data.onboarding_complete
-        session.strategy_given = session_data.strategy_given
-        session.iteration = session_data.iteration
-        session.sentimiento_inicial = session_data.sentimiento_inicial
-        session.sentimiento_actual = session_data.sentimiento_actual
-        session.slots = session_data.slots.model_dump()
-        session.Q2 = session_data.Q2
-        session.Q3 = session_data.Q3
-        session.enfoque = session_data.enfoque
-        session.tiempo_bloque = session_data.tiempo_bloque
-        session.last_strategy = session_data.last_strategy
-        session.failed_attempts = session_data.failed_attempts
-        session.updated_at = datetime.utcnow()
+        _apply_session_data(session, session_data)
         
         # Solo intentar commit si la sesión tiene ID real
         if session.id != 0:
@@ -89,6 +96,54 @@ def update_session(db: Session, user_id: int, session_data: SessionStateSchema)
         return session
 
 
+# --- Variantes async (AsyncSession) para los endpoints `async def` ---
+
+async def get_or_create_session_async(db: AsyncSession, user_id: int) -> SessionState:
+    """
+    Variante async de get_or_create_session (mismo fallback a sesión temporal).
+    """
+    try:
+        session = await db.scalar(select(SessionState).where(SessionState.user_id == user_id).limit(1))
+
+        if not session:
+            session = _new_session(user_id)
+            db.add(session)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Otro request creó la sesión en paralelo
+                await db.rollback()
+                return await db.scalar(select(SessionState).where(SessionState.user_id == user_id))
+            await db.refresh(session)
+
+        return session
+    except (OperationalError, ProgrammingError, DBAPIError) as e:
+        logger.warning(f"Error de base de datos al obtener sesión. Usando sesión temporal en memoria: {e}")
+        await db.rollback()
+        session = _new_session(user_id)
+        session.id = 0  # ID temporal
+        return session
+
+
+async def update_session_async(db: AsyncSession, user_id: int, session_data: SessionStateSchema) -> SessionState:
+    """
+    Variante async de update_session.
+    """
+    session = await get_or_create_session_async(db, user_id)
+    try:
+        _apply_session_data(session, session_data)
+
+        if session.id != 0:
+            await db.commit()
+            await db.refresh(session)
+
+        return session
+    except (OperationalError, ProgrammingError, DBAPIError) as e:
+        logger.warning(f"No se pudo persistir la sesión: {e}")
+        await db.rollback()
+        return session
+
+
 def session_to_schema(session: SessionState) -> SessionStateSchema:
     """
     Convierte el modelo de SessionState a SessionStateSchema.
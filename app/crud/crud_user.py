@@ -1,6 +1,8 @@
+import asyncio
 from sqlalchemy.orm import Session
 from typing import List
-from app.core.security import get_password_hash, verify_password
+from app.core.security import averify_and_update_password
+from app.core.principal_cache import principal_cache
 from app.models.user import User
 from app.models.user_profile import UserProfile
 # CAMBIO: Ya no necesitamos PsychologistCreate aquí, solo UserCreate
@@ -13,12 +15,20 @@ def get_user_by_id(db: Session, user_id: int) -> User | None:
     """Obtiene un usuario por su ID."""
     return db.query(User).filter(User.id == user_id).first()
 
-def create_user(db: Session, user: UserCreate) -> User:
+def is_email_registered(db: Session, email: str) -> bool:
+    """
+    Comprueba si el email ya existe y devuelve la conexión al pool:
+    lo que sigue en el registro es el hash de bcrypt, que puede tardar.
+    """
+    registered = db.query(User.id).filter(User.email == email).first() is not None
+    db.rollback()
+    return registered
+
+def create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
     """
     Crea un nuevo usuario ALUMNO y su perfil asociado.
-    (Esta función no cambia)
+    El hash de la contraseña se calcula antes (security.aget_password_hash).
     """
-    hashed_password = get_password_hash(user.password)
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -52,14 +62,12 @@ def create_user(db: Session, user: UserCreate) -> User:
     return db_user
 
 
-def create_psychologist_user(db: Session, email: str, password: str) -> User:
+def create_psychologist_user(db: Session, email: str, hashed_password: str) -> User:
     """
     Crea un nuevo usuario PSICÓLOGO.
-    Ahora acepta email y password directamente,
+    Acepta email y el hash de la contraseña directamente,
     ya que la llave fue validada en el endpoint.
     """
-    # Usamos las variables 'password' y 'email' que vienen como argumentos
-    hashed_password = get_password_hash(password)
     db_user = User(
         email=email,
         hashed_password=hashed_password,
@@ -70,17 +78,53 @@ def create_psychologist_user(db: Session, email: str, password: str) -> User:
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str) -> User | None:
-    # (Esta función no cambia)
+def _get_user_for_login(db: Session, email: str) -> User | None:
+    """Usuario desligado de la sesión y conexión devuelta al pool antes de verificar la contraseña."""
     user = get_user_by_email(db, email=email)
+    if user is not None:
+        db.expunge(user)
+    db.rollback()
+    return user
+
+def _update_password_hash(db: Session, user_id: int, hashed_password: str) -> None:
+    db.query(User).filter(User.id == user_id).update(
+        {User.hashed_password: hashed_password},
+        synchronize_session=False
+    )
+    db.commit()
+
+async def authenticate_user(db: Session, email: str, password: str) -> User | None:
+    """
+    Verifica las credenciales. Si el hash se generó con otro costo de bcrypt,
+    lo reemplaza por uno con el costo actual.
+    Las consultas corren en un hilo y bcrypt en el pool de procesos: mientras se
+    verifica la contraseña no se ocupa ni un hilo del threadpool ni una conexión.
+    """
+    user = await asyncio.to_thread(_get_user_for_login, db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await averify_and_update_password(password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        await asyncio.to_thread(_update_password_hash, db, user.id, new_hash)
+        user.hashed_password = new_hash
     return user
 
 def get_all_students(db: Session) -> List[User]:
     """
     Obtiene una lista de todos los usuarios que tienen el rol 'student'.
     """
-    return db.query(User).filter(User.role == 'student').all()
\ No newline at end of file
+    return db.query(User).filter(User.role == 'student').all()
+
+def revoke_access_tokens(db: Session, user_id: int) -> None:
+    """
+    Invalida todos los access tokens emitidos para el usuario incrementando
+    su token_version, y lo saca de la caché de principals.
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.token_version: User.token_version + 1},
+        synchronize_session=False
+    )
+    db.commit()
+    principal_cache.invalidate(user_id)
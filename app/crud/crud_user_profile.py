@@ -1,5 +1,7 @@
 # mot_back/app/crud/crud_user_profile.py
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Any, Dict, Union
 
@@ -12,6 +14,12 @@ def get_profile(db: Session, user_id: int) -> UserProfile | None:
     """
     return db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
 
+async def get_profile_async(db: AsyncSession, user_id: int) -> UserProfile | None:
+    """
+    Variante async de get_profile.
+    """
+    return await db.scalar(select(UserProfile).where(UserProfile.user_id == user_id).limit(1))
+
 def create_profile(db: Session, *, profile_in: UserProfileCreate, user_id: int) -> UserProfile:
     """
     Crea un nuevo perfil para un usuario.
@@ -1,12 +1,14 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, desc
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-import random
 
 from app.models.wellness_exercise import WellnessExercise, ExerciseState
 from app.models.exercise_completion import ExerciseCompletion
+from app.models.exercise_rotation import UserExerciseRotation
 from app.schemas.wellness import WellnessExerciseCreate
+from app.services.exercise_catalog import CatalogExercise, exercise_catalog
 
 
 def get_exercise(db: Session, exercise_id: int) -> Optional[WellnessExercise]:
@@ -81,43 +83,94 @@ def get_random_exercise_for_user(
     db: Session,
     user_id: int,
     energy_state: str
-) -> Optional[WellnessExercise]:
+) -> Optional[CatalogExercise]:
     """
     Obtener el siguiente ejercicio en la secuencia para el usuario.
     Ciclo: 1 -> 2 -> 3 -> 1
+    El orden vive en el catálogo en memoria y el último ejercicio por estado
+    en user_exercise_rotation, así que la selección es una búsqueda por clave primaria
+    y el ejercicio sale del catálogo ya serializado, sin volver a leer la fila.
+    La primera vez crea el puntero de rotación sin hacer commit: lo confirma el llamador.
     """
-    # 1. Obtener todos los ejercicios válidos para el estado
-    valid_exercises = get_exercises_by_state(db, energy_state)
-    if not valid_exercises:
+    energy_state = energy_state.lower()
+    rotation = exercise_catalog.get_rotation(db, energy_state)
+    if not rotation:
         return None
-        
-    # Ordenar por ID para asegurar orden consistente
-    valid_exercises.sort(key=lambda x: x.id)
     
-    # 2. Buscar la última completación que coincida con alguno de la lista
-    valid_ids = [ex.id for ex in valid_exercises]
-    last_matching_completion = db.query(ExerciseCompletion).filter(
+    pointer = db.get(UserExerciseRotation, (user_id, energy_state))
+    if pointer is None:
+        pointer = _init_rotation_pointer(db, user_id, energy_state, rotation)
+    
+    if pointer.last_exercise_id in rotation:
+        # Devolver el siguiente (circular)
+        next_id = rotation[(rotation.index(pointer.last_exercise_id) + 1) % len(rotation)]
+    else:
+        # Si no ha hecho ninguno de esta lista, devolver el primero
+        next_id = rotation[0]
+    
+    exercise = exercise_catalog.get_exercise(db, next_id)
+    if exercise is None:
+        # El catálogo quedó desactualizado (ejercicio eliminado en otro worker)
+        exercise_catalog.invalidate()
+        rotation = exercise_catalog.get_rotation(db, energy_state)
+        return exercise_catalog.get_exercise(db, rotation[0]) if rotation else None
+    
+    return exercise
+
+
+def _init_rotation_pointer(
+    db: Session,
+    user_id: int,
+    energy_state: str,
+    rotation: List[int]
+) -> UserExerciseRotation:
+    """
+    Crea el puntero de rotación a partir del historial de completaciones.
+    Solo ocurre la primera vez que el usuario pide un ejercicio para este estado.
+    No hace commit (el savepoint solo aísla el choque con un request paralelo).
+    """
+    last_matching = db.query(ExerciseCompletion.exercise_id).filter(
         and_(
             ExerciseCompletion.user_id == user_id,
-            ExerciseCompletion.exercise_id.in_(valid_ids)
+            ExerciseCompletion.exercise_id.in_(rotation)
         )
     ).order_by(desc(ExerciseCompletion.started_at)).first()
     
-    if last_matching_completion:
-        # Encontrar el índice del último ejercicio
-        try:
-            last_index = next(
-                i for i, ex in enumerate(valid_exercises) 
-                if ex.id == last_matching_completion.exercise_id
-            )
-            # Devolver el siguiente (circular)
-            return valid_exercises[(last_index + 1) % len(valid_exercises)]
-        except StopIteration:
-            # Fallback por si acaso
-            return valid_exercises[0]
-            
-    # Si no ha hecho ninguno de esta lista, devolver el primero
-    return valid_exercises[0]
+    pointer = UserExerciseRotation(
+        user_id=user_id,
+        energy_state=energy_state,
+        last_exercise_id=last_matching[0] if last_matching else None
+    )
+    try:
+        with db.begin_nested():
+            db.add(pointer)
+    except IntegrityError:
+        # Otro request lo creó en paralelo
+        pointer = db.get(UserExerciseRotation, (user_id, energy_state))
+    return pointer
+
+
+def advance_rotation(db: Session, user_id: int, exercise_id: int) -> None:
+    """
+    Mueve los punteros de rotación del usuario al ejercicio recién realizado,
+    en todos los estados cuya rotación lo incluye.
+    No hace commit: se confirma junto con la completación.
+    """
+    for energy_state in exercise_catalog.get_states_for_exercise(db, exercise_id):
+        pointer = db.get(UserExerciseRotation, (user_id, energy_state))
+        if pointer is None:
+            try:
+                with db.begin_nested():
+                    db.add(UserExerciseRotation(
+                        user_id=user_id,
+                        energy_state=energy_state,
+                        last_exercise_id=exercise_id
+                    ))
+                continue
+            except IntegrityError:
+                # Otro request creó el puntero en paralelo: se actualiza esa fila
+                pointer = db.get(UserExerciseRotation, (user_id, energy_state))
+        pointer.last_exercise_id = exercise_id
 
 
 def create_exercise(db: Session, exercise: WellnessExerciseCreate) -> WellnessExercise:
@@ -126,6 +179,7 @@ def create_exercise(db: Session, exercise: WellnessExerciseCreate) -> WellnessEx
     db.add(db_exercise)
     db.commit()
     db.refresh(db_exercise)
+    exercise_catalog.invalidate()
     return db_exercise
 
 
@@ -140,41 +194,60 @@ def delete_exercise(db: Session, exercise_id: int) -> bool:
     
     db.delete(exercise)
     db.commit()
+    exercise_catalog.invalidate()
     return True
 
 
-def get_user_exercise_stats(db: Session, user_id: int, days: int = 30) -> dict:
+def get_user_exercise_stats(db: Session, user_id: int, days: int = 30, daily: bool = False) -> dict:
     """
-    Obtener estadísticas de ejercicios del usuario en los últimos N días
+    Obtener estadísticas de ejercicios del usuario en los últimos N días.
+    Conteos y promedio de mejora se calculan en SQL (GROUP BY / AVG).
+    Si daily=True, incluye además el total de ejercicios completados por día.
     """
     since = datetime.utcnow() - timedelta(days=days)
-    
-    completions = db.query(ExerciseCompletion).filter(
-        and_(
-            ExerciseCompletion.user_id == user_id,
-            ExerciseCompletion.started_at >= since,
-            ExerciseCompletion.completed == True
-        )
-    ).all()
-    
-    total_completed = len(completions)
+    window = and_(
+        ExerciseCompletion.user_id == user_id,
+        ExerciseCompletion.started_at >= since,
+        ExerciseCompletion.completed == True
+    )
     
     # Contar por estado
-    by_state = {}
-    for c in completions:
-        by_state[c.energy_state] = by_state.get(c.energy_state, 0) + 1
+    by_state = dict(
+        db.query(ExerciseCompletion.energy_state, func.count(ExerciseCompletion.id))
+        .filter(window)
+        .group_by(ExerciseCompletion.energy_state)
+        .all()
+    )
+    total_completed = sum(by_state.values())
     
     # Calcular promedio de mejora (intensidad pre - post)
-    improvements = [
-        c.intensity_pre - c.intensity_post 
-        for c in completions 
-        if c.intensity_pre is not None and c.intensity_post is not None
-    ]
-    avg_improvement = sum(improvements) / len(improvements) if improvements else 0
-    
-    return {
+    avg_improvement = db.query(
+        func.avg(ExerciseCompletion.intensity_pre - ExerciseCompletion.intensity_post)
+    ).filter(
+        window,
+        ExerciseCompletion.intensity_pre.isnot(None),
+        ExerciseCompletion.intensity_post.isnot(None)
+    ).scalar()
+    
+    stats = {
         "total_completed": total_completed,
         "by_state": by_state,
-        "avg_improvement": round(avg_improvement, 2),
+        "avg_improvement": round(float(avg_improvement), 2) if avg_improvement is not None else 0,
         "days_analyzed": days
     }
+    
+    if daily:
+        day = func.date(ExerciseCompletion.started_at)
+        rows = (
+            db.query(day, func.count(ExerciseCompletion.id))
+            .filter(window)
+            .group_by(day)
+            .order_by(day)
+            .all()
+        )
+        stats["daily"] = [
+            {"date": str(bucket_date), "total_completed": count}
+            for bucket_date, count in rows
+        ]
+    
+    return stats
@@ -0,0 +1,64 @@
+from typing import Dict, List, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+
+from app.models.wellness_summary import WellnessSummary
+
+
+def get_summaries(db: Session, exercise_id: int, energy_state: str) -> List[WellnessSummary]:
+    """Variantes pre-generadas para un ejercicio y estado, en orden de variante"""
+    return db.query(WellnessSummary).filter(
+        WellnessSummary.exercise_id == exercise_id,
+        WellnessSummary.energy_state == energy_state
+    ).order_by(WellnessSummary.variant).all()
+
+
+def get_summary_index(db: Session) -> Dict[Tuple[int, str], Tuple[datetime, str]]:
+    """
+    Para cada par (ejercicio, estado) con resúmenes: fecha de la variante más antigua y su prompt_hash.
+    Lo usa el job de generación para saltar los pares que están al día.
+    """
+    rows = db.query(
+        WellnessSummary.exercise_id,
+        WellnessSummary.energy_state,
+        func.min(WellnessSummary.generated_at),
+        func.min(WellnessSummary.prompt_hash)
+    ).group_by(WellnessSummary.exercise_id, WellnessSummary.energy_state).all()
+    return {(exercise_id, state): (generated_at, prompt_hash) for exercise_id, state, generated_at, prompt_hash in rows}
+
+
+def replace_summaries(
+    db: Session,
+    exercise_id: int,
+    energy_state: str,
+    texts: List[str],
+    prompt_hash: str
+) -> bool:
+    """
+    Reemplaza las variantes del par (ejercicio, estado) en una sola transacción.
+    Retorna False si otro proceso las reemplazó al mismo tiempo (se conservan las suyas).
+    """
+    now = datetime.utcnow()
+    db.query(WellnessSummary).filter(
+        WellnessSummary.exercise_id == exercise_id,
+        WellnessSummary.energy_state == energy_state
+    ).delete(synchronize_session=False)
+    db.add_all([
+        WellnessSummary(
+            exercise_id=exercise_id,
+            energy_state=energy_state,
+            variant=variant,
+            text=text,
+            prompt_hash=prompt_hash,
+            generated_at=now
+        )
+        for variant, text in enumerate(texts)
+    ])
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
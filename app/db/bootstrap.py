@@ -0,0 +1,123 @@
+# app/db/bootstrap.py
+"""
+Preparación de la base de datos: crea tablas, aplica las migraciones manuales
+(migrate_* en initial_data), siembra los datos iniciales y registra la versión del esquema.
+
+Se ejecuta una vez por despliegue, antes de levantar los workers:
+
+    python -m app.db.bootstrap          # aplica todo y registra SCHEMA_VERSION
+    python -m app.db.bootstrap --check  # solo informa la versión (exit 1 si no coincide)
+
+Los workers solo comprueban la versión con una consulta (check_schema_version).
+"""
+
+import argparse
+import logging
+import sys
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import app.models  # noqa: F401  Registra todos los modelos en Base.metadata
+from app.db.base import Base
+from app.db.session import engine, SessionLocal
+from app.db.initial_data import seed_db
+from app.models.schema_version import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+# Incrementar cada vez que se agrega un modelo o una función migrate_*
+SCHEMA_VERSION = 4
+
+# Clave del advisory lock de PostgreSQL que serializa bootstraps concurrentes
+_BOOTSTRAP_LOCK_KEY = 7_310_035
+
+
+def get_schema_version(db: Session) -> Optional[int]:
+    """Versión registrada en la base de datos, o None si nunca se corrió el bootstrap."""
+    try:
+        return db.execute(
+            text("SELECT version FROM schema_version WHERE id = 1")
+        ).scalar()
+    except SQLAlchemyError:
+        db.rollback()
+        return None
+
+
+def check_schema_version() -> bool:
+    """
+    Comprobación barata para el arranque de los workers: una sola consulta.
+    Acepta versiones mayores (despliegue escalonado con código anterior).
+    """
+    db = SessionLocal()
+    try:
+        version = get_schema_version(db)
+    finally:
+        db.close()
+
+    if version is None or version < SCHEMA_VERSION:
+        logger.error(
+            f"Schema version {version} is behind the code ({SCHEMA_VERSION}). "
+            "Run `python -m app.db.bootstrap` before starting the workers."
+        )
+        return False
+    if version > SCHEMA_VERSION:
+        logger.warning(f"Schema version {version} is newer than the code ({SCHEMA_VERSION}).")
+    return True
+
+
+def bootstrap() -> None:
+    """
+    Crea tablas, migra y siembra; registra SCHEMA_VERSION al terminar.
+    Si una migración falla la excepción se propaga y la versión no se registra, así
+    los workers siguen negándose a arrancar hasta que el bootstrap complete.
+    """
+    with engine.connect() as lock_conn:
+        if engine.dialect.name == "postgresql":
+            # Si varias instancias arrancan a la vez, solo una aplica el bootstrap;
+            # las demás esperan y luego encuentran todo hecho
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _BOOTSTRAP_LOCK_KEY})
+        try:
+            logger.info("Creating tables...")
+            Base.metadata.create_all(bind=engine)
+
+            db = SessionLocal()
+            try:
+                seed_db(db)
+
+                schema_version = db.get(SchemaVersion, 1)
+                if schema_version is None:
+                    db.add(SchemaVersion(id=1, version=SCHEMA_VERSION))
+                elif schema_version.version < SCHEMA_VERSION:
+                    schema_version.version = SCHEMA_VERSION
+                db.commit()
+            finally:
+                db.close()
+            logger.info(f"Database bootstrapped at schema version {SCHEMA_VERSION}")
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _BOOTSTRAP_LOCK_KEY})
+                lock_conn.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prepara la base de datos de MetaMotivation.")
+    parser.add_argument("--check", action="store_true", help="Solo comprobar la versión del esquema")
+    args = parser.parse_args()
+
+    if args.check:
+        return 0 if check_schema_version() else 1
+
+    try:
+        bootstrap()
+    except Exception as e:
+        logger.error(f"Bootstrap failed, schema version not recorded: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
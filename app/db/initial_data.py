@@ -1,14 +1,19 @@
 import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import text, inspect
+from sqlalchemy import text, inspect, select, literal, union, insert, func
 import json
 
+from app.core.security import hash_refresh_token
 from app.models.section import Section
 from app.models.question import Question
 from app.models.content import Content, ContentType
 from app.models.lesson import Lesson
 from app.models.refresh_token import RefreshToken  # Importar para que SQLAlchemy cree la tabla
 from app.models.wellness_exercise import WellnessExercise, ExerciseState
+from app.models.daily_check_in import DailyCheckIn
+from app.models.user_progress import UserContentProgress, UserLessonProgress
+from app.models.exercise_completion import ExerciseCompletion
+from app.models.user_daily_activity import UserDailyActivity, ActivityKind
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -78,6 +83,7 @@ def migrate_section_table(db: Session):
     except Exception as e:
         logger.error(f"Error during section table migration: {e}")
         db.rollback()
+        raise
 
 
 def migrate_session_states_table(db: Session):
@@ -115,15 +121,175 @@ def migrate_session_states_table(db: Session):
     except Exception as e:
         logger.error(f"Error during session_states table migration: {e}")
         db.rollback()
+        raise
+
+
+def migrate_users_table(db: Session):
+    """
+    Add the token_version column to users if it doesn't exist.
+    Existing users start at version 0, the same value new access tokens carry.
+    """
+    try:
+        inspector = inspect(db.bind)
+
+        if 'users' not in inspector.get_table_names():
+            logger.info("Table users doesn't exist yet. Will be created by Base.metadata.create_all()")
+            return
+
+        columns = [col['name'] for col in inspector.get_columns('users')]
+
+        if 'token_version' not in columns:
+            logger.info("Adding 'token_version' column to users table...")
+            db.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
+            db.commit()
+
+        logger.info("Users table migration completed.")
+    except Exception as e:
+        logger.error(f"Error during users table migration: {e}")
+        db.rollback()
+        raise
+
+
+def migrate_refresh_tokens_table(db: Session):
+    """
+    Replace the plaintext refresh_tokens.token column with its SHA-256 digest
+    (token_hash, unique index) and index expires_at for the expiry sweeper.
+    Existing tokens are hashed in place so active sessions survive the migration.
+    Then moves the User-Agent out of device_info, which is now the client-supplied
+    device id that keys each token family, without deleting any existing token.
+    """
+    try:
+        inspector = inspect(db.bind)
+
+        if 'refresh_tokens' not in inspector.get_table_names():
+            logger.info("Table refresh_tokens doesn't exist yet. Will be created by Base.metadata.create_all()")
+            return
+
+        columns = [col['name'] for col in inspector.get_columns('refresh_tokens')]
+
+        if 'token_hash' not in columns:
+            logger.info("Adding 'token_hash' column to refresh_tokens table...")
+            db.execute(text("ALTER TABLE refresh_tokens ADD COLUMN token_hash VARCHAR(64)"))
+            db.commit()
+
+            if 'token' in columns:
+                while True:
+                    rows = db.execute(text(
+                        "SELECT id, token FROM refresh_tokens WHERE token_hash IS NULL LIMIT 1000"
+                    )).all()
+                    if not rows:
+                        break
+                    db.execute(
+                        text("UPDATE refresh_tokens SET token_hash = :token_hash WHERE id = :id"),
+                        [{"id": row.id, "token_hash": hash_refresh_token(row.token)} for row in rows]
+                    )
+                    db.commit()
+
+            db.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_refresh_tokens_token_hash ON refresh_tokens (token_hash)"
+            ))
+            if db.bind.dialect.name == "postgresql":
+                db.execute(text("ALTER TABLE refresh_tokens ALTER COLUMN token_hash SET NOT NULL"))
+            db.commit()
+
+        if 'token' in columns:
+            logger.info("Dropping plaintext 'token' column from refresh_tokens table...")
+            db.execute(text("DROP INDEX IF EXISTS ix_refresh_tokens_token"))
+            db.execute(text("ALTER TABLE refresh_tokens DROP COLUMN token"))
+            db.commit()
+
+        db.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_expires_at ON refresh_tokens (expires_at)"
+        ))
+        db.commit()
+
+        # Token families: one row per (user, device), rotated in place
+        if 'previous_token_hash' not in columns:
+            logger.info("Adding token family columns to refresh_tokens table...")
+            db.execute(text("ALTER TABLE refresh_tokens ADD COLUMN previous_token_hash VARCHAR(64)"))
+            db.execute(text("ALTER TABLE refresh_tokens ADD COLUMN rotated_at TIMESTAMP"))
+            db.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_previous_token_hash "
+                "ON refresh_tokens (previous_token_hash)"
+            ))
+            db.commit()
+
+        # device_info used to hold the User-Agent, which every device running the same app
+        # build shares. It now holds the client-supplied device id: existing rows keep their
+        # User-Agent in user_agent and become per-login families (NULL device), so no
+        # active session is dropped.
+        if 'user_agent' not in columns:
+            logger.info("Moving User-Agent out of refresh_tokens.device_info...")
+            db.execute(text("ALTER TABLE refresh_tokens ADD COLUMN user_agent VARCHAR"))
+            db.execute(text("UPDATE refresh_tokens SET user_agent = device_info, device_info = NULL"))
+            db.commit()
+
+        # One family per (user, device id); NULL device ids don't collide in the unique index
+        unique_constraints = [uc['name'] for uc in inspector.get_unique_constraints('refresh_tokens')]
+        indexes = [ix['name'] for ix in inspector.get_indexes('refresh_tokens')]
+        if 'uq_refresh_tokens_user_device' not in unique_constraints + indexes:
+            logger.info("Adding unique (user_id, device_info) index to refresh_tokens table...")
+            db.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_refresh_tokens_user_device "
+                "ON refresh_tokens (user_id, device_info)"
+            ))
+            db.commit()
+
+        logger.info("Refresh tokens table migration completed.")
+    except Exception as e:
+        logger.error(f"Error during refresh_tokens table migration: {e}")
+        db.rollback()
+        raise
+
+
+def migrate_user_daily_activity(db: Session):
+    """
+    Backfill user_daily_activity from the existing history tables.
+    Only runs while the table is empty; afterwards the write paths keep it up to date.
+    Also drops the old (user_id, kind, activity_date) index, which duplicated the primary key.
+    """
+    try:
+        db.execute(text("DROP INDEX IF EXISTS ix_daily_activity_user_kind_date"))
+        db.commit()
+
+        if db.query(UserDailyActivity).first() is not None:
+            return
+        
+        history = union(
+            select(DailyCheckIn.user_id, literal(ActivityKind.CHECK_IN.value), DailyCheckIn.date),
+            select(UserContentProgress.user_id, literal(ActivityKind.PATH.value), func.date(UserContentProgress.last_accessed))
+            .where(UserContentProgress.last_accessed.isnot(None)),
+            select(UserLessonProgress.user_id, literal(ActivityKind.PATH.value), func.date(UserLessonProgress.last_accessed))
+            .where(UserLessonProgress.last_accessed.isnot(None)),
+            select(ExerciseCompletion.user_id, literal(ActivityKind.WELLNESS.value), func.date(ExerciseCompletion.started_at))
+            .where(ExerciseCompletion.completed == True),
+        )
+        
+        logger.info("Backfilling user_daily_activity from history tables...")
+        db.execute(
+            insert(UserDailyActivity).from_select(
+                ["user_id", "kind", "activity_date"], history
+            )
+        )
+        db.commit()
+        logger.info("user_daily_activity backfill completed.")
+    except Exception as e:
+        logger.error(f"Error during user_daily_activity backfill: {e}")
+        db.rollback()
+        raise
 
 
 def seed_db(db: Session):
     """
     Siembra la base de datos con las secciones y preguntas iniciales.
     """
-    # First, run migrations to add new columns if needed
+    # First, run migrations to add new columns if needed.
+    # Each one re-raises on failure so the bootstrap never stamps a half-migrated schema
     migrate_section_table(db)
     migrate_session_states_table(db)
+    migrate_users_table(db)
+    migrate_refresh_tokens_table(db)
+    migrate_user_daily_activity(db)
     
     # Comprueba si ya existen datos para no duplicar
     first_section = db.query(Section).first()
@@ -1,37 +1,141 @@
+import logging
+import os
+from uuid import uuid4
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Obtenemos la URL de la base de datos (puede ser construida o directa)
 database_url = settings.get_database_url()
+is_sqlite = database_url.startswith("sqlite")
 
-# Configuración específica para Azure PostgreSQL
-# - pool_pre_ping: Verifica conexiones antes de usarlas (importante para conexiones que pueden cerrarse)
-# - connect_args: Configuraciones SSL y timeouts para Azure
-# - pool_size: Tamaño del pool de conexiones
-# - max_overflow: Conexiones adicionales permitidas
-# - pool_recycle: Recicla conexiones después de 3600 segundos (1 hora)
+# Configuración del pool para Azure PostgreSQL (ver DB_* en config.py)
+# - DB_MAX_CONNECTIONS es el total de la app: se reparte entre los WEB_CONCURRENCY
+#   workers de gunicorn y, dentro de cada worker, entre el motor sync y el async.
+# - Sin pre-ping (un round-trip extra por checkout): las conexiones se reciclan antes
+#   de que el servidor o la red las corten por inactividad.
+# - DB_POOL_MODE=transaction: un pooler externo (PgBouncer / pooler de Azure) administra
+#   las conexiones; la app usa NullPool y no deja prepared statements con nombre fijo.
 
-connect_args = {
-    "sslmode": "require",  # Azure PostgreSQL requiere SSL
-    "connect_timeout": 10,  # Timeout de conexión en segundos
-}
+
+def get_pool_limits() -> tuple:
+    """(pool_size, max_overflow) por motor en este proceso."""
+    per_worker = max(2, settings.DB_MAX_CONNECTIONS // max(1, settings.WEB_CONCURRENCY))
+    per_engine = max(1, per_worker // 2)  # motor sync + motor async
+    pool_size = settings.DB_POOL_SIZE if settings.DB_POOL_SIZE is not None else max(1, per_engine // 2)
+    max_overflow = (
+        settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None
+        else max(0, per_engine - pool_size)
+    )
+    return pool_size, max_overflow
+
+
+def get_pool_args() -> dict:
+    """Argumentos de pool para create_engine / create_async_engine (PostgreSQL)."""
+    if settings.DB_POOL_MODE not in ("queue", "transaction"):
+        raise ValueError(f"DB_POOL_MODE desconocido: {settings.DB_POOL_MODE!r} (usa 'queue' o 'transaction')")
+    if settings.DB_POOL_MODE == "transaction":
+        return {"poolclass": NullPool}
+    pool_size, max_overflow = get_pool_limits()
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+if is_sqlite:
+    # SQLite local (benchmarks y desarrollo): la sesión se usa desde el threadpool
+    engine_args = {"connect_args": {"check_same_thread": False}}
+else:
+    engine_args = {
+        **get_pool_args(),
+        "connect_args": {
+            "sslmode": settings.DB_SSLMODE,  # Azure PostgreSQL requiere SSL
+            "connect_timeout": 10,  # Timeout de conexión en segundos
+        },
+    }
 
 # Creamos el motor de SQLAlchemy usando la URL de la base de datos desde nuestra configuración
-engine = create_engine(
-    database_url, 
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-    pool_recycle=3600,
-    connect_args=connect_args
-)
+engine = create_engine(database_url, **engine_args)
 
 # Creamos una clase SessionLocal, cada instancia de esta clase será una sesión de base de datos
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# --- Motor asíncrono (asyncpg / aiosqlite) para los endpoints `async def` ---
+# Mismas tablas y modelos; solo cambia el driver. asyncpg no entiende `sslmode`,
+# así que el modo SSL se pasa como `ssl` en connect_args.
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str):
+    sync_url = make_url(url)
+    return sync_url.set(
+        drivername=_ASYNC_DRIVERS.get(sync_url.drivername, sync_url.drivername)
+    ).difference_update_query(["sslmode"])
+
+
+if is_sqlite:
+    # aiosqlite usa NullPool con archivos: cada sesión abre su propia conexión
+    async_engine_args = {"connect_args": {"check_same_thread": False}}
+else:
+    async_connect_args = {
+        "ssl": settings.DB_SSLMODE,
+        "timeout": 10,
+    }
+    if settings.DB_POOL_MODE == "transaction":
+        # En transaction pooling cada transacción puede caer en otra conexión del servidor:
+        # sin caché de statements y con nombres únicos para no chocar entre clientes
+        async_connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        })
+    async_engine_args = {**get_pool_args(), "connect_args": async_connect_args}
+
+async_engine = create_async_engine(get_async_database_url(database_url), **async_engine_args)
+
+# expire_on_commit=False: tras un commit los objetos siguen legibles sin otra consulta
+# (en async no hay carga perezosa implícita de atributos expirados)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _dispose_pools_after_fork() -> None:
+    """
+    En el proceso hijo, descarta las conexiones heredadas del padre (p. ej. gunicorn
+    con --preload) sin cerrarlas: siguen siendo del padre y el hijo abre las suyas.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_pools_after_fork)
+
+if not is_sqlite:
+    if settings.DB_POOL_MODE == "transaction":
+        logger.info("DB pool: transaction mode (NullPool, pooler externo)")
+    else:
+        pool_size, max_overflow = get_pool_limits()
+        logger.info(
+            f"DB pool: pool_size={pool_size} max_overflow={max_overflow} por motor (sync y async), "
+            f"{settings.WEB_CONCURRENCY} workers, recycle={settings.DB_POOL_RECYCLE_SECONDS}s"
+        )
+
 # Dependencia para obtener la sesión de base de datos
 def get_db():
     """
@@ -43,3 +147,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Igual que get_db, pero con una AsyncSession: las consultas no bloquean el event loop.
+    Se usa en los endpoints `async def`.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
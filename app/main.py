@@ -1,16 +1,30 @@
 # mot_back/app/main.py
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+import asyncio
+import contextlib
 import logging
 
-from app.db.base import Base 
-from app.db.session import engine, SessionLocal
-from app.db.initial_data import seed_db
+from app.core.config import settings
+from app.core.query_metrics import QueryMetricsMiddleware, install_query_listeners
+from app.core.metrics import (
+    PrometheusMiddleware,
+    RATE_LIMIT_REJECTIONS,
+    install_pool_metrics,
+    render_metrics,
+    route_label,
+)
+from app.db.session import engine, async_engine
+from app.db.bootstrap import bootstrap, check_schema_version
+from app.core.security import password_hasher
+from app.core.password_hasher import PasswordHasherBusy
+from app.core.rate_limit import RateLimitExceeded, retry_after_header
+from app.services.llm_budget import LLMBudgetMiddleware
+from app.services.token_sweeper import run_refresh_token_sweeper
+from app.services.wellness_summaries import run_wellness_summary_refresher
 
 from app.api.v1.endpoints import users as user_endpoints
 from app.api.v1.endpoints import login as login_endpoints
@@ -27,42 +41,60 @@ from app.api.v1.endpoints import feedback as feedback_endpoints
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configurar Rate Limiter
-# Usa la IP del cliente para identificar usuarios
-limiter = Limiter(key_func=get_remote_address, default_limits=["200/minute"])
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logger.info("🚀 Iniciando aplicación y creando tablas...")
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("✅ Tablas creadas exitosamente")
-        
-        db = SessionLocal()
-        try:
-            seed_db(db)
-            logger.info("✅ Datos iniciales cargados")
-        finally:
-            db.close()
-    except Exception as e:
-        logger.error(f"❌ Error durante el inicio: {str(e)}")
-        raise
-    
+    # Tablas, migraciones y siembra viven en `python -m app.db.bootstrap` (ver startup.sh);
+    # aquí solo se comprueba la versión del esquema con una consulta
+    logger.info("🚀 Iniciando aplicación...")
+    if not await asyncio.to_thread(check_schema_version):
+        if not settings.DB_AUTO_BOOTSTRAP:
+            raise RuntimeError("Esquema de base de datos desactualizado: ejecuta `python -m app.db.bootstrap`")
+        logger.info("DB_AUTO_BOOTSTRAP activo: preparando la base de datos en este worker...")
+        await asyncio.to_thread(bootstrap)
+    logger.info("✅ Esquema de base de datos al día")
+
+    sweeper_task = asyncio.create_task(run_refresh_token_sweeper())
+    # Regenera en segundo plano los resúmenes de bienestar que falten o estén obsoletos
+    summary_refresher_task = asyncio.create_task(run_wellness_summary_refresher())
+
     yield
     
     logger.info("👋 Apagando aplicación...")
+    for task in (sweeper_task, summary_refresher_task):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="MetaMotivation API", 
     version="1.0.0", 
     lifespan=lifespan,
+    # orjson para todas las respuestas JSON (las rutas de catálogo devuelven bytes ya codificados)
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs",
     redoc_url="/api/redoc"
 )
 
-# Agregar limiter al estado de la app
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Rate limiting por usuario: ver app/core/rate_limit.py y deps.rate_limit
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    RATE_LIMIT_REJECTIONS.labels(route_label(request.scope)).inc()
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(exc)},
+        headers={"Retry-After": retry_after_header(exc)},
+    )
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """La cola de bcrypt está llena (p. ej. pico de logins): el cliente debe reintentar."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio de autenticación saturado, intenta nuevamente en unos segundos."},
+        headers={"Retry-After": "1"},
+    )
 
 # Configuración CORS para Azure
 # Para apps nativas (APK), no necesitamos dominios específicos
@@ -74,6 +106,19 @@ origins = [
     # porque no tienen "origin" como los navegadores web
 ]
 
+# Consultas SQL por request: Server-Timing, log y detección de N+1
+install_query_listeners(engine)
+install_query_listeners(async_engine.sync_engine)
+app.add_middleware(QueryMetricsMiddleware)
+
+# Presupuesto de tokens del LLM: cobra al terminar cada request, incluido el streaming
+app.add_middleware(LLMBudgetMiddleware)
+
+# Métricas Prometheus (GET /metrics): latencia HTTP y estado del pool de conexiones
+install_pool_metrics(engine)
+install_pool_metrics(async_engine.sync_engine, "async")
+app.add_middleware(PrometheusMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -107,5 +152,16 @@ def health_check():
     """Endpoint de health check para Azure"""
     return {
         "status": "healthy",
-        "service": "MetaMotivation API"
+        "service": "MetaMotivation API",
+        "password_hashing": password_hasher.stats()
     }
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Métricas en formato Prometheus, agregadas entre los workers de gunicorn"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404)
+    if settings.METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
@@ -13,6 +13,8 @@ from .session_state import SessionState
 from .wellness_exercise import WellnessExercise, ExerciseState
 from .metamotivation_energy import MetamotivationEnergy
 from .exercise_completion import ExerciseCompletion
-
-
-
+from .user_daily_activity import UserDailyActivity, UserActivityStreak, ActivityKind
+from .exercise_rotation import UserExerciseRotation
+from .schema_version import SchemaVersion
+from .rate_limit_bucket import RateLimitBucket
+from .wellness_summary import WellnessSummary
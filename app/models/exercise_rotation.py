@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class UserExerciseRotation(Base):
+    """
+    Puntero al último ejercicio realizado por el usuario para cada estado del semáforo.
+    Permite elegir el siguiente ejercicio de la rotación con una sola búsqueda por clave primaria.
+    """
+    __tablename__ = "user_exercise_rotation"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    energy_state = Column(String(20), primary_key=True)  # "verde", "ambar", "rojo"
+    last_exercise_id = Column(Integer, ForeignKey("wellness_exercises.id", ondelete="SET NULL"), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
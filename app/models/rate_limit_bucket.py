@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Float, DateTime
+
+from app.db.base import Base
+
+
+class RateLimitBucket(Base):
+    """
+    Token bucket compartido entre workers (RATE_LIMIT_BACKEND=postgres).
+    Una fila por clave ("chat_send:user:42"); cada consulta la actualiza con un solo upsert.
+    """
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(128), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -6,16 +6,32 @@ from app.db.base import Base
 
 
 class RefreshToken(Base):
-    """Modelo para almacenar refresh tokens"""
+    """
+    Modelo para almacenar refresh tokens.
+    Cada fila es una familia de tokens: el token rota en cada refresh.
+    Si el cliente envía un identificador de dispositivo (device_info), la familia es la de
+    ese dispositivo y un nuevo login en él reemplaza la fila; sin identificador, cada login
+    abre su propia familia (device_info NULL, no choca con el índice único).
+    """
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        UniqueConstraint("user_id", "device_info", name="uq_refresh_tokens_user_device"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    token = Column(String, unique=True, index=True, nullable=False)
-    expires_at = Column(DateTime, nullable=False)
+    # Solo se guarda el SHA-256 del token; el valor en claro lo recibe únicamente el cliente
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # Token anterior de la familia: si se vuelve a presentar fuera del margen de gracia,
+    # alguien reutilizó un token ya rotado y se revoca la familia completa
+    previous_token_hash = Column(String(64), index=True, nullable=True)
+    rotated_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_revoked = Column(Boolean, default=False)
-    device_info = Column(String, nullable=True)  # Info del dispositivo (opcional)
+    # Identificador de dispositivo generado por el cliente (header X-Device-Id)
+    device_info = Column(String, nullable=True)
+    user_agent = Column(String, nullable=True)  # Solo informativo
     
     # Relación
     user = relationship("User", back_populates="refresh_tokens")
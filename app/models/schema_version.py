@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, DateTime
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class SchemaVersion(Base):
+    """
+    Versión del esquema aplicada por `python -m app.db.bootstrap`.
+    Tiene una sola fila (id = 1); los workers la leen al arrancar en vez de reflejar tablas.
+    """
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -17,6 +17,10 @@ class User(Base):
     # Los psicólogos tendrán el rol "psychologist"
     role = Column(String, default="student", nullable=False)
 
+    # Versión de los access tokens: se incrementa en logout-all o cambio de rol
+    # para invalidar los JWT ya emitidos
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+
     # Relación inversa con las respuestas
     answers = relationship("Answer", back_populates="user")
     
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey
+import enum
+
+from app.db.base import Base
+
+
+class ActivityKind(str, enum.Enum):
+    """Tipo de actividad diaria que alimenta las rachas"""
+    CHECK_IN = "check_in"
+    PATH = "path"
+    WELLNESS = "wellness"
+
+
+class UserDailyActivity(Base):
+    """
+    Registro materializado de los días en que un usuario tuvo actividad de cada tipo.
+    Se alimenta desde los endpoints de escritura (check-in, path, bienestar)
+    para que las rachas no tengan que recorrer el historial completo.
+    """
+    __tablename__ = "user_daily_activity"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(20), primary_key=True)  # "check_in", "path", "wellness"
+    activity_date = Column(Date, primary_key=True)
+
+
+class UserActivityStreak(Base):
+    """
+    Contador de racha actual por usuario y tipo de actividad.
+    Se actualiza en cada escritura, así leer la racha es una sola búsqueda por clave primaria.
+    """
+    __tablename__ = "user_activity_streaks"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(20), primary_key=True)
+    current_streak = Column(Integer, default=0, nullable=False)
+    last_activity_date = Column(Date, nullable=True)
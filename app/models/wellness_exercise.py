@@ -47,3 +47,6 @@ class WellnessExercise(Base):
     
     # Relación con completaciones
     completions = relationship("ExerciseCompletion", back_populates="exercise", cascade="all, delete-orphan")
+
+    # Resúmenes pre-generados por IA (ver app/services/wellness_summaries.py)
+    summaries = relationship("WellnessSummary", back_populates="exercise", cascade="all, delete-orphan")
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from app.db.base import Base
+
+
+class WellnessSummary(Base):
+    """
+    Resumen pre-generado por IA para un ejercicio y un estado del semáforo.
+    Hay varias variantes por par (ejercicio, estado) y el endpoint de recomendación las rota.
+    `prompt_hash` identifica los datos del ejercicio con que se generó: si el ejercicio
+    cambia, el resumen queda obsoleto y se regenera en segundo plano.
+    """
+    __tablename__ = "wellness_summaries"
+    __table_args__ = (
+        UniqueConstraint("exercise_id", "energy_state", "variant", name="uq_wellness_summary_variant"),
+        Index("ix_wellness_summaries_exercise_state", "exercise_id", "energy_state"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    exercise_id = Column(Integer, ForeignKey("wellness_exercises.id", ondelete="CASCADE"), nullable=False)
+    energy_state = Column(String(20), nullable=False)  # "verde", "ambar", "rojo"
+    variant = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    prompt_hash = Column(String(64), nullable=False)
+    generated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    exercise = relationship("WellnessExercise", back_populates="summaries")
@@ -10,7 +10,7 @@ from .user_progress import (
     UserContentProgress, UserContentProgressCreate,
     UserLessonProgress, UserLessonProgressCreate,
     UserSectionProgress, UserSectionProgressCreate,
-    PathOverview
+    PathOverview, PathProgressBatch, PathProgressBatchResult
 )
 from .chat import (
     ChatMessage, ChatMessageCreate, ChatRequest, ChatResponse, 
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+
+from app.schemas.daily_check_in import DailyCheckInRead
 
 class SectionAverage(BaseModel):
     section_name: str
@@ -7,3 +9,16 @@ class SectionAverage(BaseModel):
 
 class QuestionnaireSummaryResponse(BaseModel):
     summary: List[SectionAverage]
+
+class WellnessStats(BaseModel):
+    streak: int
+    total_completions: int
+    last_completion: Optional[str] = None
+
+class DashboardBundle(BaseModel):
+    """Todos los datos de la pantalla de dashboard en una sola respuesta"""
+    motivation_history: List[DailyCheckInRead]
+    questionnaire_summary: List[SectionAverage]
+    streak: int
+    path_streak: int
+    wellness_stats: WellnessStats
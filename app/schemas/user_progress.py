@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 
@@ -68,3 +68,17 @@ class PathOverview(BaseModel):
     current_section_id: Optional[int] = None
     current_section_name: Optional[str] = None
     overall_progress_percentage: float
+
+
+class PathProgressBatch(BaseModel):
+    """Batch of progress events (e.g. an offline backlog flushed at once)"""
+    contents: List[UserContentProgressCreate] = []
+    lessons: List[UserLessonProgressCreate] = []
+    sections: List[UserSectionProgressCreate] = []
+
+
+class PathProgressBatchResult(BaseModel):
+    """Summary of a batch progress update"""
+    contents_updated: int = 0
+    lessons_updated: int = 0
+    sections_updated: int = 0
@@ -3,7 +3,8 @@
 """
 Servicio de IA para Flou - Tutor Metamotivacional
 Basado en Miele & Scholer (2016) y el modelo de Task-Motivation Fit
-Usa Google gemini-1.5-flash-latest para extracción de slots y generación de respuestas
+Usa el proveedor LLM configurado (Gemini por defecto, ver llm_provider.py)
+para extracción de slots y generación de respuestas
 """
 
 import logging
@@ -11,11 +12,11 @@ import re
 import json
 import time
 import uuid
+from collections import defaultdict
 from typing import Optional, Dict, List, Tuple, AsyncGenerator
 from datetime import datetime
-import google.generativeai as genai
 
-from app.core.config import settings
+from app.services.llm_provider import LLMCallSkipped, get_llm_provider
 from app.schemas.chat import (
     SessionStateSchema, Slots,
     Sentimiento, TipoTarea, Fase, Plazo, TiempoBloque
@@ -41,16 +42,9 @@ def log_structured(level: str, event: str, **kwargs):
     }
     getattr(logger, level)(json.dumps(log_data))
 
-# Configurar Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
 # Nombre de la IA
 AI_NAME = 'Flou'
 
-# Modelo por defecto (exportado para compatibilidad con wellness.py)
-# Usando gemini-2.0-flash para mayor rendimiento y capacidades
-model = genai.GenerativeModel('gemini-2.0-flash')
-
 
 # ---------------------------- PROMPT DE SISTEMA ---------------------------- #
 
@@ -172,8 +166,6 @@ async def detect_crisis(text: str) -> Dict[str, any]:
             return {"is_crisis": False, "confidence": 1.0, "reason": "No keywords detected"}
         
         # Si hay keywords, validar con LLM para evitar falsos positivos
-        guardrail_model = genai.GenerativeModel('gemini-2.0-flash')
-        
         guardrail_prompt = f"""Analiza este mensaje de un estudiante y determina si expresa ideación suicida o riesgo vital REAL.
 
 REGLAS:
@@ -185,15 +177,12 @@ Mensaje: "{text}"
 
 JSON:"""
         
-        response = guardrail_model.generate_content(
+        result_text = (await get_llm_provider().agenerate(
             guardrail_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0,  # Determinístico
-                max_output_tokens=100
-            )
-        )
-        
-        result_text = response.text.strip()
+            purpose="guardrail",
+            temperature=0.0,  # Determinístico
+            max_output_tokens=100
+        )).strip()
         json_match = re.search(r'\{[\s\S]*\}', result_text)
         
         if json_match:
@@ -330,8 +319,6 @@ async def extract_slots_with_llm(free_text: str, current_slots: Slots) -> Slots:
     Extrae slots estructurados del texto libre usando Gemini 2.0 Flash
     """
     try:
-        llm_model = genai.GenerativeModel('gemini-2.0-flash')
-        
         sys_prompt = """Extrae como JSON compacto los campos del texto del usuario:
 - sentimiento: aburrimiento|frustracion|ansiedad_error|dispersion_rumiacion|baja_autoeficacia|otro
 - sentimiento_otro: texto libre si es "otro"
@@ -349,15 +336,12 @@ Slots actuales: {current_slots.model_dump_json()}
 
 JSON extraído:"""
 
-        response = llm_model.generate_content(
+        raw = (await get_llm_provider().agenerate(
             f"{sys_prompt}\n\n{user_prompt}",
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.2,
-                max_output_tokens=500
-            )
-        )
-        
-        raw = response.text.strip()
+            purpose="slots",
+            temperature=0.2,
+            max_output_tokens=500
+        )).strip()
         
         # Extraer JSON del texto
         json_match = re.search(r'\{[\s\S]*\}', raw)
@@ -431,6 +415,53 @@ def infer_q2_q3(slots: Slots) -> Tuple[str, str, str]:
     return Q2, Q3, enfoque
 
 
+# ---------------------------- RESPALDO SIN LLM ---------------------------- #
+
+# Valores para los campos de las plantillas de strategies.py cuando no hay LLM que los complete
+_TEMPLATE_DEFAULTS = {
+    "tema": "tu tarea",
+    "tarea": "tu tarea",
+    "cantidad": "2",
+    "accion_especifica": "Elige la parte más pequeña de tu tarea y trabaja solo en ella, sin distracciones.",
+    "paso_1": "Define qué parte vas a trabajar",
+    "paso_2": "Trabaja en ella sin interrupciones",
+    "paso_3": "Revisa lo que lograste",
+    "paso_1_detallado": "Escribe en una línea qué parte vas a trabajar",
+    "paso_2_detallado": "Activa un temporizador y trabaja solo en esa parte",
+    "paso_3_detallado": "Anota lo que avanzaste y el siguiente paso",
+    "item_1": "Tengo abierto solo el material de esta tarea",
+    "item_2": "Avancé en la parte que elegí",
+    "item_3": "Anoté el siguiente paso",
+}
+
+
+def strategy_template_reply(session: SessionStateSchema) -> str:
+    """
+    Estrategia del banco (seleccionar_estrategia) con su plantilla completada a partir de
+    la sesión. Se usa cuando no se llama al LLM (presupuesto de tokens agotado o
+    LLM sobrecargado, ver LLMCallSkipped).
+    """
+    slots = session.slots
+    tiempo = slots.tiempo_bloque or session.tiempo_bloque or 15
+    try:
+        enfoque = EnfoqueRegulatorio(session.enfoque)
+    except ValueError:
+        enfoque = EnfoqueRegulatorio.PROMOCION_EAGER
+    nivel = NivelConstruccion.ABSTRACTO if session.Q3 == "↑" else NivelConstruccion.CONCRETO
+
+    estrategia = seleccionar_estrategia(
+        enfoque, nivel, slots.tipo_tarea or "", slots.fase or "", tiempo, slots.sentimiento
+    )
+    valores = defaultdict(str, _TEMPLATE_DEFAULTS)
+    valores.update(tiempo=tiempo, mitad_tiempo=max(1, tiempo // 2))
+    if slots.tipo_tarea:
+        tarea = slots.tipo_tarea.replace("_", " ")
+        if slots.ramo:
+            tarea = f"{tarea} de {slots.ramo}"
+        valores.update(tema=f"tu {tarea}", tarea=f"tu {tarea}")
+    return estrategia["template"].format_map(valores).strip()
+
+
 # ---------------------------- ORQUESTADOR PRINCIPAL ---------------------------- #
 
 async def handle_user_turn(session: SessionStateSchema, user_text: str, context: str = "", chat_history: Optional[List[Dict[str, str]]] = None) -> Tuple[str, SessionStateSchema, Optional[List[Dict[str, str]]]]:
@@ -756,11 +787,6 @@ A veces necesitamos un enfoque más profundo para gestionar emociones. Te sugier
     
     # 7) Generar respuesta conversacional usando Gemini con historial
     try:
-        llm_model = genai.GenerativeModel(
-            model_name='gemini-2.0-flash',
-            system_instruction=get_system_prompt(enfoque=session.enfoque, nivel=session.Q3)
-        )
-        
         # Construir el historial de conversación para Gemini
         history = []
         if chat_history:
@@ -797,22 +823,21 @@ A veces necesitamos un enfoque más profundo para gestionar emociones. Te sugier
 {context if context else ""}
 """
         
-        # Iniciar chat con historial
-        chat = llm_model.start_chat(history=history)
-        
-        # Enviar mensaje actual con contexto
+        # Enviar mensaje actual con contexto, sobre el historial
         full_message = f"{info_contexto}\n\nEstudiante: {user_text}"
-        response = chat.send_message(
+        reply = (await get_llm_provider().agenerate(
             full_message,
-            generation_config=genai.types.GenerationConfig(
-                temperature=1,
-                max_output_tokens=400,  # Aumentado para dar mejores explicaciones
-                top_p=0.95
-            )
-        )
-        
-        reply = response.text.strip()
-        
+            purpose="chat",
+            system_instruction=get_system_prompt(enfoque=session.enfoque, nivel=session.Q3),
+            history=history,
+            temperature=1,
+            max_output_tokens=400,  # Aumentado para dar mejores explicaciones
+            top_p=0.95
+        )).strip()
+        
+    except LLMCallSkipped as e:
+        log_structured("warning", "llm_skipped_fallback", request_id="non_streaming", reason=str(e))
+        reply = strategy_template_reply(session)
     except Exception as e:
         logger.error(f"Error generando respuesta conversacional: {e}")
         # Fallback simple y empático
@@ -835,6 +860,19 @@ A veces necesitamos un enfoque más profundo para gestionar emociones. Te sugier
 
 # ---------------------------- FUNCIONES DE STREAMING ---------------------------- #
 
+async def _stream_chat_reply(session: SessionStateSchema, request_id: str, prompt: str, **kwargs) -> AsyncGenerator[str, None]:
+    """
+    Fragmentos de la respuesta del LLM. Si la llamada se omite (LLMCallSkipped) antes del
+    primer fragmento, entrega la estrategia del banco en un solo fragmento.
+    """
+    try:
+        async for chunk_text in get_llm_provider().astream(prompt, **kwargs):
+            yield chunk_text
+    except LLMCallSkipped as e:
+        log_structured("warning", "llm_skipped_fallback", request_id=request_id, reason=str(e))
+        yield strategy_template_reply(session)
+
+
 async def handle_user_turn_streaming(
     session: SessionStateSchema,
     user_text: str,
@@ -1195,11 +1233,6 @@ async def handle_user_turn_streaming(
         yield metadata_event
         
         # 7) Generar respuesta con STREAMING
-        llm_model = genai.GenerativeModel(
-            model_name='gemini-2.0-flash',
-            system_instruction=get_system_prompt(enfoque=session.enfoque, nivel=session.Q3)
-        )
-        
         # Construir historial
         history = []
         if chat_history:
@@ -1231,7 +1264,6 @@ async def handle_user_turn_streaming(
 {context if context else ""}
 """
         
-        chat = llm_model.start_chat(history=history)
         full_message = f"{info_contexto}\n\nEstudiante: {user_text}"
         
         log_structured("info", "gemini_request_start",
@@ -1240,14 +1272,16 @@ async def handle_user_turn_streaming(
                      history_count=len(history))
         
         # STREAMING: enviar chunks en tiempo real
-        response = chat.send_message(
+        response = _stream_chat_reply(
+            session,
+            request_id,
             full_message,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.8,
-                max_output_tokens=400,
-                top_p=0.95
-            ),
-            stream=True  # 🔥 STREAMING ACTIVADO
+            purpose="chat",
+            system_instruction=get_system_prompt(enfoque=session.enfoque, nivel=session.Q3),
+            history=history,
+            temperature=0.8,
+            max_output_tokens=400,
+            top_p=0.95
         )
         
         accumulated_text = ""
@@ -1255,21 +1289,20 @@ async def handle_user_turn_streaming(
         
         log_structured("info", "streaming_started", request_id=request_id)
         
-        for chunk in response:
-            if chunk.text:
-                accumulated_text += chunk.text
-                chunk_count += 1
-                yield {
-                    "type": "chunk",
-                    "data": {"text": chunk.text}
-                }
-                
-                # Log cada 5 chunks para no saturar
-                if chunk_count % 5 == 0:
-                    log_structured("debug", "streaming_progress",
-                                 request_id=request_id,
-                                 chunk_count=chunk_count,
-                                 accumulated_length=len(accumulated_text))
+        async for chunk_text in response:
+            accumulated_text += chunk_text
+            chunk_count += 1
+            yield {
+                "type": "chunk",
+                "data": {"text": chunk_text}
+            }
+            
+            # Log cada 5 chunks para no saturar
+            if chunk_count % 5 == 0:
+                log_structured("debug", "streaming_progress",
+                             request_id=request_id,
+                             chunk_count=chunk_count,
+                             accumulated_length=len(accumulated_text))
         
         log_structured("info", "streaming_chunks_complete",
                      request_id=request_id,
@@ -1331,23 +1364,18 @@ async def generate_chat_response(user_message: str, context: Optional[str] = Non
     logger.warning("Usando generate_chat_response legacy - considera migrar a handle_user_turn")
     
     try:
-        llm_model = genai.GenerativeModel('gemini-2.0-flash')
-        
         full_prompt = get_system_prompt() + "\n\n"
         if context:
             full_prompt += f"{context}\n\n"
         full_prompt += f"El usuario pregunta: \"{user_message}\""
         
-        response = llm_model.generate_content(
+        return await get_llm_provider().agenerate(
             full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=300
-            )
+            purpose="chat",
+            temperature=0.7,
+            max_output_tokens=300
         )
         
-        return response.text
-        
     except Exception as error:
         logger.error(f"Error en la llamada a Gemini: {error}")
         return "Lo siento, tuve un problema para procesar tu solicitud. Por favor, intenta de nuevo."
@@ -1356,8 +1384,6 @@ async def generate_chat_response(user_message: str, context: Optional[str] = Non
 async def generate_profile_summary(profile: dict) -> str:
     """Genera un resumen del perfil del usuario usando Gemini"""
     try:
-        llm_model = genai.GenerativeModel('gemini-2.0-flash')
-        
         summary_prompt = f"""
 ### Rol
 Eres {AI_NAME}, un asistente de IA empático y perspicaz. Tu objetivo es analizar los datos del perfil de un usuario y generar un resumen breve (2-3 frases), positivo y constructivo.
@@ -1375,16 +1401,13 @@ Basado en los siguientes datos del perfil en formato JSON, crea un resumen que d
 ### Tu Resumen:
 """
         
-        response = llm_model.generate_content(
+        return await get_llm_provider().agenerate(
             summary_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=200
-            )
+            purpose="summary",
+            temperature=0.7,
+            max_output_tokens=200
         )
         
-        return response.text
-        
     except Exception as error:
         logger.error(f"Error al generar el resumen del perfil: {error}")
         return ""
@@ -1424,8 +1447,6 @@ async def generate_checkin_feedback(current_level: int, previous_level: Optional
                 prompt_type = "maintenance"
 
     try:
-        llm_model = genai.GenerativeModel('gemini-2.0-flash')
-        
         system_prompt = f"""Eres {AI_NAME}, una IA motivacional empática.
 Genera un mensaje corto (máximo 2 frases) para el usuario después de su check-in diario.
 Usa emojis. Sé cercana y chilena natural.
@@ -1443,15 +1464,12 @@ Instrucciones según situación:
 
 Mensaje:"""
 
-        response = llm_model.generate_content(
+        message = (await get_llm_provider().agenerate(
             system_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=100
-            )
-        )
-        
-        message = response.text.strip()
+            purpose="checkin",
+            temperature=0.7,
+            max_output_tokens=100
+        )).strip()
         
     except Exception as e:
         logger.error(f"Error generando feedback check-in: {e}")
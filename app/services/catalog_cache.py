@@ -0,0 +1,172 @@
+# app/services/catalog_cache.py
+
+"""
+Respuestas pre-serializadas de los catálogos estáticos: preguntas del cuestionario y
+secciones del path con sus contenidos y lecciones.
+
+Son iguales para todos los usuarios y solo cambian con la siembra, así que cada worker
+guarda sus fragmentos JSON ya codificados (orjson) y los junta por request sin pasar
+por ORM ni Pydantic:
+
+  - /questions/ baraja la lista cacheada de preguntas codificadas;
+  - /path/sections agrega a cada contenido, lección y sección los campos de progreso
+    del usuario (lo único que varía por request).
+
+El formato es el mismo que generaban los response_model de esas rutas. Se recarga tras
+CATALOG_TTL_SECONDS o con invalidate() (lo llaman los CRUD que modifican el catálogo).
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import orjson
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.content import Content
+from app.models.lesson import Lesson
+from app.models.question import Question
+from app.models.section import Section
+from app.schemas.content import Content as ContentSchema
+from app.schemas.lesson import Lesson as LessonSchema
+from app.schemas.question import QuestionRead
+from app.schemas.section import Section as SectionSchema
+from app.services.exercise_catalog import CATALOG_TTL_SECONDS
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value)
+
+
+def _open_object(schema_obj) -> bytes:
+    """JSON del schema sin la llave de cierre, para agregarle los campos por usuario"""
+    return dumps(schema_obj.model_dump(mode="json"))[:-1]
+
+
+@dataclass
+class PathItem:
+    """Contenido o lección: `head` es el objeto JSON abierto (sin completed/last_accessed)"""
+    id: int
+    head: bytes
+
+
+@dataclass
+class PathSection:
+    id: int
+    head: bytes
+    contents: List[PathItem]
+    lessons: List[PathItem]
+
+
+def _progress_fields(progress) -> bytes:
+    completed = bool(progress and progress.completed)
+    last_accessed = progress.last_accessed.isoformat() if progress and progress.last_accessed else None
+    return b',"completed":' + (b"true" if completed else b"false") + b',"last_accessed":' + dumps(last_accessed) + b"}"
+
+
+def render_section(
+    section: PathSection,
+    section_progress,
+    content_progress: Dict[int, Any],
+    lesson_progress: Dict[int, Any]
+) -> bytes:
+    """SectionWithProgress de un usuario a partir de la sección cacheada y sus filas de progreso"""
+    contents = [content_progress.get(item.id) for item in section.contents]
+    lessons = [lesson_progress.get(item.id) for item in section.lessons]
+    tail = {
+        "completed_contents": sum(1 for p in contents if p and p.completed),
+        "total_contents": len(contents),
+        "completed_lessons": sum(1 for p in lessons if p and p.completed),
+        "total_lessons": len(lessons),
+        "current_content_order": section_progress.current_content_order if section_progress else 1,
+        "current_lesson_order": section_progress.current_lesson_order if section_progress else 1,
+        "is_completed": bool(section_progress.completed) if section_progress else False,
+    }
+    return b"".join((
+        section.head,
+        b',"contents":[',
+        b",".join(item.head + _progress_fields(p) for item, p in zip(section.contents, contents)),
+        b'],"lessons":[',
+        b",".join(item.head + _progress_fields(p) for item, p in zip(section.lessons, lessons)),
+        b"],",
+        dumps(tail)[1:],
+    ))
+
+
+class CatalogCache:
+    """Fragmentos JSON de los catálogos, cargados de forma perezosa y con TTL"""
+
+    def __init__(self, ttl_seconds: int = CATALOG_TTL_SECONDS):
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._questions: List[bytes] = []
+        self._sections: List[PathSection] = []
+        self._sections_by_id: Dict[int, PathSection] = {}
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl_seconds
+
+    def _load(self, db: Session) -> None:
+        questions = db.query(Question).options(joinedload(Question.section)).order_by(Question.id).all()
+        encoded_questions = [
+            dumps(QuestionRead(id=q.id, text=q.text, section_name=q.section.name).model_dump())
+            for q in questions
+        ]
+
+        contents_by_section: Dict[int, List[PathItem]] = {}
+        for content in db.query(Content).order_by(Content.order).all():
+            contents_by_section.setdefault(content.section_id, []).append(
+                PathItem(content.id, _open_object(ContentSchema.model_validate(content)))
+            )
+        lessons_by_section: Dict[int, List[PathItem]] = {}
+        for lesson in db.query(Lesson).order_by(Lesson.order).all():
+            lessons_by_section.setdefault(lesson.section_id, []).append(
+                PathItem(lesson.id, _open_object(LessonSchema.model_validate(lesson)))
+            )
+        sections = [
+            PathSection(
+                id=section.id,
+                head=_open_object(SectionSchema.model_validate(section)),
+                contents=contents_by_section.get(section.id, []),
+                lessons=lessons_by_section.get(section.id, []),
+            )
+            for section in db.query(Section).order_by(Section.order).all()
+        ]
+
+        self._questions = encoded_questions
+        self._sections = sections
+        self._sections_by_id = {section.id: section for section in sections}
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if self._is_fresh():
+            return
+        with self._lock:
+            if not self._is_fresh():
+                self._load(db)
+
+    def questions_payload(self, db: Session) -> bytes:
+        """Arreglo JSON de todas las preguntas, en orden aleatorio"""
+        self._ensure_loaded(db)
+        items = list(self._questions)
+        random.shuffle(items)
+        return b"[" + b",".join(items) + b"]"
+
+    def get_path_sections(self, db: Session) -> List[PathSection]:
+        """Secciones ordenadas por `order`, con contenidos y lecciones ordenados"""
+        self._ensure_loaded(db)
+        return self._sections
+
+    def get_path_section(self, db: Session, section_id: int) -> Optional[PathSection]:
+        self._ensure_loaded(db)
+        return self._sections_by_id.get(section_id)
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga en el próximo acceso (tras modificar preguntas o el path)"""
+        self._loaded_at = None
+
+
+catalog_cache = CatalogCache()
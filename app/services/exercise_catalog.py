@@ -0,0 +1,144 @@
+# app/services/exercise_catalog.py
+
+"""
+Catálogo en memoria de los ejercicios de bienestar.
+Los ejercicios son datos de referencia que casi nunca cambian, así que cada worker
+mantiene el orden de rotación por estado del semáforo sin volver a consultarlo en cada request,
+y cada ejercicio ya validado, con sus pasos parseados y su JSON de respuesta serializado.
+"""
+
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.wellness_exercise import WellnessExercise, ExerciseState
+from app.schemas.wellness import WellnessExercise as WellnessExerciseSchema
+
+# Estados del semáforo que tienen rotación propia
+ROTATION_STATES = (ExerciseState.VERDE, ExerciseState.AMBAR, ExerciseState.ROJO)
+
+# Tiempo máximo antes de recargar (otros workers pueden haber creado/eliminado ejercicios)
+CATALOG_TTL_SECONDS = 300
+
+
+def parse_steps(raw: str) -> List[str]:
+    """Pasos del ejercicio (JSON en la columna `steps`); texto plano si no es JSON"""
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return [raw]
+
+
+@dataclass
+class CatalogExercise:
+    """
+    Ejercicio listo para responder: `payload` es el JSON del schema WellnessExercise,
+    idéntico al que generaría FastAPI con response_model, así que las rutas lo
+    devuelven tal cual sin re-validar ni re-serializar.
+    """
+    data: WellnessExerciseSchema
+    steps: List[str]
+    payload: bytes
+    # Hash del prompt de resumen por estado (lo llena app/services/wellness_summaries.py)
+    prompt_hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def id(self) -> int:
+        return self.data.id
+
+    @classmethod
+    def from_model(cls, exercise: WellnessExercise) -> "CatalogExercise":
+        data = WellnessExerciseSchema.model_validate(exercise)
+        return cls(data=data, steps=parse_steps(exercise.steps), payload=data.model_dump_json().encode("utf-8"))
+
+
+class ExerciseCatalog:
+    """Orden de rotación de ejercicios por estado, cargado de forma perezosa y con TTL"""
+
+    def __init__(self, ttl_seconds: int = CATALOG_TTL_SECONDS):
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._order_by_state: Dict[str, List[int]] = {}
+        self._states_by_exercise: Dict[int, List[str]] = {}
+        self._exercises: Dict[int, CatalogExercise] = {}
+        # Una recarga por id desconocido como mucho por carga (TTL o invalidate)
+        self._miss_reload_allowed = False
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self._ttl_seconds
+
+    def _load(self, db: Session) -> None:
+        rows = db.query(WellnessExercise).order_by(WellnessExercise.id).all()
+
+        order_by_state: Dict[str, List[int]] = {state.value: [] for state in ROTATION_STATES}
+        states_by_exercise: Dict[int, List[str]] = {}
+        exercises: Dict[int, CatalogExercise] = {}
+        for exercise in rows:
+            exercises[exercise.id] = CatalogExercise.from_model(exercise)
+            for state in ROTATION_STATES:
+                if exercise.recommended_state in (state, ExerciseState.CUALQUIERA):
+                    order_by_state[state.value].append(exercise.id)
+                    states_by_exercise.setdefault(exercise.id, []).append(state.value)
+
+        self._order_by_state = order_by_state
+        self._states_by_exercise = states_by_exercise
+        self._exercises = exercises
+        self._loaded_at = time.monotonic()
+        self._miss_reload_allowed = True
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if self._is_fresh():
+            return
+        with self._lock:
+            if not self._is_fresh():
+                self._load(db)
+
+    def get_rotation(self, db: Session, energy_state: str) -> List[int]:
+        """IDs de ejercicios válidos para el estado, en orden de rotación"""
+        self._ensure_loaded(db)
+        return self._order_by_state.get(energy_state.lower(), [])
+
+    def get_states_for_exercise(self, db: Session, exercise_id: int) -> List[str]:
+        """Estados cuya rotación incluye este ejercicio"""
+        self._ensure_loaded(db)
+        return self._states_by_exercise.get(exercise_id, [])
+
+    def get_exercise(self, db: Session, exercise_id: int) -> Optional[CatalogExercise]:
+        """
+        Ejercicio pre-procesado. Si no está (creado en otro worker) recarga el catálogo,
+        pero solo una vez por carga: un id inexistente pedido en bucle devuelve None sin
+        consultar la DB hasta el próximo TTL o invalidate().
+        """
+        self._ensure_loaded(db)
+        exercise = self._exercises.get(exercise_id)
+        if exercise is None and self._miss_reload_allowed:
+            loaded_at = self._loaded_at
+            with self._lock:
+                # Otro hilo pudo recargar mientras se esperaba el lock
+                if self._loaded_at == loaded_at and self._miss_reload_allowed:
+                    self._load(db)
+                    self._miss_reload_allowed = False
+            exercise = self._exercises.get(exercise_id)
+        return exercise
+
+    def get_exercises(self, db: Session) -> List[CatalogExercise]:
+        """Todos los ejercicios, ordenados por ID"""
+        self._ensure_loaded(db)
+        return list(self._exercises.values())
+
+    def exercises_payload(self, db: Session, skip: int = 0, limit: int = 100) -> bytes:
+        """Arreglo JSON de ejercicios armado con los payloads pre-serializados"""
+        exercises = self.get_exercises(db)[max(skip, 0):max(skip, 0) + max(limit, 0)]
+        return b"[" + b",".join(exercise.payload for exercise in exercises) + b"]"
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga en el próximo acceso (tras crear o eliminar ejercicios)"""
+        self._loaded_at = None
+
+
+exercise_catalog = ExerciseCatalog()
@@ -0,0 +1,211 @@
+# app/services/llm_admission.py
+
+"""
+Control de admisión de las llamadas salientes al LLM.
+
+Cada worker admite a lo más LLM_MAX_CONCURRENCY // WEB_CONCURRENCY llamadas
+simultáneas. Las demás esperan en una cola por prioridad:
+
+  0. guardrail (detección de crisis): siempre primero, nunca se descarta por cola llena
+  1. chat y extracción de slots: el estudiante está esperando la respuesta
+  2. check-in, resúmenes, bienestar y el resto
+
+Si la cola está llena o la espera supera LLM_QUEUE_TIMEOUT_SECONDS
+(LLM_GUARDRAIL_QUEUE_TIMEOUT_SECONDS para el guardrail), la llamada se descarta al
+instante (load shedding) y el llamador responde con su fallback, en vez de acumular
+requests hasta que Gemini devuelva errores de cuota o venza el timeout de gunicorn.
+
+El controlador es thread-safe: lo usan corrutinas (acquire) y código síncrono en el
+threadpool (acquire_sync), p. ej. la generación de resúmenes de bienestar.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import LLM_IN_FLIGHT, LLM_QUEUE_WAIT, LLM_QUEUED, LLM_SHED
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_GUARDRAIL = 0
+PRIORITY_CHAT = 1
+PRIORITY_BACKGROUND = 2
+
+_PURPOSE_PRIORITIES = {
+    "guardrail": PRIORITY_GUARDRAIL,
+    "chat": PRIORITY_CHAT,
+    "slots": PRIORITY_CHAT,
+}
+
+
+def purpose_priority(purpose: str) -> int:
+    return _PURPOSE_PRIORITIES.get(purpose, PRIORITY_BACKGROUND)
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted", "abandoned")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+        self.abandoned = False
+
+
+class LLMAdmissionController:
+    """Semáforo con cola por prioridad (FIFO dentro de cada prioridad) y descarte por sobrecarga."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, guardrail_queue_timeout: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.guardrail_queue_timeout = guardrail_queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._waiters: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _timeout_for(self, priority: int) -> float:
+        return self.guardrail_queue_timeout if priority == PRIORITY_GUARDRAIL else self.queue_timeout
+
+    def _enter(self, purpose: str, wake_factory: Callable[[], Callable[[], None]]) -> Tuple[bool, Optional[_Waiter]]:
+        """
+        Toma un cupo libre o encola. Devuelve (admitida, waiter):
+        (True, None) admitida sin esperar, (False, None) descartada, (False, waiter) en cola.
+        """
+        priority = purpose_priority(purpose)
+        with self._lock:
+            if self._active < self.max_concurrency:
+                self._active += 1
+                LLM_IN_FLIGHT.inc()
+                return True, None
+            if priority != PRIORITY_GUARDRAIL and self._queued >= self.max_queue:
+                LLM_SHED.labels(purpose, "queue_full").inc()
+                return False, None
+            waiter = _Waiter(wake_factory())
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            self._queued += 1
+            LLM_QUEUED.inc()
+            return False, waiter
+
+    def _leave_queue(self, waiter: _Waiter, purpose: str) -> bool:
+        """Tras vencer la espera: True si el cupo llegó justo a tiempo (hay que usarlo o liberarlo)."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.abandoned = True
+            self._queued -= 1
+            LLM_QUEUED.dec()
+        LLM_SHED.labels(purpose, "queue_timeout").inc()
+        return False
+
+    def release(self) -> None:
+        """Libera un cupo; si hay llamadas en cola, se lo pasa a la de mayor prioridad."""
+        with self._lock:
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if waiter.abandoned:
+                    continue
+                waiter.granted = True
+                self._queued -= 1
+                LLM_QUEUED.dec()
+                waiter.wake()
+                return
+            self._active -= 1
+            LLM_IN_FLIGHT.dec()
+
+    def try_acquire(self, purpose: str) -> bool:
+        """Toma un cupo solo si hay uno libre ahora, sin encolar (llamadas de respaldo del hedging)."""
+        with self._lock:
+            if self._active < self.max_concurrency and not self._queued:
+                self._active += 1
+                LLM_IN_FLIGHT.inc()
+                return True
+        return False
+
+    async def acquire(self, purpose: str) -> bool:
+        """Espera un cupo. False si la llamada se descarta (cola llena o espera vencida)."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake_factory():
+            # release() puede correr en otro hilo (acquire_sync) o en otro event loop
+            return lambda: loop.call_soon_threadsafe(_resolve, future)
+
+        admitted, waiter = self._enter(purpose, wake_factory)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(future, self._timeout_for(purpose_priority(purpose)))
+                admitted = True
+            except asyncio.TimeoutError:
+                admitted = self._leave_queue(waiter, purpose)
+            except asyncio.CancelledError:
+                # El cliente se fue mientras esperaba: devolver el cupo si alcanzó a llegar
+                if self._leave_queue(waiter, purpose):
+                    self.release()
+                raise
+        LLM_QUEUE_WAIT.labels(purpose, "admitted" if admitted else "shed").observe(time.perf_counter() - started)
+        return admitted
+
+    def acquire_sync(self, purpose: str) -> bool:
+        """Igual que acquire, para código síncrono (bloquea el hilo mientras espera)."""
+        started = time.perf_counter()
+        event = threading.Event()
+        admitted, waiter = self._enter(purpose, lambda: event.set)
+        if waiter is not None:
+            admitted = event.wait(self._timeout_for(purpose_priority(purpose))) or self._leave_queue(waiter, purpose)
+        LLM_QUEUE_WAIT.labels(purpose, "admitted" if admitted else "shed").observe(time.perf_counter() - started)
+        return admitted
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def get_llm_concurrency_limit() -> int:
+    """Llamadas simultáneas al LLM por worker."""
+    return max(1, settings.LLM_MAX_CONCURRENCY // max(1, settings.WEB_CONCURRENCY))
+
+
+_controller: Optional[LLMAdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> LLMAdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = LLMAdmissionController(
+                    max_concurrency=get_llm_concurrency_limit(),
+                    max_queue=settings.LLM_MAX_QUEUE,
+                    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+                    guardrail_queue_timeout=settings.LLM_GUARDRAIL_QUEUE_TIMEOUT_SECONDS,
+                )
+                logger.info(
+                    f"LLM admission: {_controller.max_concurrency} concurrent calls per worker, "
+                    f"queue {_controller.max_queue}, timeout {_controller.queue_timeout}s"
+                )
+    return _controller
+
+
+def set_admission_controller(controller: Optional[LLMAdmissionController]) -> None:
+    """Reemplaza el controlador (scripts, benchmarks). None vuelve a leer la configuración."""
+    global _controller
+    with _controller_lock:
+        _controller = controller
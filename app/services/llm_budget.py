@@ -0,0 +1,130 @@
+# app/services/llm_budget.py
+
+"""
+Presupuesto de tokens del LLM, por usuario y para todo el despliegue.
+
+Son token buckets medidos en tokens del LLM (LLM_USER_TOKEN_BUDGET y
+LLM_GLOBAL_TOKEN_BUDGET, p. ej. "100000/hour"), guardados en el mismo backend
+compartido que el rate limiting (app/core/rate_limit.py).
+
+Flujo por request:
+  1. LLMBudgetMiddleware abre un LLMBudgetScope (ContextVar) para el request.
+  2. La dependencia deps.llm_budget mira ambos buckets antes del endpoint. Si alguno
+     está agotado, marca el scope como `exhausted`.
+  3. MeteredLLMProvider no llama al LLM en un scope agotado (lanza LLMBudgetExceeded:
+     ai_service responde con heurísticas o plantillas) y suma el uso real de cada llamada
+     (usage_metadata de Gemini).
+  4. Al terminar el request (incluido el streaming), el middleware descuenta los tokens
+     usados de ambos buckets. El saldo puede quedar negativo: la deuda bloquea las
+     siguientes llamadas hasta que el bucket se rellena.
+"""
+
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import LLM_BUDGET_EXHAUSTED
+from app.core.rate_limit import RateLimit, get_rate_limit_backend
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_BUDGET_KEY = "llm_tokens:global"
+
+
+def user_budget_key(user_id: int) -> str:
+    return f"llm_tokens:user:{user_id}"
+
+
+@dataclass
+class LLMBudgetScope:
+    user_id: Optional[int] = None
+    exhausted: bool = False
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+_current_scope: ContextVar[Optional[LLMBudgetScope]] = ContextVar("llm_budget_scope", default=None)
+
+
+def llm_budget_exhausted() -> bool:
+    scope = _current_scope.get()
+    return scope is not None and scope.exhausted
+
+
+def record_llm_usage(input_tokens: int, output_tokens: int) -> None:
+    """Suma el uso de una llamada al scope actual (fuera de un request no hace nada)."""
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.input_tokens += input_tokens
+        scope.output_tokens += output_tokens
+
+
+def _budgets():
+    return RateLimit.parse(settings.LLM_USER_TOKEN_BUDGET), RateLimit.parse(settings.LLM_GLOBAL_TOKEN_BUDGET)
+
+
+async def check_llm_budget(user_id: int) -> bool:
+    """
+    Asocia el usuario al scope actual y revisa ambos buckets (solo lectura).
+    Devuelve False si alguno está agotado; el scope queda marcado para no llamar al LLM.
+    """
+    scope = _current_scope.get()
+    if scope is None or not settings.LLM_BUDGET_ENABLED:
+        return True
+    scope.user_id = user_id
+
+    user_budget, global_budget = _budgets()
+    backend = get_rate_limit_backend()
+    try:
+        for budget_name, key, budget in (
+            ("user", user_budget_key(user_id), user_budget),
+            ("global", GLOBAL_BUDGET_KEY, global_budget),
+        ):
+            if await backend.peek(key, budget) <= 0:
+                scope.exhausted = True
+                LLM_BUDGET_EXHAUSTED.labels(budget_name).inc()
+                logger.warning(f"LLM token budget exhausted ({budget_name}) for user {user_id}")
+                return False
+    except Exception as e:
+        # Igual que el rate limiting: si el backend falla, no se bloquea al usuario
+        logger.error(f"LLM budget backend error, request allowed: {e}")
+    return True
+
+
+async def settle_llm_budget(scope: LLMBudgetScope) -> None:
+    """Descuenta del bucket del usuario y del global los tokens usados en el request."""
+    if scope.user_id is None or scope.total_tokens == 0 or not settings.LLM_BUDGET_ENABLED:
+        return
+    user_budget, global_budget = _budgets()
+    backend = get_rate_limit_backend()
+    try:
+        await backend.charge(user_budget_key(scope.user_id), user_budget, scope.total_tokens)
+        await backend.charge(GLOBAL_BUDGET_KEY, global_budget, scope.total_tokens)
+    except Exception as e:
+        logger.error(f"Could not charge {scope.total_tokens} LLM tokens for user {scope.user_id}: {e}")
+
+
+class LLMBudgetMiddleware:
+    """Middleware ASGI: un LLMBudgetScope por request y el cobro al terminar (después del streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget_scope = LLMBudgetScope()
+        token = _current_scope.set(budget_scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+            await settle_llm_budget(budget_scope)
@@ -0,0 +1,555 @@
+# app/services/llm_provider.py
+
+"""
+Proveedores de LLM detrás de ai_service.
+
+- GeminiProvider: Google Gemini (SDK cargado en el primer uso).
+- StubLLMProvider: local y determinístico, sin red. Latencia, cadencia de
+  streaming y tasa de fallos configurables para pruebas de carga y benchmarks.
+
+El proveedor activo se elige con LLM_PROVIDER ("gemini" | "stub") y se entrega
+envuelto en MeteredLLMProvider, que registra latencia y tokens por propósito,
+aplica el presupuesto de tokens del request (app/services/llm_budget.py) y limita
+las llamadas simultáneas (app/services/llm_admission.py).
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Protocol
+
+from app.core.config import settings
+from app.core.metrics import LLM_HEDGED, LLM_RETRIES, observe_llm_call
+from app.services.llm_admission import get_admission_controller
+from app.services.llm_budget import llm_budget_exhausted, record_llm_usage
+from app.services.llm_resilience import TransientLLMError, get_circuit_breaker, get_retry_policy, hedge_delay
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'gemini-2.0-flash'
+
+
+class LLMProviderError(Exception):
+    """Fallo del proveedor (real o inyectado por el stub)."""
+
+
+class LLMCallSkipped(LLMProviderError):
+    """No se llamó al LLM; el llamador debe responder con su fallback."""
+
+
+class LLMBudgetExceeded(LLMCallSkipped):
+    """El request agotó el presupuesto de tokens (ver llm_budget)."""
+
+
+class LLMOverloaded(LLMCallSkipped):
+    """El control de admisión descartó la llamada: cola llena o espera vencida (ver llm_admission)."""
+
+
+class LLMCircuitOpen(LLMCallSkipped):
+    """El circuit breaker está abierto tras fallos seguidos del LLM: solo heurísticas (ver llm_resilience)."""
+
+
+class LLMTransientError(LLMProviderError, TransientLLMError):
+    """Fallo transitorio que vale la pena reintentar."""
+
+
+@dataclass
+class LLMUsage:
+    """Tokens de una llamada. El proveedor la completa si recibe `usage`."""
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de ~4 caracteres por token, para proveedores que no informan uso."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class LLMProvider(Protocol):
+    """
+    Interfaz mínima que usa ai_service.
+    `history` usa el formato de Gemini: [{"role": "user"|"model", "parts": [str, ...]}].
+    Si se pasa `usage`, el proveedor anota ahí los tokens consumidos.
+    """
+    name: str
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        system_instruction: Optional[str] = None,
+        history: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+        usage: Optional[LLMUsage] = None,
+    ) -> str:
+        """Devuelve la respuesta completa."""
+        ...
+
+    def stream(
+        self,
+        prompt: str,
+        *,
+        system_instruction: Optional[str] = None,
+        history: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        top_p: Optional[float] = None,
+        usage: Optional[LLMUsage] = None,
+    ) -> Iterator[str]:
+        """Devuelve la respuesta en fragmentos de texto a medida que se generan."""
+        ...
+
+
+# ---------------------------- GEMINI ---------------------------- #
+
+class _LazyGenai:
+    """
+    Carga y configura el SDK de Gemini en el primer uso (`genai.X`).
+    El import de google.generativeai es pesado; así los workers arrancan
+    y responden /health sin pagarlo.
+    """
+
+    def __init__(self):
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    import google.generativeai as genai_module
+                    genai_module.configure(api_key=settings.GEMINI_API_KEY)
+                    self._module = genai_module
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+genai = _LazyGenai()
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        self._default_model = None
+
+    def _model(self, system_instruction: Optional[str]):
+        if system_instruction:
+            return genai.GenerativeModel(model_name=self.model_name, system_instruction=system_instruction)
+        if self._default_model is None:
+            self._default_model = genai.GenerativeModel(self.model_name)
+        return self._default_model
+
+    def _generation_config(self, temperature, max_output_tokens, top_p):
+        options = {
+            key: value for key, value in (
+                ("temperature", temperature),
+                ("max_output_tokens", max_output_tokens),
+                ("top_p", top_p),
+            ) if value is not None
+        }
+        return genai.types.GenerationConfig(**options) if options else None
+
+    def _send(self, prompt, system_instruction, history, config, stream):
+        model = self._model(system_instruction)
+        # Sin timeout, una llamada colgada retiene su cupo de admisión indefinidamente
+        request_options = {"timeout": settings.LLM_REQUEST_TIMEOUT_SECONDS}
+        if history:
+            chat = model.start_chat(history=history)
+            return chat.send_message(prompt, generation_config=config, stream=stream, request_options=request_options)
+        return model.generate_content(prompt, generation_config=config, stream=stream, request_options=request_options)
+
+    @staticmethod
+    def _record_usage(response, usage: Optional[LLMUsage]) -> None:
+        metadata = getattr(response, "usage_metadata", None)
+        if usage is None or metadata is None:
+            return
+        usage.input_tokens = getattr(metadata, "prompt_token_count", 0) or 0
+        usage.output_tokens = getattr(metadata, "candidates_token_count", 0) or 0
+
+    def generate(self, prompt, *, system_instruction=None, history=None,
+                 temperature=None, max_output_tokens=None, top_p=None, usage=None) -> str:
+        config = self._generation_config(temperature, max_output_tokens, top_p)
+        response = self._send(prompt, system_instruction, history, config, stream=False)
+        self._record_usage(response, usage)
+        return response.text
+
+    def stream(self, prompt, *, system_instruction=None, history=None,
+               temperature=None, max_output_tokens=None, top_p=None, usage=None) -> Iterator[str]:
+        config = self._generation_config(temperature, max_output_tokens, top_p)
+        response = self._send(prompt, system_instruction, history, config, stream=True)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        # Al terminar el stream, usage_metadata trae los totales de la respuesta
+        self._record_usage(response, usage)
+
+
+# ---------------------------- STUB LOCAL ---------------------------- #
+
+_STUB_SENTENCES = [
+    "Entiendo cómo te sientes y es completamente válido.",
+    "Probemos dividir la tarea en un bloque corto y concreto.",
+    "Empieza por revisar lo que ya tienes durante cinco minutos.",
+    "Anota la siguiente acción más pequeña que puedas completar.",
+    "Al terminar el bloque, tómate una pausa breve para respirar.",
+    "Fíjate en qué parte de la tarea te genera más resistencia.",
+    "Celebra cada avance, aunque parezca pequeño.",
+    "Si te distraes, vuelve con calma a la acción que anotaste.",
+]
+
+
+class StubLLMProvider:
+    """
+    Proveedor local determinístico: la misma consulta produce siempre el mismo texto.
+    Si el prompt pide JSON responde "{}", y los llamadores usan sus fallbacks.
+    La secuencia de fallos inyectados depende solo de `seed` y del orden de las llamadas.
+    """
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: int = 0,
+        chunk_interval_ms: int = 0,
+        chunk_words: int = 8,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.chunk_interval_ms = chunk_interval_ms
+        self.chunk_words = max(1, chunk_words)
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate <= 0:
+            return
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.failure_rate:
+            raise LLMTransientError("Fallo inyectado por StubLLMProvider")
+
+    def _response_text(self, prompt: str, max_output_tokens: Optional[int]) -> str:
+        if "JSON" in prompt[-400:]:
+            return "{}"
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        # ~0.75 palabras por token, como referencia del tamaño de respuesta
+        target_words = max(1, (max_output_tokens or 200) * 3 // 4)
+        words: List[str] = []
+        index = digest[0]
+        while len(words) < target_words:
+            words.extend(_STUB_SENTENCES[index % len(_STUB_SENTENCES)].split())
+            index += digest[index % len(digest)] or 1
+        return " ".join(words[:target_words])
+
+    @staticmethod
+    def _record_usage(prompt, system_instruction, text, usage: Optional[LLMUsage]) -> None:
+        if usage is not None:
+            usage.input_tokens = estimate_tokens(prompt) + estimate_tokens(system_instruction or "")
+            usage.output_tokens = estimate_tokens(text)
+
+    def _chunks(self, text: str) -> List[str]:
+        words = text.split(" ")
+        return [
+            " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+            for i in range(0, len(words), self.chunk_words)
+        ]
+
+    def generate(self, prompt, *, system_instruction=None, history=None,
+                 temperature=None, max_output_tokens=None, top_p=None, usage=None) -> str:
+        text = self._response_text(prompt, max_output_tokens)
+        chunks = self._chunks(text)
+        time.sleep((self.latency_ms + self.chunk_interval_ms * max(0, len(chunks) - 1)) / 1000)
+        self._maybe_fail()
+        self._record_usage(prompt, system_instruction, text, usage)
+        return text
+
+    def stream(self, prompt, *, system_instruction=None, history=None,
+               temperature=None, max_output_tokens=None, top_p=None, usage=None) -> Iterator[str]:
+        chunks = self._chunks(self._response_text(prompt, max_output_tokens))
+        time.sleep(self.latency_ms / 1000)
+        self._maybe_fail()
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(self.chunk_interval_ms / 1000)
+            yield chunk
+        self._record_usage(prompt, system_instruction, "".join(chunks), usage)
+
+
+# ---------------------------- MÉTRICAS, ADMISIÓN Y RESILIENCIA ---------------------------- #
+
+_STREAM_END = object()
+
+
+class MeteredLLMProvider:
+    """
+    Envuelve un proveedor y registra cada llamada en las métricas de Prometheus.
+    Los llamadores indican `purpose` (guardrail, slots, chat, checkin, summary, wellness).
+
+    Antes de llamar al proveedor:
+      - si el presupuesto de tokens del request está agotado lanza LLMBudgetExceeded;
+      - si el circuit breaker está abierto (LLM caído) lanza LLMCircuitOpen;
+      - espera cupo en el control de admisión (llm_admission) y, si la llamada se
+        descarta por sobrecarga, lanza LLMOverloaded.
+    Las tres son LLMCallSkipped (subclase de LLMProviderError): los llamadores ya tienen
+    respuesta de respaldo para esos errores.
+
+    Los errores transitorios se reintentan con jitter y las llamadas cortas usan hedging
+    (ver llm_resilience).
+
+    El SDK de Gemini es síncrono: las variantes async (agenerate, astream) lo ejecutan
+    en un hilo para no bloquear el event loop. El código síncrono usa generate/stream.
+    """
+
+    def __init__(self, inner: LLMProvider):
+        self.inner = inner
+        self.name = inner.name
+
+    def _check_budget_and_circuit(self, purpose: str) -> None:
+        if llm_budget_exhausted():
+            raise LLMBudgetExceeded(f"LLM token budget exhausted, skipping '{purpose}' call")
+        if not get_circuit_breaker().allow():
+            raise LLMCircuitOpen(f"LLM circuit open, skipping '{purpose}' call")
+
+    @staticmethod
+    def _overloaded(purpose: str) -> LLMOverloaded:
+        return LLMOverloaded(f"LLM admission queue saturated, skipping '{purpose}' call")
+
+    @contextlib.contextmanager
+    def _admitted_sync(self, purpose: str):
+        self._check_budget_and_circuit(purpose)
+        admission = get_admission_controller()
+        if not admission.acquire_sync(purpose):
+            raise self._overloaded(purpose)
+        try:
+            yield
+        finally:
+            admission.release()
+
+    @contextlib.asynccontextmanager
+    async def _admitted(self, purpose: str):
+        self._check_budget_and_circuit(purpose)
+        admission = get_admission_controller()
+        if not await admission.acquire(purpose):
+            raise self._overloaded(purpose)
+        try:
+            yield
+        finally:
+            admission.release()
+
+    def generate(self, prompt: str, *, purpose: str = "other", **kwargs) -> str:
+        with self._admitted_sync(purpose):
+            breaker, policy = get_circuit_breaker(), get_retry_policy()
+            retries = 0
+            while True:
+                try:
+                    text = self._generate(prompt, purpose, kwargs)
+                except Exception as e:
+                    if not policy.should_retry(e, retries, breaker):
+                        breaker.record_failure(e)
+                        raise
+                    retries += 1
+                    LLM_RETRIES.labels(purpose).inc()
+                    time.sleep(policy.delay(retries))
+                    continue
+                breaker.record_success()
+                return text
+
+    async def agenerate(self, prompt: str, *, purpose: str = "other", **kwargs) -> str:
+        async with self._admitted(purpose):
+            breaker, policy = get_circuit_breaker(), get_retry_policy()
+            hedge_after = hedge_delay(purpose)
+            retries = 0
+            while True:
+                try:
+                    if hedge_after is None:
+                        text = await asyncio.to_thread(self._generate, prompt, purpose, kwargs)
+                    else:
+                        text = await self._hedged_generate(prompt, purpose, kwargs, hedge_after)
+                except Exception as e:
+                    if not policy.should_retry(e, retries, breaker):
+                        breaker.record_failure(e)
+                        raise
+                    retries += 1
+                    LLM_RETRIES.labels(purpose).inc()
+                    await asyncio.sleep(policy.delay(retries))
+                    continue
+                breaker.record_success()
+                return text
+
+    async def _hedged_generate(self, prompt: str, purpose: str, kwargs: dict, hedge_after: float) -> str:
+        """
+        Si la llamada no terminó en `hedge_after` segundos y hay un cupo libre, lanza otra igual
+        y devuelve la primera respuesta correcta. La perdedora sigue en su hilo hasta terminar.
+        """
+        primary = asyncio.ensure_future(asyncio.to_thread(self._generate, prompt, purpose, kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        admission = get_admission_controller()
+        if done or not admission.try_acquire(purpose):
+            return await primary
+
+        backup = asyncio.ensure_future(asyncio.to_thread(self._generate, prompt, purpose, kwargs))
+        # El cupo extra se libera cuando terminan las dos, aunque ya se haya respondido
+        running = [2]
+
+        def _on_done(task):
+            if not task.cancelled():
+                task.exception()  # la perdedora puede fallar sin que nadie la espere
+            running[0] -= 1
+            if running[0] == 0:
+                admission.release()
+
+        labels = {primary: "primary", backup: "backup"}
+        for task in labels:
+            task.add_done_callback(_on_done)
+
+        pending = set(labels)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None:
+                LLM_HEDGED.labels(purpose, labels[winner]).inc()
+                return winner.result()
+        return primary.result()  # ambas fallaron: se propaga el error de la primera
+
+    def stream(self, prompt: str, *, purpose: str = "other", **kwargs) -> Iterator[str]:
+        with self._admitted_sync(purpose):
+            breaker, policy = get_circuit_breaker(), get_retry_policy()
+            retries = 0
+            while True:
+                started = False
+                try:
+                    for chunk in self._stream(prompt, purpose, kwargs):
+                        started = True
+                        yield chunk
+                except Exception as e:
+                    # Solo se reintenta si aún no se entregó nada
+                    if started or not policy.should_retry(e, retries, breaker):
+                        breaker.record_failure(e)
+                        raise
+                    retries += 1
+                    LLM_RETRIES.labels(purpose).inc()
+                    time.sleep(policy.delay(retries))
+                    continue
+                breaker.record_success()
+                return
+
+    async def astream(self, prompt: str, *, purpose: str = "other", **kwargs) -> AsyncIterator[str]:
+        async with self._admitted(purpose):
+            breaker, policy = get_circuit_breaker(), get_retry_policy()
+            retries = 0
+            while True:
+                chunks = self._stream(prompt, purpose, kwargs)
+                started = False
+                try:
+                    # Cada fragmento se espera en un hilo; el cupo se mantiene hasta el último
+                    while True:
+                        chunk = await asyncio.to_thread(next, chunks, _STREAM_END)
+                        if chunk is _STREAM_END:
+                            break
+                        started = True
+                        yield chunk
+                except Exception as e:
+                    # Solo se reintenta si aún no se entregó nada
+                    if started or not policy.should_retry(e, retries, breaker):
+                        breaker.record_failure(e)
+                        raise
+                    retries += 1
+                    LLM_RETRIES.labels(purpose).inc()
+                else:
+                    breaker.record_success()
+                    return
+                finally:
+                    try:
+                        chunks.close()
+                    except ValueError:
+                        # Cancelado mientras un hilo esperaba el siguiente fragmento; el generador
+                        # se cierra (y registra sus métricas) cuando ese hilo termina
+                        pass
+                await asyncio.sleep(policy.delay(retries))
+
+    def _generate(self, prompt: str, purpose: str, kwargs: dict) -> str:
+        usage = LLMUsage()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            text = self.inner.generate(prompt, usage=usage, **kwargs)
+            outcome = "ok"
+            return text
+        finally:
+            observe_llm_call(
+                self.name, purpose, time.perf_counter() - started, outcome,
+                usage.input_tokens, usage.output_tokens,
+            )
+            record_llm_usage(usage.input_tokens, usage.output_tokens)
+
+    def _stream(self, prompt: str, purpose: str, kwargs: dict) -> Iterator[str]:
+        usage = LLMUsage()
+        started = time.perf_counter()
+        first_chunk = None
+        outcome = "error"
+        try:
+            for chunk in self.inner.stream(prompt, usage=usage, **kwargs):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started
+                yield chunk
+            outcome = "ok"
+        except GeneratorExit:
+            # El cliente cortó el stream antes de terminar
+            outcome = "cancelled"
+            raise
+        finally:
+            observe_llm_call(
+                self.name, purpose, time.perf_counter() - started, outcome,
+                usage.input_tokens, usage.output_tokens, first_chunk,
+            )
+            record_llm_usage(usage.input_tokens, usage.output_tokens)
+
+
+# ---------------------------- SELECCIÓN ---------------------------- #
+
+_provider: Optional[MeteredLLMProvider] = None
+_provider_lock = threading.Lock()
+
+
+def build_llm_provider(name: str) -> LLMProvider:
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "stub":
+        return StubLLMProvider(
+            latency_ms=settings.LLM_STUB_LATENCY_MS,
+            chunk_interval_ms=settings.LLM_STUB_CHUNK_INTERVAL_MS,
+            chunk_words=settings.LLM_STUB_CHUNK_WORDS,
+            failure_rate=settings.LLM_STUB_FAILURE_RATE,
+            seed=settings.LLM_STUB_SEED,
+        )
+    raise ValueError(f"LLM_PROVIDER desconocido: {name!r} (usa 'gemini' o 'stub')")
+
+
+def get_llm_provider() -> MeteredLLMProvider:
+    """Proveedor activo según LLM_PROVIDER, creado en el primer uso."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = MeteredLLMProvider(build_llm_provider(settings.LLM_PROVIDER))
+                logger.info(f"LLM provider: {_provider.name}")
+    return _provider
+
+
+def set_llm_provider(provider: Optional[LLMProvider]) -> None:
+    """Reemplaza el proveedor activo (benchmarks, scripts). None vuelve a leer LLM_PROVIDER."""
+    global _provider
+    with _provider_lock:
+        _provider = MeteredLLMProvider(provider) if provider is not None else None
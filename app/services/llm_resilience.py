@@ -0,0 +1,176 @@
+# app/services/llm_resilience.py
+
+"""
+Resiliencia de las llamadas al LLM (usado por MeteredLLMProvider).
+
+- Reintentos con backoff exponencial y jitter completo, solo para errores transitorios
+  (cuota, 5xx, timeouts, red). En streaming, solo antes del primer fragmento.
+- Hedging: si una llamada corta (guardrail, slots) no respondió en LLM_HEDGE_AFTER_MS,
+  se lanza una segunda igual y se usa la primera que termine bien.
+- Circuit breaker: tras LLM_CIRCUIT_FAILURE_THRESHOLD fallos transitorios seguidos,
+  deja de llamar al LLM durante LLM_CIRCUIT_OPEN_SECONDS (modo solo heurísticas: los
+  llamadores usan sus fallbacks al instante). Después deja pasar una llamada de prueba;
+  si funciona, se cierra.
+
+El estado del breaker es por worker: cada proceso detecta la caída por su cuenta.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import LLM_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+# Errores de google.api_core que indican un problema transitorio del servicio.
+# Se comparan por nombre para no importar el SDK de Gemini (ver _LazyGenai)
+_RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+}
+
+
+class TransientLLMError(Exception):
+    """Marca un error como transitorio (p. ej. los fallos inyectados por el stub)."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TransientLLMError, ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+class RetryPolicy:
+    def __init__(self, attempts: int, base_delay: float, max_delay: float):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Jitter completo: uniforme entre 0 y base * 2^(intento - 1), con tope."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def should_retry(self, exc: BaseException, attempt: int, breaker: "CircuitBreaker") -> bool:
+        """`attempt` es el número de reintentos ya hechos."""
+        return attempt < self.attempts and is_retryable(exc) and not breaker.is_open
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self._state == self.OPEN
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning(f"LLM circuit breaker: {self._state} -> {state}")
+            self._state = state
+            LLM_CIRCUIT_STATE.set(self._STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """
+        ¿Se puede llamar al LLM? Con el circuito abierto, solo una llamada de prueba al vencer
+        el plazo. Si la prueba no informa resultado (descartada, cancelada), otra la reemplaza
+        después de open_seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.open_seconds
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """El servicio respondió (aunque la respuesta no sirva, p. ej. bloqueada por seguridad)."""
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, exc: BaseException) -> None:
+        if not is_retryable(exc):
+            # Error del request, no del servicio
+            self.record_success()
+            return
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+
+def hedge_delay(purpose: str) -> Optional[float]:
+    """Segundos antes de lanzar la llamada de respaldo, o None si `purpose` no usa hedging."""
+    if settings.LLM_HEDGE_AFTER_MS <= 0:
+        return None
+    purposes = {p.strip() for p in settings.LLM_HEDGE_PURPOSES.split(",") if p.strip()}
+    return settings.LLM_HEDGE_AFTER_MS / 1000 if purpose in purposes else None
+
+
+_breaker: Optional[CircuitBreaker] = None
+_retry_policy: Optional[RetryPolicy] = None
+_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        with _lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_OPEN_SECONDS)
+    return _breaker
+
+
+def get_retry_policy() -> RetryPolicy:
+    global _retry_policy
+    if _retry_policy is None:
+        with _lock:
+            if _retry_policy is None:
+                _retry_policy = RetryPolicy(
+                    settings.LLM_RETRY_ATTEMPTS,
+                    settings.LLM_RETRY_BASE_DELAY_MS / 1000,
+                    settings.LLM_RETRY_MAX_DELAY_MS / 1000,
+                )
+    return _retry_policy
+
+
+def reset_llm_resilience() -> None:
+    """Vuelve a leer la configuración y cierra el circuito (scripts, benchmarks)."""
+    global _breaker, _retry_policy
+    with _lock:
+        _breaker = None
+        _retry_policy = None
+    LLM_CIRCUIT_STATE.set(0)
@@ -0,0 +1,52 @@
+# app/services/token_sweeper.py
+
+import asyncio
+import logging
+import random
+
+from app.core.config import settings
+from app.crud import crud_refresh_token
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_refresh_tokens(batch_size: int) -> int:
+    """
+    Borra tokens expirados o revocados en lotes acotados hasta vaciar el backlog.
+    Cada lote es una transacción corta, así no se bloquea la tabla.
+    """
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            deleted = crud_refresh_token.cleanup_expired_tokens(db, batch_size=batch_size)
+            total += deleted
+            if deleted < batch_size:
+                return total
+    finally:
+        db.close()
+
+
+async def run_refresh_token_sweeper() -> None:
+    """
+    Tarea de fondo iniciada desde el lifespan. Cada worker corre la suya;
+    el borrado es idempotente, así que no hace falta coordinarlas.
+    """
+    interval = settings.REFRESH_TOKEN_SWEEP_INTERVAL_SECONDS
+    # Desfase inicial para que los workers no barran todos al mismo tiempo
+    await asyncio.sleep(random.uniform(0, min(interval, 60)))
+
+    while True:
+        try:
+            deleted = await asyncio.to_thread(
+                sweep_refresh_tokens, settings.REFRESH_TOKEN_SWEEP_BATCH_SIZE
+            )
+            if deleted:
+                logger.info(f"Refresh token sweeper removed {deleted} expired/revoked tokens")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Refresh token sweeper failed: {e}")
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,275 @@
+# app/services/wellness_summaries.py
+
+"""
+Resúmenes de ejercicios de bienestar pre-generados por IA.
+
+El prompt depende solo del ejercicio y del estado del semáforo (12 ejercicios x 3 estados),
+así que los resúmenes se generan por lotes y se guardan en `wellness_summaries`, con
+WELLNESS_SUMMARY_VARIANTS variantes por par obtenidas en una sola llamada al LLM:
+
+  - scripts/generate_wellness_summaries.py los genera todos (despliegue o cron);
+  - el endpoint de recomendación sirve desde la tabla, rotando variantes, sin llamar al LLM;
+  - si faltan o están obsoletos (edad máxima o ejercicio modificado), el endpoint responde
+    con lo que hay (o el texto de respaldo) y los pide a SummaryRefresher, una tarea de
+    fondo del lifespan que los regenera fuera del request.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_wellness_summary
+from app.db.session import SessionLocal
+from app.models.wellness_exercise import WellnessExercise
+from app.models.wellness_summary import WellnessSummary
+from app.services.exercise_catalog import ROTATION_STATES, CatalogExercise, exercise_catalog, parse_steps
+from app.services.llm_provider import get_llm_provider
+
+logger = logging.getLogger(__name__)
+
+_VARIANT_SEPARATOR = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+
+# Tras un fallo del LLM, el par no se vuelve a intentar hasta pasado este tiempo
+REFRESH_RETRY_SECONDS = 300
+
+
+def build_summary_prompt(exercise, energy_state: str, steps: List[str]) -> str:
+    """`exercise` es el modelo o el schema WellnessExercise (ver CatalogExercise.data)"""
+    return f"""
+Como Newra, el asistente de bienestar de MetaMind, genera un resumen breve y motivador para el siguiente ejercicio de mindfulness.
+
+El usuario ha indicado que su estado de metamotivación actual es: **{energy_state}**
+
+**Ejercicio seleccionado:**
+- Nombre: {exercise.name}
+- Objetivo: {exercise.objective}
+- Duración: {exercise.duration_seconds} segundos
+- Contexto: {exercise.context}
+
+**Lo que trabaja:**
+{exercise.taxonomy}
+
+**Pasos básicos:**
+{chr(10).join(f"{i+1}. {step}" for i, step in enumerate(steps[:3]))}
+
+Genera un resumen de 2-3 oraciones que:
+1. Valide cómo se siente el usuario según su estado del semáforo
+2. Explique brevemente cómo este ejercicio le ayudará
+3. Sea motivador y empático
+
+Responde SOLO con el resumen, sin saludos ni despedidas.
+"""
+
+
+def _variants_instruction(variants: int) -> str:
+    if variants <= 1:
+        return ""
+    return (
+        f"\nEscribe {variants} versiones distintas del resumen, separadas por una línea que contenga solo ---\n"
+    )
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def current_prompt_hash(exercise: CatalogExercise, energy_state: str) -> str:
+    """Hash del prompt actual del par, memorizado en el catálogo (se descarta al recargarlo)"""
+    cached = exercise.prompt_hashes.get(energy_state)
+    if cached is None:
+        cached = prompt_hash(build_summary_prompt(exercise.data, energy_state, exercise.steps))
+        exercise.prompt_hashes[energy_state] = cached
+    return cached
+
+
+def parse_variants(text: str, limit: int) -> List[str]:
+    variants = [part.strip() for part in _VARIANT_SEPARATOR.split(text or "")]
+    return [variant for variant in variants if variant][:limit]
+
+
+def fallback_summary(exercise) -> str:
+    """Texto de respaldo cuando aún no hay resúmenes generados"""
+    return (
+        f"Este ejercicio de {exercise.duration_seconds} segundos te ayudará a trabajar en "
+        f"{exercise.taxonomy.split(';')[0]}. Es perfecto para tu estado actual."
+    )
+
+
+def is_stale(generated_at: datetime, stored_hash: str, current_hash: str) -> bool:
+    """Obsoleto si el ejercicio cambió desde que se generó o si superó la edad máxima"""
+    max_age = timedelta(hours=settings.WELLNESS_SUMMARY_MAX_AGE_HOURS)
+    return stored_hash != current_hash or datetime.utcnow() - generated_at > max_age
+
+
+def _any_stale(summaries: List[WellnessSummary], current_hash: str) -> bool:
+    return any(is_stale(summary.generated_at, summary.prompt_hash, current_hash) for summary in summaries)
+
+
+def generate_summaries(
+    db: Session,
+    exercise,
+    energy_state: str,
+    steps: List[str],
+    variants: Optional[int] = None
+) -> int:
+    """
+    Genera las variantes de un par (ejercicio, estado) con una llamada al LLM y las guarda.
+    Retorna cuántas se guardaron (0 si el LLM falló: se conservan las anteriores).
+    """
+    variants = variants or settings.WELLNESS_SUMMARY_VARIANTS
+    prompt = build_summary_prompt(exercise, energy_state, steps)
+    try:
+        text = get_llm_provider().generate(
+            prompt + _variants_instruction(variants),
+            purpose="wellness",
+            temperature=0.9,
+            max_output_tokens=150 * variants
+        )
+    except Exception as e:
+        logger.error(f"Error generando resúmenes de '{exercise.name}' ({energy_state}): {e}")
+        return 0
+
+    texts = parse_variants(text, variants)
+    if not texts:
+        logger.warning(f"Respuesta vacía al generar resúmenes de '{exercise.name}' ({energy_state})")
+        return 0
+    if not crud_wellness_summary.replace_summaries(db, exercise.id, energy_state, texts, prompt_hash(prompt)):
+        return 0
+    return len(texts)
+
+
+def generate_all_summaries(
+    db: Session,
+    *,
+    states: Optional[Iterable[str]] = None,
+    variants: Optional[int] = None,
+    force: bool = False
+) -> Tuple[int, int]:
+    """
+    Genera los resúmenes de todos los ejercicios y estados de su rotación.
+    Sin `force`, salta los pares que ya están al día. Retorna (pares generados, pares saltados).
+    """
+    states = set(states or (state.value for state in ROTATION_STATES))
+    index = {} if force else crud_wellness_summary.get_summary_index(db)
+    generated = skipped = 0
+    for exercise in exercise_catalog.get_exercises(db):
+        for energy_state in exercise_catalog.get_states_for_exercise(db, exercise.id):
+            if energy_state not in states:
+                continue
+            current = index.get((exercise.id, energy_state))
+            if current is not None and not is_stale(current[0], current[1], current_prompt_hash(exercise, energy_state)):
+                skipped += 1
+                continue
+            if generate_summaries(db, exercise.data, energy_state, exercise.steps, variants):
+                generated += 1
+    return generated, skipped
+
+
+def choose_summary(
+    summaries: List[WellnessSummary],
+    exercise: CatalogExercise,
+    energy_state: str,
+    user_id: int
+) -> str:
+    """
+    Elige la variante del día para el usuario (rota entre usuarios y días).
+    Si no hay resúmenes o están obsoletos, pide regenerarlos en segundo plano.
+    """
+    if not summaries:
+        summary_refresher.request(exercise.id, energy_state)
+        return fallback_summary(exercise.data)
+
+    if _any_stale(summaries, current_prompt_hash(exercise, energy_state)):
+        summary_refresher.request(exercise.id, energy_state)
+    return summaries[(user_id + date.today().toordinal()) % len(summaries)].text
+
+
+class SummaryRefresher:
+    """
+    Cola de pares (ejercicio, estado) a regenerar, drenada por una tarea de fondo de cada worker.
+    request() se puede llamar desde cualquier hilo (el endpoint es síncrono); sin la tarea
+    corriendo (scripts) solo queda anotado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Set[Tuple[int, str]] = set()
+        self._retry_at: Dict[Tuple[int, str], float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def request(self, exercise_id: int, energy_state: str) -> None:
+        key = (exercise_id, energy_state)
+        with self._lock:
+            if key in self._pending or time.monotonic() < self._retry_at.get(key, 0):
+                return
+            self._pending.add(key)
+            loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _take(self) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            return next(iter(self._pending), None)
+
+    def _done(self, key: Tuple[int, str], failed: bool) -> None:
+        with self._lock:
+            self._pending.discard(key)
+            if failed:
+                self._retry_at[key] = time.monotonic() + REFRESH_RETRY_SECONDS
+            else:
+                self._retry_at.pop(key, None)
+
+    @staticmethod
+    def _regenerate(exercise_id: int, energy_state: str) -> Optional[int]:
+        """Resúmenes generados; None si hacía falta regenerar y el LLM falló."""
+        db = SessionLocal()
+        try:
+            exercise = db.get(WellnessExercise, exercise_id)
+            if exercise is None:
+                return 0
+            # Otro worker pudo regenerarlo mientras este esperaba
+            steps = parse_steps(exercise.steps)
+            summaries = crud_wellness_summary.get_summaries(db, exercise_id, energy_state)
+            if summaries and not _any_stale(summaries, prompt_hash(build_summary_prompt(exercise, energy_state, steps))):
+                return 0
+            return generate_summaries(db, exercise, energy_state, steps) or None
+        finally:
+            db.close()
+
+    async def run(self) -> None:
+        """Tarea de fondo iniciada desde el lifespan."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            key = self._take()
+            if key is None:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            generated = None
+            try:
+                generated = await asyncio.to_thread(self._regenerate, *key)
+                if generated:
+                    logger.info(f"Wellness summaries regenerated for exercise {key[0]} ({key[1]}): {generated}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Wellness summary refresh failed for {key}: {e}")
+            finally:
+                self._done(key, failed=generated is None)
+
+
+summary_refresher = SummaryRefresher()
+
+
+async def run_wellness_summary_refresher() -> None:
+    await summary_refresher.run()
@@ -0,0 +1,7 @@
+# gunicorn.conf.py - Hooks de gunicorn (las opciones de arranque están en startup.sh)
+
+
+def child_exit(server, worker):
+    # Descarta los gauges del worker que terminó en las métricas multiproceso
+    from app.core.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
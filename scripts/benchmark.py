@@ -0,0 +1,431 @@
+"""
+Benchmark de extremo a extremo de las rutas calientes (chat, path, dashboard, bienestar).
+
+Levanta `app.main:app` con uvicorn en este mismo proceso, contra SQLite (por defecto)
+o un PostgreSQL local, con datos sembrados y el LLM stub (sin red). Cada escenario se
+ejecuta con la concurrencia indicada y reporta:
+
+  - latencia p50/p95/p99 (y tiempo al primer chunk en streaming)
+  - throughput (req/s) y errores
+  - consultas SQL por request
+  - espera por conexión del pool (checkout) por request
+
+Uso:
+
+    python scripts/benchmark.py                                   # SQLite temporal
+    python scripts/benchmark.py --database-url postgresql://u:p@localhost/bench --sslmode disable
+    python scripts/benchmark.py --scenarios chat_send,dashboard_bundle -c 20 -n 400
+    python scripts/benchmark.py --baseline benchmarks/baseline.json          # comparar (exit 1 si empeora)
+    python scripts/benchmark.py --output benchmarks/baseline.json            # actualizar el baseline
+
+benchmarks/baseline.json está versionado (ver benchmarks/README.md); bench_results.json,
+la salida por defecto, es local e ignorado por git.
+
+Cliente y servidor comparten proceso: los números sirven para comparar commits
+en la misma máquina, no como capacidad absoluta de producción.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHAT_MESSAGES = [
+    "Me siento aburrido",
+    "Tengo que escribir un ensayo de historia para mañana",
+    "Estoy en la fase de ejecución, tengo 25 minutos",
+    "No funcionó",
+    "Me ayudó, gracias",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Por defecto, un SQLite temporal nuevo")
+    parser.add_argument("--sslmode", default="disable", help="DB_SSLMODE para PostgreSQL")
+    parser.add_argument("--scenarios", help="Lista separada por comas (por defecto, todos)")
+    parser.add_argument("-c", "--concurrency", type=int, default=10)
+    parser.add_argument("-n", "--requests", type=int, default=200, help="Requests por escenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests de calentamiento por escenario")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--history-days", type=int, default=60, help="Días de historial sembrado por usuario")
+    parser.add_argument("--llm-latency-ms", type=int, default=300)
+    parser.add_argument("--llm-chunk-interval-ms", type=int, default=40)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-max-concurrency", type=int, default=16,
+                        help="LLM_MAX_CONCURRENCY: llamadas simultáneas al LLM antes de encolar")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.20,
+                        help="Aumento relativo de p95 tolerado frente al baseline")
+    return parser.parse_args()
+
+
+def configure_environment(args) -> Optional[str]:
+    """Variables de entorno para la app; deben definirse antes de importar `app`."""
+    db_file = None
+    database_url = args.database_url
+    if not database_url:
+        db_file = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+        database_url = f"sqlite:///{db_file}"
+
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "DB_SSLMODE": args.sslmode,
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_STUB_CHUNK_INTERVAL_MS": str(args.llm_chunk_interval_ms),
+        "LLM_STUB_FAILURE_RATE": str(args.llm_failure_rate),
+        "LLM_MAX_CONCURRENCY": str(args.llm_max_concurrency),
+        # El login no es parte de lo medido: hash barato y sin pool de procesos
+        "BCRYPT_ROUNDS": "4",
+        "PASSWORD_HASH_WORKERS": "0",
+        # Todas las requests salen de pocos usuarios: el rate limit y el presupuesto
+        # de tokens falsearían los resultados
+        "RATE_LIMIT_ENABLED": "false",
+        "LLM_BUDGET_ENABLED": "false",
+    })
+    for key, value in (("SECRET_KEY", "bench-secret"), ("PSYCHOLOGIST_INVITE_KEY", "bench"), ("GEMINI_API_KEY", "unused")):
+        os.environ.setdefault(key, value)
+    return db_file
+
+
+# ---------------------------- DATOS ---------------------------- #
+
+def seed_benchmark_data(n_users: int, history_days: int) -> List[str]:
+    """Crea usuarios con historial (check-ins, energía, ejercicios). Devuelve sus emails."""
+    from app.db.bootstrap import bootstrap
+    from app.db.initial_data import migrate_user_daily_activity
+    from app.db.session import SessionLocal
+    from app.core.security import password_hasher
+    from app.models import (
+        User, UserProfile, DailyCheckIn, MetamotivationEnergy,
+        ExerciseCompletion, WellnessExercise
+    )
+
+    bootstrap()
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        exercise_ids = [row[0] for row in db.query(WellnessExercise.id).all()]
+        password_hash = password_hasher.hash("bench-password")
+        emails = []
+        for i in range(n_users):
+            email = f"bench-{i}@bench.local"
+            emails.append(email)
+            if db.query(User.id).filter(User.email == email).first():
+                continue
+            user = User(email=email, hashed_password=password_hash, role="student")
+            db.add(user)
+            db.flush()
+            db.add(UserProfile(user_id=user.id, name=f"Bench {i}", major="Ingeniería"))
+            today = date.today()
+            for day in range(history_days):
+                when = today - timedelta(days=day)
+                started = datetime.combine(when, datetime.min.time()) + timedelta(hours=rng.randint(8, 22))
+                db.add(DailyCheckIn(user_id=user.id, date=when, motivation_level=rng.randint(1, 6)))
+                state = rng.choice(["verde", "ambar", "rojo"])
+                db.add(MetamotivationEnergy(user_id=user.id, energy_state=state, created_at=started))
+                if exercise_ids and rng.random() < 0.6:
+                    db.add(ExerciseCompletion(
+                        user_id=user.id, exercise_id=rng.choice(exercise_ids), energy_state=state,
+                        intensity_pre=rng.randint(3, 9), intensity_post=rng.randint(1, 6),
+                        completed=True, started_at=started, completed_at=started + timedelta(minutes=5)
+                    ))
+        db.commit()
+        migrate_user_daily_activity(db)
+        return emails
+    finally:
+        db.close()
+
+
+# ---------------------------- INSTRUMENTACIÓN ---------------------------- #
+
+class DbProbe:
+    """Cuenta consultas SQL y mide la espera por checkout de conexiones del pool."""
+
+    def __init__(self, *engines):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.checkout_seconds = 0.0
+        self.checkouts = 0
+        for engine in engines:
+            self._install(engine)
+
+    def _install(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count(*_):
+            with self._lock:
+                self.queries += 1
+
+        pool = engine.pool
+        original_connect = pool.connect
+
+        def timed_connect(*a, **kw):
+            start = time.perf_counter()
+            try:
+                return original_connect(*a, **kw)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.checkout_seconds += elapsed
+                    self.checkouts += 1
+
+        pool.connect = timed_connect
+
+    def snapshot(self):
+        with self._lock:
+            return self.queries, self.checkout_seconds, self.checkouts
+
+
+# ---------------------------- SERVIDOR ---------------------------- #
+
+def start_server(port: int):
+    import uvicorn
+    from app.main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline or not thread.is_alive():
+            raise SystemExit("El servidor no arrancó")
+        time.sleep(0.05)
+    return server, thread
+
+
+# ---------------------------- ESCENARIOS ---------------------------- #
+
+def _request(method: str, path: str, body: Optional[Callable] = None, stream: bool = False):
+    return {"method": method, "path": path, "body": body, "stream": stream}
+
+
+SCENARIOS: Dict[str, dict] = {
+    "chat_send": _request("POST", "/api/v1/ai-chat/send", lambda i: {"message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)]}),
+    "chat_stream": _request("POST", "/api/v1/ai-chat/send-stream",
+                            lambda i: {"message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)]}, stream=True),
+    "chat_history": _request("GET", "/api/v1/ai-chat/history"),
+    "path_sections": _request("GET", "/api/v1/path/sections"),
+    "path_overview": _request("GET", "/api/v1/path/overview"),
+    "questions": _request("GET", "/api/v1/questions/"),
+    "dashboard_bundle": _request("GET", "/api/v1/dashboard/bundle"),
+    "dashboard_motivation_history": _request("GET", "/api/v1/dashboard/motivation-history"),
+    "dashboard_streak": _request("GET", "/api/v1/dashboard/streak"),
+    "wellness_stats": _request("GET", "/api/v1/wellness/stats"),
+    "wellness_energy_history": _request("GET", "/api/v1/wellness/energy/history"),
+    "wellness_exercises": _request("GET", "/api/v1/wellness/exercises"),
+    "wellness_recommend": _request("POST", "/api/v1/wellness/exercises/recommend",
+                                   lambda i: {"energy_state": ("verde", "ambar", "rojo")[i % 3]}),
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(client, name: str, spec: dict, tokens: List[str], args, probe: DbProbe) -> dict:
+    latencies: List[float] = []
+    first_chunk: List[float] = []
+    errors = 0
+    counter = {"next": 0}
+
+    async def one(i: int, record: bool):
+        nonlocal errors
+        headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+        body = spec["body"](i) if spec["body"] else None
+        start = time.perf_counter()
+        try:
+            if spec["stream"]:
+                async with client.stream(spec["method"], spec["path"], json=body, headers=headers) as response:
+                    first = None
+                    async for line in response.aiter_lines():
+                        if first is None and line.startswith("data:"):
+                            first = time.perf_counter() - start
+                    ok = response.status_code < 400
+            else:
+                response = await client.request(spec["method"], spec["path"], json=body, headers=headers)
+                first = None
+                ok = response.status_code < 400
+        except Exception:
+            ok, first = False, None
+        elapsed = time.perf_counter() - start
+        if record:
+            if ok:
+                latencies.append(elapsed)
+                if first is not None:
+                    first_chunk.append(first)
+            else:
+                errors += 1
+
+    async def worker(total: int, record: bool):
+        while counter["next"] < total:
+            i = counter["next"]
+            counter["next"] += 1
+            await one(i, record)
+
+    await asyncio.gather(*(worker(args.warmup, False) for _ in range(min(args.concurrency, args.warmup))))
+
+    counter["next"] = 0
+    queries_before, checkout_before, checkouts_before = probe.snapshot()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(args.requests, True) for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+    queries_after, checkout_after, checkouts_after = probe.snapshot()
+
+    completed = len(latencies) + errors
+    latencies.sort()
+    first_chunk.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    result = {
+        "requests": completed,
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "throughput_rps": round(completed / wall, 2) if wall else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "queries_per_request": round((queries_after - queries_before) / completed, 2) if completed else None,
+        "pool_wait_ms_per_request": round((checkout_after - checkout_before) * 1000 / completed, 3) if completed else None,
+        "pool_checkouts_per_request": round((checkouts_after - checkouts_before) / completed, 2) if completed else None,
+    }
+    if first_chunk:
+        result["first_chunk_p50_ms"] = ms(percentile(first_chunk, 50))
+        result["first_chunk_p95_ms"] = ms(percentile(first_chunk, 95))
+    return result
+
+
+async def run_all(args, emails: List[str], probe: DbProbe) -> Dict[str, dict]:
+    import httpx
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Escenarios desconocidos: {', '.join(unknown)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+        tokens = []
+        for email in emails:
+            response = await client.post("/api/v1/login/access-token",
+                                         data={"username": email, "password": "bench-password"})
+            response.raise_for_status()
+            tokens.append(response.json()["access_token"])
+
+        results = {}
+        for name in names:
+            results[name] = await run_scenario(client, name, SCENARIOS[name], tokens, args, probe)
+            print_result(name, results[name])
+        return results
+
+
+# ---------------------------- REPORTE ---------------------------- #
+
+def print_result(name: str, result: dict) -> None:
+    line = (
+        f"{name:<30} p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+        f"{result['throughput_rps']} req/s  {result['queries_per_request']} q/req  "
+        f"pool {result['pool_wait_ms_per_request']} ms/req  errores {result['errors']}"
+    )
+    if "first_chunk_p50_ms" in result:
+        line += f"  primer chunk p50 {result['first_chunk_p50_ms']} ms"
+    print(line)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, dict], baseline: dict, max_regression: float, settings: Optional[dict] = None) -> bool:
+    """Compara p95 y consultas por request contra el baseline. Devuelve False si hay regresión."""
+    ok = True
+    print(f"\nComparación con baseline ({baseline.get('revision')}):")
+    if settings and baseline.get("settings") != settings:
+        print("  AVISO: el baseline se midió con otros parámetros; las cifras no son comparables")
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric, tolerance in (("p95_ms", max_regression), ("queries_per_request", 0.0)):
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            flag = "REGRESIÓN" if change > tolerance else ""
+            if flag:
+                ok = False
+            print(f"  {name:<30} {metric:<20} {before} -> {after} ({change:+.1%}) {flag}")
+    return ok
+
+
+def main() -> int:
+    args = parse_args()
+    db_file = configure_environment(args)
+
+    emails = seed_benchmark_data(args.users, args.history_days)
+
+    from app.db.session import engine, async_engine
+    probe = DbProbe(engine, async_engine.sync_engine)
+    server, thread = start_server(args.port)
+    try:
+        results = asyncio.run(run_all(args, emails, probe))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "database": engine.dialect.name,
+        "settings": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": args.users,
+            "history_days": args.history_days,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_chunk_interval_ms": args.llm_chunk_interval_ms,
+            "llm_failure_rate": args.llm_failure_rate,
+            "llm_max_concurrency": args.llm_max_concurrency,
+        },
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {args.output}")
+
+    if db_file:
+        os.remove(db_file)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        return 0 if compare(results, baseline, args.max_regression, report["settings"]) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Presupuesto de tiempo de import de la app.
+
+Importa `app.main` varias veces, cada una en un proceso limpio con `python -X importtime`,
+y falla si:
+  - la mediana del tiempo acumulado supera el presupuesto, o
+  - se cargó algún módulo que debe ser diferido (SDK de Gemini).
+
+Una sola muestra es demasiado ruidosa (caché de disco fría, otros procesos en la
+máquina de CI); la mediana de varias no depende de un arranque lento aislado.
+
+Uso (desde la raíz del repo, con las variables de entorno de la app definidas):
+
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 1500 --module app.main --top 15 --samples 9
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Módulos que no deben cargarse al importar la app: se importan en el primer uso
+DEFERRED_MODULES = (
+    "google.generativeai",
+)
+
+
+def measure(module: str) -> list:
+    """Devuelve [(self_us, cumulative_us, nombre)] según `-X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"No se pudo importar {module}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1600.0)
+    parser.add_argument("--top", type=int, default=10, help="Imports más caros a mostrar")
+    parser.add_argument("--samples", type=int, default=5, help="Procesos a medir; se compara la mediana")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(max(1, args.samples)):
+        rows = measure(args.module)
+        total_ms = next(cum for _, cum, name in rows if name == args.module) / 1000
+        samples.append((total_ms, rows))
+    samples.sort(key=lambda sample: sample[0])
+    totals = [total for total, _ in samples]
+    total_ms = statistics.median(totals)
+    # El detalle se muestra de la muestra central
+    rows = samples[len(samples) // 2][1]
+    loaded = {name for _, sample_rows in samples for _, _, name in sample_rows}
+
+    print(
+        f"{args.module}: mediana {total_ms:.0f} ms, min {totals[0]:.0f} ms, max {totals[-1]:.0f} ms "
+        f"en {len(totals)} muestras (presupuesto {args.budget_ms:.0f} ms)"
+    )
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    leaked = sorted(
+        name for name in loaded
+        if any(name == deferred or name.startswith(deferred + ".") for deferred in DEFERRED_MODULES)
+    )
+    if leaked:
+        print(f"FALLA: módulos que deberían cargarse en el primer uso: {', '.join(leaked[:5])}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print("FALLA: la mediana excede el presupuesto de import")
+        ok = False
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Genera los resúmenes de los ejercicios de bienestar (tabla wellness_summaries).
+
+Una llamada al LLM por par (ejercicio, estado del semáforo) produce
+WELLNESS_SUMMARY_VARIANTS variantes. Sin --force solo regenera los pares que faltan
+o están obsoletos, así que se puede correr en cada despliegue o desde un cron.
+
+Uso:
+
+    python scripts/generate_wellness_summaries.py                  # solo lo que falta
+    python scripts/generate_wellness_summaries.py --force          # todo
+    python scripts/generate_wellness_summaries.py --states rojo --variants 5
+
+Requiere el esquema al día (python -m app.db.bootstrap).
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Genera los resúmenes pre-calculados de los ejercicios de bienestar.")
+    parser.add_argument("--variants", type=int, default=None, help="Variantes por par (default: WELLNESS_SUMMARY_VARIANTS)")
+    parser.add_argument("--states", default=None, help="Estados separados por comas (default: todos)")
+    parser.add_argument("--force", action="store_true", help="Regenerar también los pares que están al día")
+    args = parser.parse_args()
+
+    from app.db.session import SessionLocal
+    from app.services.wellness_summaries import generate_all_summaries
+
+    states = [s.strip().lower() for s in args.states.split(",") if s.strip()] if args.states else None
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        generated, skipped = generate_all_summaries(db, states=states, variants=args.variants, force=args.force)
+    finally:
+        db.close()
+
+    print(f"Pares generados: {generated}  al día (saltados): {skipped}  ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
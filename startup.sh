@@ -1,10 +1,25 @@
 #!/bin/bash
 # startup.sh - Script de inicio para Azure App Service
 
+# Tablas, migraciones y datos iniciales: una sola vez, antes de levantar los workers
+echo "Bootstrapping database..."
+python -m app.db.bootstrap || exit 1
+
+# Métricas Prometheus compartidas entre workers: se limpia en cada arranque
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# El pool de conexiones de cada worker se dimensiona con este mismo valor (DB_MAX_CONNECTIONS / workers)
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-2}"
+
+# Las llamadas al LLM corren fuera del event loop y con timeout propio (LLM_REQUEST_TIMEOUT_SECONDS),
+# así que el worker siempre responde al heartbeat: el timeout solo detecta workers colgados
 echo "Starting Gunicorn with Uvicorn workers..."
 python -m gunicorn app.main:app \
-    --workers 2 \
+    --config gunicorn.conf.py \
+    --workers "$WEB_CONCURRENCY" \
     --worker-class uvicorn.workers.UvicornWorker \
     --bind=0.0.0.0:8000 \
-    --timeout 600 \
+    --timeout 120 \
     --log-level info